@@ -1,5 +1,12 @@
-from django.contrib import admin
-from .models import Booking
+from django.contrib import admin, messages
+from django.db import transaction
+from apps.tours.cache import invalidate_catalog_cache
+from apps.tours.aggregates import schedule_aggregates_refresh
+from apps.tours.documents import schedule_document_rebuild
+from .inventory import (
+    EXPIRING_STATUSES, approve_bookings as approve_requests, publish_booking_events, release_bookings,
+)
+from .models import Booking, BookingExport, WaitlistEntry
 
 
 @admin.register(Booking)
@@ -28,7 +35,7 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = (
         "status",
         "approved_by",
-        "session__tour__agency",
+        "agency",
         "session__tour",
         "session__date_start"
     )
@@ -48,7 +55,9 @@ class BookingAdmin(admin.ModelAdmin):
         'approved_by'
     ]
 
+    # Статус — только действиями списка: они возвращают места и промокоды
     readonly_fields = (
+        'status',
         'created_at',
         'approved_at',
         'expires_at',
@@ -103,28 +112,64 @@ class BookingAdmin(admin.ModelAdmin):
         if request.user.is_superuser:
             return qs
         if request.user.is_staff and request.user.agency:
-            return qs.filter(session__tour__agency=request.user.agency)
+            return qs.filter(agency=request.user.agency)
         return qs.none()
     
     def approve_bookings(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.filter(status='requested').update(
-            status='approved', 
-            approved_by=request.user,
-            approved_at=timezone.now()
-        )
-        self.message_user(request, f'{updated} bookings approved.')
+        # Тот же механизм, что у /bulk-approve/: места проверяются по каждой сессии
+        results = approve_requests(queryset, request.user)
+        errors = [result for result in results if 'error' in result]
+        self.message_user(request, f'{len(results) - len(errors)} bookings approved.')
+        if errors:
+            details = '; '.join(f"#{result['id']}: {result['error']}" for result in errors[:10])
+            self.message_user(request, f'{len(errors)} bookings not approved. {details}', level=messages.WARNING)
     approve_bookings.short_description = "Approve selected bookings"
     
     def cancel_bookings(self, request, queryset):
-        updated = queryset.exclude(status__in=['paid', 'cancelled']).update(
-            status='cancelled',
+        # Оплаченные не трогаем; release_bookings вернёт использования промокодов
+        updated = release_bookings(
+            queryset.exclude(status='paid'),
+            'cancelled',
+            from_statuses=EXPIRING_STATUSES,
             cancel_reason='Cancelled by admin'
         )
         self.message_user(request, f'{updated} bookings cancelled.')
     cancel_bookings.short_description = "Cancel selected bookings"
     
     def mark_as_paid(self, request, queryset):
-        updated = queryset.filter(status='approved').update(status='paid')
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(status='approved').select_for_update()
+                .values_list('pk', 'session_id', 'tour_id', 'agency_id', 'user_id', 'seats_reserved')
+            )
+            updated = Booking.objects.filter(pk__in=[row[0] for row in rows]).update(status='paid')
+            publish_booking_events('paid', rows)
+        tour_ids = {row[2] for row in rows}
+        invalidate_catalog_cache()  # update() не отправляет post_save
+        schedule_document_rebuild(tour_ids)  # участники тура
+        schedule_aggregates_refresh(tour_ids)
         self.message_user(request, f'{updated} bookings marked as paid.')
-    mark_as_paid.short_description = "Mark selected bookings as paid"
\ No newline at end of file
+    mark_as_paid.short_description = "Mark selected bookings as paid"
+
+
+@admin.register(BookingExport)
+class BookingExportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'file_format', 'status', 'row_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'file_format')
+    search_fields = ('requested_by__username',)
+    readonly_fields = (
+        'requested_by', 'file_format', 'filters', 'status', 'row_count', 'file', 'error',
+        'created_at', 'started_at', 'finished_at',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'session', 'user', 'seats', 'status', 'offer_expires_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('user__username',)
+    raw_id_fields = ('session', 'user', 'booking')
+    readonly_fields = ('status', 'offered_at', 'offer_expires_at', 'booking', 'created_at')
@@ -1,14 +1,33 @@
-from rest_framework import viewsets, permissions, status
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
 
-from .models import Booking
+from apps.core.fieldsets import SparseFieldsetViewMixin
+from apps.core.idempotency import IdempotentMixin
+from apps.core.pagination import PageOrCursorPagination
+from apps.tours.models import public_promo_codes
+from .exports import (
+    CONTENT_TYPES, SYNC_LIMIT, XLSX_MAX_ROWS,
+    exceeds, export_filename, filter_bookings, iter_export, schedule_export,
+)
+from .inventory import EXPIRING_STATUSES, approve_bookings, reject_bookings, release_bookings
+from .models import Booking, BookingExport, WaitlistEntry, visible_bookings
 from .serializers import (
     BookingDetailSerializer,
     CreateBookingSerializer,
     ApproveBookingSerializer,
-    RejectBookingSerializer
+    RejectBookingSerializer,
+    BulkApproveBookingsSerializer,
+    BulkRejectBookingsSerializer,
+    BookingExportParamsSerializer,
+    BookingExportSerializer,
+    WaitlistEntrySerializer,
 )
+from .waitlist import WaitlistError, leave_waitlist
 
 
 ########################################
@@ -29,21 +48,47 @@ class IsManagerPermission(permissions.BasePermission):
 ########################################
 # Основной ViewSet
 ########################################
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(
+    IdempotentMixin,
+    SparseFieldsetViewMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
     """
     /api/bookings/
 
     - POST /  → пользователь оставляет заявку
     - GET /my/ → пользователь видит свои заявки
+    - POST /{id}/cancel/ → пользователь отменяет заявку
     - GET /pending/ → менеджер видит заявки на подтверждение
     - PATCH /{id}/approve/ → менеджер подтверждает
     - PATCH /{id}/reject/ → менеджер отклоняет
+    - GET /export/ → менеджер выгружает брони (CSV/XLSX/NDJSON)
+
+    Общих PUT/PATCH/DELETE нет: статус меняется только действиями,
+    которые возвращают места и промокоды.
+    Списки поддерживают ?pagination=cursor (keyset по -created_at, -id)
+    и ?fields=id,status,session.date_start (только нужные поля).
+    POST / с заголовком Idempotency-Key создаёт заявку один раз:
+    повтор с тем же ключом получает первый ответ.
     """
-    queryset = Booking.objects.select_related(
-        'user', 'session', 'session__tour', 'approved_by'
-    ).order_by('-created_at')
+    pagination_class = PageOrCursorPagination
+    queryset = Booking.objects.order_by('-created_at')
     permission_classes = [permissions.IsAuthenticated]
 
+    sparse_relations = {
+        'user': {'select': ['user']},
+        'session': {
+            'select': ['session__tour'],
+            'prefetch': ['session__promotions', public_promo_codes('session__promo_codes')],
+        },
+        'approved_by': {'select': ['approved_by']},
+    }
+    # user/status нужны фильтрам my/pending, created_at — курсору
+    sparse_always_only = ('pk', 'user', 'status', 'created_at')
+
     def get_serializer_class(self):
         if self.action == 'create':
             return CreateBookingSerializer
@@ -54,18 +99,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         return BookingDetailSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        qs = self.queryset
-
-        if user.is_superuser:
-            return qs
-
-        if user.is_staff and hasattr(user, 'agency') and user.agency:
-            # Менеджеры турагентства видят только свои туры
-            return qs.filter(session__tour__agency=user.agency)
-
-        # Обычный пользователь видит только свои бронирования
-        return qs.filter(user=user)
+        return visible_bookings(self.apply_sparse_fieldset(self.queryset), self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -81,9 +115,36 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         qs = self.get_queryset().filter(user=request.user)
         page = self.paginate_queryset(qs)
-        serializer = BookingDetailSerializer(page, many=True)
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
+    #################################
+    # Пользователь отменяет заявку
+    #################################
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """
+        /api/bookings/{id}/cancel/
+        - Своя заявка или неоплаченное подтверждение
+        - Места и использование промокода возвращаются
+        """
+        booking = self.get_object()
+        released = release_bookings(
+            Booking.objects.filter(pk=booking.pk, user=request.user, status__in=EXPIRING_STATUSES),
+            'cancelled',
+            from_statuses=EXPIRING_STATUSES,
+            cancel_reason=request.data.get('cancel_reason', ''),
+        )
+        if not released:
+            return Response(
+                {"error": "Эту бронь нельзя отменить."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {"status": "cancelled", "message": "Бронирование отменено."},
+            status=status.HTTP_200_OK
+        )
+
     #################################
     # Для менеджеров: pending заявки
     #################################
@@ -100,9 +161,59 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         qs = self.get_queryset().filter(status='requested')
         page = self.paginate_queryset(qs)
-        serializer = BookingDetailSerializer(page, many=True)
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
+    #################################
+    # Для менеджеров: выгрузка броней
+    #################################
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsManagerPermission]
+    )
+    def export(self, request):
+        """
+        /api/bookings/export/?file_format=csv|xlsx|ndjson&date_from=&date_to=&status=
+        - До BOOKING_EXPORT_SYNC_LIMIT строк — файл потоком в ответе
+        - Больше (или ?background=true) — 202 и фоновая выгрузка:
+          статус в /api/bookings/exports/{id}/, файл — в .../download/;
+          без очереди задач — 503
+        """
+        params = BookingExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        file_format = params.validated_data['file_format']
+        queryset = filter_bookings(visible_bookings(Booking.objects.all(), request.user), params.filters)
+
+        if file_format == 'xlsx' and exceeds(queryset, XLSX_MAX_ROWS):
+            return Response(
+                {"error": f"В XLSX помещается не больше {XLSX_MAX_ROWS} строк — выберите CSV или NDJSON."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if params.validated_data['background'] or exceeds(queryset, SYNC_LIMIT):
+            export = BookingExport.objects.create(
+                requested_by=request.user, file_format=file_format, filters=params.filters,
+            )
+            schedule_export(export)
+            export.refresh_from_db(fields=['status', 'error'])
+            if export.status == 'failed':
+                # Брокер недоступен: не собираем большой файл в запросе
+                return Response(
+                    {"error": export.error},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': '60'},
+                )
+            response = Response(BookingExportSerializer(export).data, status=status.HTTP_202_ACCEPTED)
+            response['Location'] = reverse('booking-export-detail', args=[export.pk], request=request)
+            return response
+
+        response = StreamingHttpResponse(
+            iter_export(queryset, file_format), content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(file_format)}"'
+        return response
+
     #################################
     # Менеджер подтверждает заявку
     #################################
@@ -150,4 +261,152 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Response(
             {"status": "cancelled", "message": "Заявка была отклонена."},
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+########################################
+# Фоновые выгрузки броней
+########################################
+class BookingExportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    /api/bookings/exports/
+    - GET / → свои выгрузки (суперпользователь — все)
+    - GET /{id}/ → статус: pending → running → ready | failed
+    - GET /{id}/download/ → готовый файл
+    """
+    serializer_class = BookingExportSerializer
+    permission_classes = [IsManagerPermission]
+    pagination_class = PageOrCursorPagination
+    queryset = BookingExport.objects.order_by('-created_at')
+
+    def get_queryset(self):
+        if self.request.user.is_superuser:
+            return self.queryset
+        return self.queryset.filter(requested_by=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        export = self.get_object()
+        if export.status != 'ready':
+            return Response({"error": "Выгрузка ещё не готова."}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            export.file.open('rb'),
+            as_attachment=True,
+            filename=export_filename(export.file_format, export.pk),
+            content_type=CONTENT_TYPES[export.file_format],
+        )
+
+
+########################################
+# Лист ожидания
+########################################
+class WaitlistViewSet(
+    IdempotentMixin,
+    mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
+    """
+    /api/bookings/waitlist/
+    - POST / {session, seats} → встать в очередь (только если мест нет)
+    - GET / → свои записи с позицией в очереди
+    - GET /{id}/ → статус и позиция; offered — места держатся до offer_expires_at
+    - POST /{id}/claim/ → оформить бронь на предложенные места
+      (поля как у POST /bookings/: transport, accommodation, promo_code, ...)
+    - DELETE /{id}/ → выйти из очереди
+    О предложении мест пользователь узнаёт из события outbox waitlist.offered,
+    опрашивать очередь не нужно.
+    """
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageOrCursorPagination
+    queryset = WaitlistEntry.objects.order_by('-created_at')
+    idempotent_actions = ('create', 'claim')
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        try:
+            leave_waitlist(instance)
+        except WaitlistError as exc:
+            raise ValidationError(str(exc))
+
+    @action(detail=True, methods=['post'])
+    def claim(self, request, pk=None):
+        entry = self.get_object()
+        if entry.status != 'offered':
+            raise ValidationError("Предложение мест истекло или уже использовано.")
+        data = {
+            key: request.data[key]
+            for key in ('selected_transport', 'selected_accommodation', 'comment', 'promo_code', 'bonus_used_amount')
+            if key in request.data
+        }
+        data.update(session=entry.session_id, seats_reserved=entry.seats)
+        serializer = CreateBookingSerializer(
+            data=data, context={**self.get_serializer_context(), 'waitlist_entry': entry},
+        )
+        serializer.is_valid(raise_exception=True)
+        booking = serializer.save(user=request.user)
+        return Response(
+            BookingDetailSerializer(booking, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+########################################
+# Массовое подтверждение и отклонение
+########################################
+class BulkApproveBookingsView(APIView):
+    """
+    POST /api/v1/bookings/bulk-approve/   {"ids": [1, 2, ...]}
+
+    Все заявки — одной транзакцией; места проверяются одним запросом
+    на сессию. Ответ — результат по каждой заявке в порядке запроса:
+    {"results": [{"id": 1, "status": "approved"}, {"id": 2, "error": "..."}],
+     "processed": 1, "failed": 1}
+    """
+    permission_classes = [IsManagerPermission]
+    serializer_class = BulkApproveBookingsSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = approve_bookings(
+            visible_bookings(Booking.objects.all(), request.user),
+            request.user,
+            ids=serializer.validated_data['ids'],
+        )
+        return bulk_response(results)
+
+
+class BulkRejectBookingsView(APIView):
+    """
+    POST /api/v1/bookings/bulk-reject/   {"ids": [1, 2, ...], "cancel_reason": "..."}
+
+    Отклоняет заявки одной транзакцией, возвращая места и промокоды.
+    Ответ — как у bulk-approve.
+    """
+    permission_classes = [IsManagerPermission]
+    serializer_class = BulkRejectBookingsSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = reject_bookings(
+            visible_bookings(Booking.objects.all(), request.user),
+            request.user,
+            serializer.validated_data['cancel_reason'],
+            ids=serializer.validated_data['ids'],
+        )
+        return bulk_response(results)
+
+
+def bulk_response(results):
+    failed = sum(1 for result in results if 'error' in result)
+    return Response(
+        {'results': results, 'processed': len(results) - failed, 'failed': failed},
+        status=status.HTTP_200_OK,
+    )
@@ -0,0 +1,72 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .inventory import EXPIRING_STATUSES, release_bookings
+
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_CHUNK_SIZE = 500
+# Метрики последнего прогона — для админки и мониторинга; в общем кеше
+# (settings.CACHES), так что их видит любой процесс, а не только воркер celery
+EXPIRY_METRICS_KEY = 'bookings:expiry:last_run'
+
+
+########################################
+# Истечение заявок и неоплаченных подтверждений (celery beat)
+########################################
+def overdue_bookings(now):
+    """
+    Заявки, не разобранные менеджером за REQUEST_TTL, и подтверждения,
+    не оплаченные за APPROVAL_TTL, — по индексу (status, expires_at)
+    """
+    from .models import Booking
+
+    return Booking.objects.filter(status__in=EXPIRING_STATUSES, expires_at__lt=now)
+
+
+def expire_overdue_bookings(now=None, chunk_size=EXPIRY_CHUNK_SIZE, max_chunks=None):
+    """
+    Переводит просроченные заявки и подтверждения в 'expired' чанками по chunk_size.
+    Каждый чанк — одна транзакция release_bookings: статус меняется одним
+    UPDATE, места и использования промокодов возвращаются там же.
+    Бронь, оплаченная между выборкой и блокировкой, не истекает:
+    условие статуса и срока перепроверяется под блокировкой.
+
+    Возвращает метрики прогона и сохраняет их в кеше (EXPIRY_METRICS_KEY).
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    oldest = overdue_bookings(now).order_by('expires_at').values_list('expires_at', flat=True).first()
+
+    expired = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(overdue_bookings(now).order_by('expires_at').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        expired += release_bookings(
+            overdue_bookings(now).filter(pk__in=ids), 'expired',
+            from_statuses=EXPIRING_STATUSES, expires_before=now,
+        )
+        chunks += 1
+        if len(ids) < chunk_size:
+            break
+
+    seconds = time.perf_counter() - started
+    metrics = {
+        'run_at': now.isoformat(),
+        'expired': expired,
+        'chunks': chunks,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(expired / seconds) if seconds else None,
+        # Насколько самая старая просрочка ждала прогона
+        'max_lag_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'remaining': overdue_bookings(now).count() if max_chunks is not None else 0,
+    }
+    cache.set(EXPIRY_METRICS_KEY, metrics, None)
+    if expired or metrics['remaining']:
+        logger.info("Истечение броней: %s", metrics, extra={'metrics': metrics})
+    return metrics
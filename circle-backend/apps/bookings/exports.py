@@ -0,0 +1,353 @@
+import csv
+import datetime
+import json
+import logging
+import re
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from apps.core.utils import Echo
+
+
+logger = logging.getLogger(__name__)
+
+# Больше строк — фоновая выгрузка в файл вместо потока в запросе
+SYNC_LIMIT = getattr(settings, 'BOOKING_EXPORT_SYNC_LIMIT', 50000)
+# Строк за один запрос к БД (серверный курсор на PostgreSQL)
+CHUNK_SIZE = 2000
+# Сколько байт копить перед отдачей в поток ответа
+BUFFER_SIZE = 64 * 1024
+# Лимит листа Excel — 1 048 576 строк вместе с заголовком
+XLSX_MAX_ROWS = 1048575
+QUEUE_UNAVAILABLE = "Очередь фоновых задач недоступна. Повторите выгрузку позже."
+
+# Колонка выгрузки → поле values_list
+EXPORT_COLUMNS = (
+    ('id', 'pk'),
+    ('created_at', 'created_at'),
+    ('status', 'status'),
+    ('tour', 'tour__title'),
+    ('session_id', 'session_id'),
+    ('date_start', 'session__date_start'),
+    ('date_end', 'session__date_end'),
+    ('user_id', 'user_id'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('phone_number', 'user__phone_number'),
+    ('seats', 'seats_reserved'),
+    ('base_price', 'base_price'),
+    ('discount_amount', 'discount_amount'),
+    ('bonus_used_amount', 'bonus_used_amount'),
+    ('final_price_paid', 'final_price_paid'),
+    ('promo_code', 'promo_code__code'),
+    ('selected_transport', 'selected_transport'),
+    ('selected_accommodation', 'selected_accommodation'),
+    ('approved_at', 'approved_at'),
+    ('expires_at', 'expires_at'),
+    ('cancel_reason', 'cancel_reason'),
+)
+HEADERS = tuple(column for column, _ in EXPORT_COLUMNS)
+# Начало формулы в Excel/LibreOffice (CSV/formula injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+########################################
+# Выборка
+########################################
+def filter_bookings(queryset, filters):
+    """
+    filters: date_from / date_to — даты начала сессии (сезон),
+    status — статус брони. Значения — строки ISO, как в BookingExport.filters.
+    """
+    if filters.get('date_from'):
+        queryset = queryset.filter(session__date_start__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(session__date_start__lte=filters['date_to'])
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    return queryset
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Кортежи значений EXPORT_COLUMNS в порядке id: values_list без моделей
+    и iterator() без кеша queryset — память не растёт с числом строк.
+    """
+    return (
+        queryset.order_by('pk')
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _text(value, tz):
+    """Значение ячейки; tz — текущая зона, полученная один раз на выгрузку"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.astimezone(tz).isoformat(timespec='seconds')
+    if isinstance(value, (datetime.date, Decimal)):
+        return str(value)
+    return value
+
+
+def _spreadsheet_text(value, tz):
+    """
+    Значение ячейки CSV/XLSX. Текст, начинающийся с =, +, -, @, табуляции
+    или перевода строки, табличный редактор выполнит как формулу — такие
+    строки (имя, комментарий, причина отмены) получают префикс '.
+    """
+    if isinstance(value, str):
+        return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+    return _text(value, tz)
+
+
+def _buffered(parts, size=BUFFER_SIZE):
+    """Склеивает мелкие куски в блоки по size: меньше вызовов write у сервера"""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+########################################
+# Форматы
+########################################
+def iter_csv(rows):
+    """CSV с BOM: Excel открывает кириллицу без мастера импорта"""
+    writer = csv.writer(Echo())
+    tz = timezone.get_current_timezone()
+
+    def lines():
+        yield '\ufeff'.encode('utf-8') + writer.writerow(HEADERS).encode('utf-8')
+        for row in rows:
+            yield writer.writerow([_spreadsheet_text(value, tz) for value in row]).encode('utf-8')
+
+    return _buffered(lines())
+
+
+def iter_ndjson(rows):
+    """Объект JSON на строку — удобно для загрузки в другие системы"""
+    tz = timezone.get_current_timezone()
+
+    def lines():
+        for row in rows:
+            yield json.dumps(
+                dict(zip(HEADERS, (_text(value, tz) for value in row))), ensure_ascii=False,
+            ).encode('utf-8') + b'\n'
+
+    return _buffered(lines())
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Bookings" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+# Управляющие символы недопустимы в XML
+XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value, tz):
+    if isinstance(value, (int, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(XML_ILLEGAL_RE.sub('', str(_spreadsheet_text(value, tz))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _Sink:
+    """Поток для ZipFile без seek: собирает сжатые байты до отдачи клиенту"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def iter_xlsx(rows):
+    """
+    XLSX без сторонних библиотек и без файла на диске: лист пишется
+    строками inlineStr прямо в zip, сжатые байты отдаются по мере
+    накопления. Даты — текстом ISO, суммы и количества — числами.
+    """
+    sink = _Sink()
+    tz = timezone.get_current_timezone()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        # Размер листа заранее неизвестен: zip64 на случай больших выгрузок
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(('<row>' + ''.join(_xlsx_cell(column, tz) for column in HEADERS) + '</row>').encode('utf-8'))
+            for row in rows:
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value, tz) for value in row) + '</row>').encode('utf-8'))
+                if sink.size >= BUFFER_SIZE:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'xlsx': iter_xlsx,
+    'ndjson': iter_ndjson,
+}
+
+
+def iter_export(queryset, file_format, chunk_size=CHUNK_SIZE):
+    """Блоки байт выгрузки queryset в формате file_format"""
+    return WRITERS[file_format](export_rows(queryset, chunk_size=chunk_size))
+
+
+def export_filename(file_format, pk=None):
+    stamp = timezone.localtime().strftime('%Y%m%d-%H%M')
+    suffix = f'-{pk}' if pk else ''
+    return f'bookings-{stamp}{suffix}.{file_format}'
+
+
+def exceeds(queryset, limit):
+    """Строк больше limit — без полного COUNT по большой таблице"""
+    return queryset.values('pk')[:limit + 1].count() > limit
+
+
+########################################
+# Фоновая выгрузка
+########################################
+def build_export(export, chunk_size=CHUNK_SIZE):
+    """
+    Собирает файл выгрузки во временный файл на диске (память не растёт)
+    и сохраняет его в export.file. Брони — те, что видит автор выгрузки
+    сейчас. Возвращает {'rows', 'bytes', 'seconds', 'rows_per_second'}.
+    """
+    from .models import Booking, BookingExport, visible_bookings
+
+    export.status = 'running'
+    export.started_at = timezone.now()
+    export.error = ''
+    export.save(update_fields=['status', 'started_at', 'error'])
+
+    stats = {'rows': 0, 'bytes': 0}
+
+    def counted(rows):
+        for row in rows:
+            stats['rows'] += 1
+            yield row
+
+    started = time.perf_counter()
+    try:
+        queryset = filter_bookings(visible_bookings(Booking.objects.all(), export.requested_by), export.filters)
+        with tempfile.TemporaryFile() as tmp:
+            for block in WRITERS[export.file_format](counted(export_rows(queryset, chunk_size=chunk_size))):
+                tmp.write(block)
+                stats['bytes'] += len(block)
+            tmp.seek(0)
+            export.file.save(export_filename(export.file_format, export.pk), File(tmp), save=False)
+    except Exception as exc:
+        BookingExport.objects.filter(pk=export.pk).update(status='failed', error=str(exc))
+        raise
+
+    seconds = time.perf_counter() - started
+    export.status = 'ready'
+    export.row_count = stats['rows']
+    export.finished_at = timezone.now()
+    export.save(update_fields=['file', 'status', 'row_count', 'finished_at'])
+
+    stats['seconds'] = round(seconds, 3)
+    stats['rows_per_second'] = round(stats['rows'] / seconds) if seconds else None
+    logger.info(
+        "Выгрузка броней %s (%s): %s строк, %s байт за %.1f c (%s строк/с)",
+        export.pk, export.file_format, stats['rows'], stats['bytes'], seconds, stats['rows_per_second'],
+    )
+    return stats
+
+
+def schedule_export(export):
+    """
+    Сборка в очереди после коммита. Без брокера выгрузка сразу помечается
+    failed: большой файл не собирается в процессе web-запроса.
+    """
+    export_id = export.pk
+
+    def enqueue():
+        from .models import BookingExport
+        from .tasks import build_booking_export
+
+        try:
+            # Без повторов публикации: недоступный брокер — ошибка сразу, а не после ожидания
+            build_booking_export.apply_async((export_id,), retry=False)
+        except OperationalError as exc:
+            logger.error("Очередь недоступна, выгрузка броней %s не поставлена: %s", export_id, exc)
+            BookingExport.objects.filter(pk=export_id).update(
+                status='failed', error=QUEUE_UNAVAILABLE, finished_at=timezone.now(),
+            )
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,350 @@
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.outbox import publish_many
+from apps.tours.aggregates import schedule_aggregates_refresh
+from apps.tours.cache import invalidate_catalog_cache
+from apps.tours.documents import schedule_document_rebuild
+from apps.tours.flash_sale import (
+    NO_COUNTER, get_available_seats, open_flash_sale, release_flash_seats, reserve_flash_seats,
+)
+from apps.tours.models import PromoCode, TourSession
+from .waitlist import offer_freed_seats
+
+
+# Брони в этих статусах держат ресурсы (места, использование промокода)
+HOLDING_STATUSES = ('requested', 'approved', 'paid')
+RELEASED_STATUSES = ('cancelled', 'expired')
+# Сколько заявка ждёт менеджера: места списаны при создании и без срока
+# зависли бы навсегда у заявок, которые никто не разобрал
+REQUEST_TTL = timedelta(hours=getattr(settings, 'BOOKING_REQUEST_TTL_HOURS', 48))
+# Сколько подтверждённая заявка ждёт оплаты
+APPROVAL_TTL = timedelta(minutes=60)
+# Статусы, которые истекают по expires_at
+EXPIRING_STATUSES = ('requested', 'approved')
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f"На выбранную дату осталось только {available} мест.")
+
+
+########################################
+# Списание мест
+########################################
+def reserve_seats(session, seats):
+    """
+    Списывает места сессии. Вызывается внутри транзакции брони.
+
+    Обычно — одним условным UPDATE:
+        available_seats = available_seats - n WHERE available_seats >= n
+    без чтения остатка и без гонок: из двух параллельных списаний
+    последнего места пройдёт одно, откат транзакции вернёт места сам.
+
+    В режиме flash sale — атомарным скриптом на счётчике Redis
+    (если счётчик ещё не открыт, он открывается из БД).
+
+    Возвращает 'db' или 'flash'. Бросает SeatsUnavailable.
+    """
+    for _ in range(3):
+        if session.flash_sale_until is not None:
+            result = reserve_flash_seats(session.pk, seats)
+            if result is not NO_COUNTER:
+                ok, left = result
+                if not ok:
+                    raise SeatsUnavailable(left)
+                return 'flash'
+            if open_flash_sale(session.pk):
+                continue
+        elif TourSession.objects.filter(
+            pk=session.pk, flash_sale_until__isnull=True, available_seats__gte=seats,
+        ).update(available_seats=F('available_seats') - seats):
+            return 'db'
+
+        # Мест не хватило или режим распродажи сменился — перечитываем сессию
+        session.refresh_from_db(fields=['available_seats', 'flash_sale_until'])
+        if session.flash_sale_until is None and session.available_seats < seats:
+            raise SeatsUnavailable(session.available_seats)
+    raise SeatsUnavailable(get_available_seats(session))
+
+
+def _release_seats(session_id, seats):
+    """Места на счётчик распродажи, а если её уже закрыли — в БД"""
+    if release_flash_seats(session_id, seats) is NO_COUNTER:
+        TourSession.objects.filter(pk=session_id).update(available_seats=F('available_seats') + seats)
+
+
+@contextmanager
+def seat_reservation(session, seats):
+    """
+    Списание мест на время создания брони: если блок упал,
+    места со счётчика возвращаются (Redis не откатывается вместе с БД).
+    Отдаёт способ списания: 'db' или 'flash'.
+    """
+    mode = reserve_seats(session, seats)
+    try:
+        yield mode
+    except BaseException:
+        if mode == 'flash':
+            _release_seats(session.pk, seats)
+        raise
+
+
+########################################
+# Освобождение ресурсов брони
+########################################
+def publish_booking_events(status, rows):
+    """
+    События outbox booking.<status> в текущей транзакции.
+    rows — [(pk, session_id, tour_id, agency_id, user_id, seats), ...]
+    """
+    publish_many(f'booking.{status}', 'booking', [
+        (pk, {
+            'booking_id': pk,
+            'status': status,
+            'session_id': session_id,
+            'tour_id': tour_id,
+            'agency_id': agency_id,
+            'user_id': user_id,
+            'seats': seats,
+        })
+        for pk, session_id, tour_id, agency_id, user_id, seats in rows
+    ])
+
+
+def release_bookings(bookings, status, *, from_statuses=HOLDING_STATUSES, expires_before=None, **fields):
+    """Как release_booking_ids, но возвращает число переведённых броней"""
+    return len(release_booking_ids(
+        bookings, status, from_statuses=from_statuses, expires_before=expires_before, **fields
+    ))
+
+
+def release_booking_ids(bookings, status, *, from_statuses=HOLDING_STATUSES, expires_before=None, **fields):
+    """
+    Переводит брони в cancelled/expired и в той же транзакции
+    возвращает занятые ими использования промокодов и места.
+    Места сессий в режиме flash sale возвращаются на счётчик после коммита.
+
+    Ресурсы возвращаются только за брони, которые действительно сменили
+    статус: строки блокируются (select_for_update) и повторно проверяются,
+    поэтому двойная отмена или отмена параллельно с истечением
+    не освобождают одно использование дважды. Событие booking.<status>
+    пишется в outbox в той же транзакции; там же места предлагаются
+    листу ожидания сессии (apps.bookings.waitlist).
+
+    Условия вызывающего, которые могут измениться между выборкой
+    и блокировкой, передаются явно и проверяются уже на заблокированных
+    строках: from_statuses — из каких статусов можно перевести
+    (например, без 'paid' для отмены и истечения), expires_before —
+    только брони с expires_at раньше этого момента. Бронь, оплаченная
+    между выборкой и блокировкой, так не освобождается.
+
+    bookings — queryset броней; fields — доп. поля (cancel_reason, approved_by, ...).
+    Возвращает id переведённых броней.
+    """
+    from .models import Booking
+
+    if status not in RELEASED_STATUSES:
+        raise ValueError(f"Недопустимый статус освобождения: {status}")
+    if not set(from_statuses) <= set(HOLDING_STATUSES):
+        raise ValueError(f"Освобождать можно только брони в статусах {HOLDING_STATUSES}")
+
+    locked = Booking.objects.filter(pk__in=bookings.values('pk'), status__in=from_statuses)
+    if expires_before is not None:
+        locked = locked.filter(expires_at__lt=expires_before)
+    with transaction.atomic():
+        rows = list(
+            locked
+            .select_for_update()
+            .order_by('pk')
+            .values_list(
+                'pk', 'tour_id', 'promo_code_id', 'session_id', 'seats_reserved', 'holds_seats',
+                'agency_id', 'user_id',
+            )
+        )
+        if not rows:
+            return []
+
+        released = [row[0] for row in rows]
+        Booking.objects.filter(pk__in=released).update(status=status, holds_seats=False, **fields)
+        PromoCode.release_uses(Counter(row[2] for row in rows if row[2]))
+
+        seats = Counter()
+        for _, _, _, session_id, seats_reserved, holds_seats, _, _ in rows:
+            if holds_seats:
+                seats[session_id] += seats_reserved
+        flash = set(
+            TourSession.objects.filter(pk__in=seats, flash_sale_until__isnull=False).values_list('pk', flat=True)
+        )
+        for session_id, count in seats.items():
+            if session_id in flash:
+                transaction.on_commit(lambda session_id=session_id, count=count: _release_seats(session_id, count))
+            else:
+                TourSession.objects.filter(pk=session_id).update(available_seats=F('available_seats') + count)
+        # Вернувшиеся места — сразу следующим в листе ожидания, до того как их увидит каталог
+        offer_freed_seats([session_id for session_id in seats if session_id not in flash])
+        publish_booking_events(status, [
+            (pk, session_id, tour_id, agency_id, user_id, seats_reserved)
+            for pk, tour_id, _, session_id, seats_reserved, _, agency_id, user_id in rows
+        ])
+
+    # update() не отправляет post_save — обновляем витрину сами
+    tour_ids = {row[1] for row in rows}
+    invalidate_catalog_cache()
+    schedule_document_rebuild(tour_ids)
+    schedule_aggregates_refresh(tour_ids)
+    return released
+
+
+########################################
+# Подтверждение заявок
+########################################
+def approve_bookings(bookings, approved_by, ids=None):
+    """
+    Подтверждает заявки одной транзакцией и возвращает результат
+    по каждой: [{'id', 'status': 'approved'} | {'id', 'error'}].
+
+    Заявки блокируются одним запросом; подтверждаются только 'requested'.
+    Брони, созданные с учётом мест (holds_seats), места уже держат.
+    Заявкам без них места нужны сейчас: по каждой сессии остаток
+    читается одним запросом, заявки набираются по порядку, пока он
+    не кончится, и списываются одним условным UPDATE на сессию
+    (во время flash sale — на счётчике Redis).
+
+    bookings — queryset доступных пользователю броней;
+    ids — порядок и состав результата (по умолчанию — все из bookings).
+    """
+    from .models import Booking
+
+    now = timezone.now()
+    scope = bookings if ids is None else bookings.filter(pk__in=ids)
+    # Счётчик Redis не откатывается с БД: при ошибке ExitStack вернёт места,
+    # списанные на нём, — в том числе если не прошёл сам коммит
+    with ExitStack() as flash_reservations, transaction.atomic():
+        rows = {
+            pk: (session_id, tour_id, status, seats, holds_seats, agency_id, user_id)
+            for pk, session_id, tour_id, status, seats, holds_seats, agency_id, user_id in (
+                Booking.objects
+                .filter(pk__in=scope.values('pk'))
+                .select_for_update()
+                .order_by('pk')
+                .values_list(
+                    'pk', 'session_id', 'tour_id', 'status', 'seats_reserved', 'holds_seats',
+                    'agency_id', 'user_id',
+                )
+            )
+        }
+        if ids is None:
+            ids = list(rows)
+
+        results = {}
+        approved = []
+        needs_seats = defaultdict(list)
+        for pk in ids:
+            row = rows.get(pk)
+            if row is None:
+                results[pk] = {'id': pk, 'error': "Заявка не найдена."}
+            elif row[2] != 'requested':
+                results[pk] = {'id': pk, 'error': "Эта заявка уже обработана."}
+            elif row[4]:
+                approved.append(pk)
+            else:
+                needs_seats[row[0]].append(pk)
+
+        sessions = {
+            pk: (available, flash_until)
+            for pk, available, flash_until in (
+                TourSession.objects.select_for_update()
+                .filter(pk__in=needs_seats)
+                .values_list('pk', 'available_seats', 'flash_sale_until')
+            )
+        }
+        for session_id, pks in needs_seats.items():
+            available, flash_until = sessions[session_id]
+            if flash_until is not None:
+                # Flash sale: каждая заявка списывает места на счётчике сама
+                session = TourSession(pk=session_id, available_seats=available, flash_sale_until=flash_until)
+                for pk in pks:
+                    try:
+                        flash_reservations.enter_context(seat_reservation(session, rows[pk][3]))
+                        approved.append(pk)
+                    except SeatsUnavailable as exc:
+                        results[pk] = {'id': pk, 'error': f"Недостаточно мест. Осталось {exc.available}."}
+                continue
+
+            taken = []
+            for pk in pks:
+                if rows[pk][3] <= available:
+                    available -= rows[pk][3]
+                    taken.append(pk)
+                else:
+                    results[pk] = {'id': pk, 'error': f"Недостаточно мест. Осталось {available}."}
+            total = sum(rows[pk][3] for pk in taken)
+            if total and not TourSession.objects.filter(
+                pk=session_id, flash_sale_until__isnull=True, available_seats__gte=total,
+            ).update(available_seats=F('available_seats') - total):
+                # Остаток изменился после чтения (БД без блокировок строк)
+                for pk in taken:
+                    results[pk] = {'id': pk, 'error': "Недостаточно мест. Повторите попытку."}
+                taken = []
+            approved.extend(taken)
+
+        if approved:
+            Booking.objects.filter(pk__in=approved, status='requested').update(
+                status='approved',
+                approved_by=approved_by,
+                approved_at=now,
+                expires_at=now + APPROVAL_TTL,
+                holds_seats=True,
+            )
+            for pk in approved:
+                results[pk] = {'id': pk, 'status': 'approved'}
+            publish_booking_events('approved', [
+                (pk, rows[pk][0], rows[pk][1], rows[pk][5], rows[pk][6], rows[pk][3]) for pk in approved
+            ])
+
+    if approved:
+        # update() не отправляет post_save — обновляем витрину сами
+        tour_ids = {rows[pk][1] for pk in approved}
+        invalidate_catalog_cache()
+        schedule_document_rebuild(tour_ids)
+        schedule_aggregates_refresh(tour_ids)
+    return [results[pk] for pk in ids]
+
+
+def reject_bookings(bookings, approved_by, cancel_reason, ids=None):
+    """
+    Отклоняет заявки одной транзакцией (release_bookings: места и промокоды
+    возвращаются там же) и возвращает результат по каждой —
+    в том же формате, что approve_bookings.
+    """
+    scope = bookings if ids is None else bookings.filter(pk__in=ids)
+    with transaction.atomic():
+        if ids is None:
+            ids = list(scope.order_by('pk').values_list('pk', flat=True))
+        rejected = set(release_booking_ids(
+            scope.filter(status='requested'),
+            'cancelled',
+            from_statuses=('requested',),
+            approved_by=approved_by,
+            approved_at=timezone.now(),
+            cancel_reason=cancel_reason,
+        ))
+        found = set(scope.values_list('pk', flat=True)) if len(rejected) < len(ids) else set(ids)
+
+    results = []
+    for pk in ids:
+        if pk in rejected:
+            results.append({'id': pk, 'status': 'cancelled'})
+        elif pk in found:
+            results.append({'id': pk, 'error': "Эта заявка уже обработана."})
+        else:
+            results.append({'id': pk, 'error': "Заявка не найдена."})
+    return results
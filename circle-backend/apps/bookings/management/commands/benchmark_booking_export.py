@@ -0,0 +1,110 @@
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+from django.utils import timezone
+
+from apps.agencies.models import TravelAgency
+from apps.bookings.exports import CHUNK_SIZE, WRITERS, iter_export
+from apps.bookings.models import Booking
+from apps.tours.models import Tour, TourCategory, TourSession
+from apps.users.models import User
+
+
+SESSIONS = 20
+USERS = 500
+INSERT_CHUNK = 10000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк потоковой выгрузки броней (apps.bookings.exports) на разных объёмах: '
+        'строк/с, МБ/с и пик памяти Python (tracemalloc) для каждого формата. '
+        'Пик не должен расти с числом строк. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10000,100000', help='Объёмы через запятую, например 10000,1000000')
+        parser.add_argument('--formats', default=','.join(WRITERS), help='Форматы: csv,xlsx,ndjson')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Строк за один запрос к БД')
+        parser.add_argument('--no-memory', action='store_true', help='Без прохода с tracemalloc')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['rows'].split(',') if scale]
+        formats = [fmt for fmt in options['formats'].split(',') if fmt]
+        unknown = set(formats) - set(WRITERS)
+        if unknown:
+            raise CommandError(f'Неизвестные форматы: {", ".join(sorted(unknown))}')
+
+        for scale in scales:
+            self.stdout.write(self.style.HTTP_INFO(f'🚀 Строк: {scale}'))
+            try:
+                with transaction.atomic():
+                    queryset = self.build(scale)
+                    for file_format in formats:
+                        self.measure(queryset, file_format, scale, options)
+                    raise Rollback()
+            except Rollback:
+                pass
+        self.stdout.write(self.style.SUCCESS('✅ Готово'))
+
+    def build(self, scale):
+        started = time.perf_counter()
+        suffix = f'{int(time.time())}-{scale}'
+        today = timezone.localdate()
+        now = timezone.now()
+
+        agency = TravelAgency.objects.create(name=f'Export benchmark {suffix}')
+        category = TourCategory.objects.create(name=f'Export benchmark {suffix}')
+        tour = Tour.objects.create(
+            title='Export benchmark tour', slug=f'export-benchmark-{suffix}', agency=agency, type=category,
+            description='Описание', price_from=Decimal('100000'), base_price=Decimal('100000'),
+            duration_days=3, duration_nights=2,
+        )
+        sessions = TourSession.objects.bulk_create([
+            TourSession(tour=tour, date_start=today + timedelta(days=i), capacity=10 ** 6, available_seats=10 ** 6)
+            for i in range(SESSIONS)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'export-{suffix}-{i}', first_name='Участник', last_name=str(i), phone_number=f'+99890{i:07d}')
+            for i in range(USERS)
+        ])
+        for offset in range(0, scale, INSERT_CHUNK):
+            Booking.objects.bulk_create([
+                Booking(
+                    user=users[i % USERS], tour=tour, agency=agency, session=sessions[i % SESSIONS],
+                    seats_reserved=1 + i % 3, base_price=Decimal('100000'), discount_amount=Decimal('5000'),
+                    final_price_paid=Decimal('95000'), status='paid', approved_at=now,
+                    comment='Комментарий', selected_transport='Автобус',
+                )
+                for i in range(offset, min(scale, offset + INSERT_CHUNK))
+            ])
+        reset_queries()  # DEBUG копит SQL вставок
+        self.stdout.write(f'   данные за {time.perf_counter() - started:.1f} c')
+        return Booking.objects.filter(agency=agency)
+
+    def measure(self, queryset, file_format, scale, options):
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        size = sum(len(block) for block in iter_export(queryset, file_format, chunk_size=chunk_size))
+        seconds = time.perf_counter() - started
+        line = (
+            f'   {file_format:>6}: {scale / seconds:,.0f} строк/с, {size / seconds / 2 ** 20:.1f} МБ/с, '
+            f'{size / 2 ** 20:.1f} МБ за {seconds:.2f} c'
+        )
+
+        if not options['no_memory']:
+            tracemalloc.start()
+            for _ in iter_export(queryset, file_format, chunk_size=chunk_size):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            line += f', пик памяти {peak / 2 ** 20:.1f} МБ'
+        self.stdout.write(line)
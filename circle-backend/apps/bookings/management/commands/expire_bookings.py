@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.bookings.expiry import EXPIRY_CHUNK_SIZE, expire_overdue_bookings
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит просроченные заявки и подтверждения в expired чанками, возвращая места '
+        'и использования промокодов (то же, что задача celery beat)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=EXPIRY_CHUNK_SIZE, help='Броней в одном UPDATE')
+        parser.add_argument('--max-chunks', type=int, help='Остановиться после N чанков')
+
+    def handle(self, *args, **options):
+        metrics = expire_overdue_bookings(chunk_size=options['chunk_size'], max_chunks=options['max_chunks'])
+        self.stdout.write(
+            f"   чанков: {metrics['chunks']}, за {metrics['seconds']} c ({metrics['rows_per_second'] or 0} броней/с), "
+            f"самая старая просрочка: {metrics['max_lag_seconds']} c, осталось: {metrics['remaining']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Истекло броней: {metrics['expired']}"))
@@ -0,0 +1,241 @@
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from apps.agencies.models import TravelAgency
+from apps.bookings.inventory import SeatsUnavailable, reserve_seats
+from apps.tours.flash_sale import (
+    close_flash_sale, get_flash_seats, open_flash_sale, reconcile_flash_sales, release_flash_seats,
+)
+from apps.tours.models import Tour, TourSession
+
+
+WINDOW = 0.1  # окно для оценки стабильности пропускной способности, c
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка flash sale: тысячи параллельных попыток списать места '
+        'одной сессии через счётчик Redis (скрипт Lua), с возвратами и фоновой сверкой '
+        'в БД. Проверяет, что места не проданы сверх остатка и остаток в БД сходится.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=64, help='Параллельных потоков')
+        parser.add_argument('--attempts', type=int, default=5000, help='Всего попыток бронирования')
+        parser.add_argument('--seats', type=int, default=500, help='Остаток мест сессии до распродажи')
+        parser.add_argument('--max-per-booking', type=int, default=3, help='Мест в одной брони: от 1 до N')
+        parser.add_argument(
+            '--release-rate', type=float, default=0.05,
+            help='Доля успешных списаний, которые сразу возвращаются (отмена брони)',
+        )
+        parser.add_argument(
+            '--reconcile-every', type=float, default=0.05,
+            help='Период фоновой сверки счётчика с БД во время нагрузки, c (0 — без сверки)',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.options = options
+        agency, session = self.create_fixture()
+        try:
+            self.stdout.write(self.style.HTTP_INFO(
+                f"🚀 Flash sale: {options['attempts']} попыток в {options['threads']} потоков "
+                f"на {options['seats']} мест"
+            ))
+            result = self.run(session)
+            self.report(result)
+            self.verify(result, session)
+        finally:
+            close_flash_sale(session.pk)
+            Tour.objects.filter(agency=agency).delete()
+            agency.delete()
+
+    ########################################
+    # Данные
+    ########################################
+    def create_fixture(self):
+        suffix = f'{int(time.time())}-{random.randint(0, 10**6)}'
+        agency = TravelAgency.objects.create(name=f'Flash {suffix}')
+        tour = Tour.objects.create(
+            title='Flash tour', slug=f'flash-{suffix}', agency=agency, description='',
+            price_from=Decimal('100000'), base_price=Decimal('100000'),
+            duration_days=1, duration_nights=0,
+        )
+        session = TourSession.objects.create(
+            tour=tour, date_start=timezone.localdate() + timedelta(days=30),
+            capacity=self.options['seats'], available_seats=self.options['seats'],
+            flash_sale_until=timezone.now() + timedelta(hours=1),
+        )
+        open_flash_sale(session.pk)
+        return agency, session
+
+    ########################################
+    # Прогон
+    ########################################
+    def run(self, session):
+        threads = self.options['threads']
+        initial = self.options['seats']
+
+        lock = threading.Lock()
+        remaining = [self.options['attempts']]
+        stats = {'booked': 0, 'seats_booked': 0, 'rejected': 0, 'released': 0, 'seats_released': 0}
+        latencies = []
+        finished_at = []
+        min_seen = [initial]
+        stop = threading.Event()
+        barrier = threading.Barrier(threads + 1)
+
+        def take():
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker(index):
+            rng = random.Random(self.options['seed'] + index)
+            local = {key: 0 for key in stats}
+            local_latencies = []
+            local_finished = []
+            barrier.wait()
+            try:
+                while take():
+                    seats = rng.randint(1, self.options['max_per_booking'])
+                    started = time.perf_counter()
+                    try:
+                        if reserve_seats(session, seats) != 'flash':
+                            raise CommandError('Списание прошло мимо счётчика распродажи')
+                        local['booked'] += 1
+                        local['seats_booked'] += seats
+                        if rng.random() < self.options['release_rate']:
+                            release_flash_seats(session.pk, seats)
+                            local['released'] += 1
+                            local['seats_released'] += seats
+                    except SeatsUnavailable:
+                        local['rejected'] += 1
+                    now = time.perf_counter()
+                    local_latencies.append(now - started)
+                    local_finished.append(now)
+            finally:
+                connection.close()
+            with lock:
+                for key, value in local.items():
+                    stats[key] += value
+                latencies.extend(local_latencies)
+                finished_at.extend(local_finished)
+
+        def monitor():
+            # Остаток на счётчике не должен уходить в минус ни в один момент
+            while not stop.is_set():
+                left = get_flash_seats(session.pk)
+                if left is not None:
+                    min_seen[0] = min(min_seen[0], left)
+                time.sleep(0.001)
+
+        def reconciler():
+            # Фоновая запись остатка в БД, как celery beat во время распродажи
+            interval = self.options['reconcile_every']
+            while not stop.wait(interval):
+                reconcile_flash_sales()
+            connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        helpers = [threading.Thread(target=monitor)]
+        if self.options['reconcile_every'] > 0:
+            helpers.append(threading.Thread(target=reconciler))
+        for thread in workers + helpers:
+            thread.start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in helpers:
+            thread.join()
+        close_old_connections()
+
+        return {
+            **stats,
+            'initial': initial,
+            'elapsed': elapsed,
+            'latencies': sorted(latencies),
+            'windows': self.windows(started, finished_at),
+            'min_seen': min_seen[0],
+            'counter': get_flash_seats(session.pk),
+        }
+
+    @staticmethod
+    def windows(started, finished_at):
+        """Операций в секунду по окнам WINDOW (без последнего неполного)"""
+        if not finished_at:
+            return []
+        counts = {}
+        for moment in finished_at:
+            bucket = int((moment - started) / WINDOW)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        last = max(counts)
+        return [counts.get(bucket, 0) / WINDOW for bucket in range(last)]
+
+    ########################################
+    # Отчёт
+    ########################################
+    def report(self, result):
+        latencies = result['latencies']
+        total = len(latencies)
+        sold = result['seats_booked'] - result['seats_released']
+        self.stdout.write(
+            f"   попыток: {total}, броней: {result['booked']} ({result['seats_booked']} мест), "
+            f"отказов: {result['rejected']}, возвратов: {result['released']} ({result['seats_released']} мест)"
+        )
+        self.stdout.write(
+            f"   продано: {sold} из {result['initial']}, остаток на счётчике: {result['counter']}, "
+            f"минимум в процессе: {result['min_seen']}"
+        )
+        if total:
+            self.stdout.write(
+                f"   {total / result['elapsed']:.0f} оп/с, задержка p50 {self.pct(latencies, 50):.2f} мс, "
+                f"p95 {self.pct(latencies, 95):.2f} мс, p99 {self.pct(latencies, 99):.2f} мс"
+            )
+        windows = result['windows']
+        if len(windows) > 1 and statistics.mean(windows):
+            variation = statistics.pstdev(windows) / statistics.mean(windows)
+            self.stdout.write(
+                f"   по окнам {WINDOW * 1000:.0f} мс: {min(windows):.0f}–{max(windows):.0f} оп/с, "
+                f"разброс {variation:.0%}"
+            )
+
+    @staticmethod
+    def pct(values, percent):
+        index = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[index] * 1000
+
+    def verify(self, result, session):
+        problems = []
+        sold = result['seats_booked'] - result['seats_released']
+        if sold > result['initial'] or result['min_seen'] < 0:
+            problems.append(f"продано сверх остатка: {sold} из {result['initial']}")
+        if result['counter'] != result['initial'] - sold:
+            problems.append('счётчик не сходится со списаниями и возвратами')
+
+        # Закрытие распродажи переносит остаток в БД
+        left = close_flash_sale(session.pk)
+        session.refresh_from_db(fields=['available_seats', 'flash_sale_until'])
+        self.stdout.write(f"   после закрытия: available_seats = {session.available_seats}")
+        if left != result['counter'] or session.available_seats != result['counter']:
+            problems.append('остаток в БД не совпал со счётчиком')
+        if session.flash_sale_until is not None:
+            problems.append('режим распродажи не снят')
+
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('✅ Продаж сверх остатка нет, остаток в БД сходится'))
@@ -0,0 +1,245 @@
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from apps.agencies.models import TravelAgency
+from apps.tours.models import Tour, TourSession, PromoCode
+
+
+WINDOW = 0.1  # окно для оценки стабильности пропускной способности, c
+
+
+def legacy_redeem(code):
+    """
+    Эталон прежнего поведения: прочитать, проверить, записать used_count + 1.
+    Запись через update() вместо save() — та же гонка, но без сигналов витрины.
+    """
+    code = PromoCode.objects.get(pk=code.pk)
+    if not code.is_currently_valid():
+        return False
+    PromoCode.objects.filter(pk=code.pk).update(used_count=code.used_count + 1)
+    return True
+
+
+def atomic_redeem(code):
+    return code.redeem()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка погашения промокода: много потоков на один код. '
+        'Проверяет, что лимит не превышается и счётчик сходится с учётом возвратов; '
+        'с --legacy дополнительно показывает гонку прежнего read-modify-write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Параллельных потоков')
+        parser.add_argument('--attempts', type=int, default=2000, help='Всего попыток погашения')
+        parser.add_argument('--limit', type=int, default=500, help='usage_limit промокода')
+        parser.add_argument(
+            '--release-rate', type=float, default=0.1,
+            help='Доля успешных погашений, которые сразу возвращаются (отмена брони)',
+        )
+        parser.add_argument('--legacy', action='store_true', help='Прогнать и прежнюю реализацию для сравнения')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.options = options
+        agency, code = self.create_fixture()
+        try:
+            if options['legacy']:
+                self.reset(code)
+                self.stdout.write(self.style.HTTP_INFO('🐢 Прежняя реализация (read-modify-write)'))
+                legacy = self.run(code, legacy_redeem, release_rate=0)
+                self.report(legacy, code)
+
+            self.reset(code)
+            self.stdout.write(self.style.HTTP_INFO('🚀 Условный UPDATE (PromoCode.redeem)'))
+            result = self.run(code, atomic_redeem, release_rate=options['release_rate'])
+            self.report(result, code)
+            self.verify(result, code)
+        finally:
+            Tour.objects.filter(agency=agency).delete()
+            agency.delete()
+
+    ########################################
+    # Данные
+    ########################################
+    def create_fixture(self):
+        now = timezone.now()
+        suffix = f'{int(time.time())}-{random.randint(0, 10**6)}'
+        agency = TravelAgency.objects.create(name=f'Stress {suffix}')
+        tour = Tour.objects.create(
+            title='Stress tour', slug=f'stress-{suffix}', agency=agency, description='',
+            price_from=Decimal('100000'), base_price=Decimal('100000'),
+            duration_days=1, duration_nights=0,
+        )
+        session = TourSession.objects.create(
+            tour=tour, date_start=timezone.localdate() + timedelta(days=30), capacity=20, available_seats=20,
+        )
+        code = PromoCode.objects.create(
+            code=f'STRESS-{suffix}', session=session, discount_percent=Decimal('10'),
+            usage_limit=self.options['limit'],
+            valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1),
+        )
+        return agency, code
+
+    def reset(self, code):
+        PromoCode.objects.filter(pk=code.pk).update(used_count=0)
+
+    ########################################
+    # Прогон
+    ########################################
+    def run(self, code, redeem, release_rate):
+        threads = self.options['threads']
+        attempts = self.options['attempts']
+        limit = self.options['limit']
+
+        lock = threading.Lock()
+        remaining = [attempts]
+        stats = {'redeemed': 0, 'rejected': 0, 'released': 0, 'errors': 0}
+        latencies = []
+        finished_at = []
+        max_seen = [0]
+        stop = threading.Event()
+        barrier = threading.Barrier(threads + 1)
+
+        def take():
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker(index):
+            rng = random.Random(self.options['seed'] + index)
+            local = {key: 0 for key in stats}
+            local_latencies = []
+            local_finished = []
+            barrier.wait()
+            try:
+                while take():
+                    started = time.perf_counter()
+                    try:
+                        if redeem(code):
+                            local['redeemed'] += 1
+                            if rng.random() < release_rate:
+                                PromoCode.release_uses({code.pk: 1})
+                                local['released'] += 1
+                        else:
+                            local['rejected'] += 1
+                    except OperationalError:
+                        local['errors'] += 1
+                    now = time.perf_counter()
+                    local_latencies.append(now - started)
+                    local_finished.append(now)
+            finally:
+                connection.close()
+            with lock:
+                for key, value in local.items():
+                    stats[key] += value
+                latencies.extend(local_latencies)
+                finished_at.extend(local_finished)
+
+        def monitor():
+            # Счётчик не должен превышать лимит ни в один момент
+            while not stop.is_set():
+                try:
+                    used = PromoCode.objects.filter(pk=code.pk).values_list('used_count', flat=True).get()
+                    max_seen[0] = max(max_seen[0], used)
+                except OperationalError:
+                    pass
+                time.sleep(0.005)
+            connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        watcher = threading.Thread(target=monitor)
+        for thread in workers:
+            thread.start()
+        watcher.start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        watcher.join()
+        close_old_connections()
+
+        return {
+            **stats,
+            'limit': limit,
+            'elapsed': elapsed,
+            'latencies': sorted(latencies),
+            'windows': self.windows(started, finished_at),
+            'max_seen': max_seen[0],
+            'used_count': PromoCode.objects.values_list('used_count', flat=True).get(pk=code.pk),
+        }
+
+    @staticmethod
+    def windows(started, finished_at):
+        """Операций в секунду по окнам WINDOW (без последнего неполного)"""
+        if not finished_at:
+            return []
+        counts = {}
+        for moment in finished_at:
+            bucket = int((moment - started) / WINDOW)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        last = max(counts)
+        return [counts.get(bucket, 0) / WINDOW for bucket in range(last)]
+
+    ########################################
+    # Отчёт
+    ########################################
+    def report(self, result, code):
+        latencies = result['latencies']
+        total = len(latencies)
+        overshoot = max(0, result['redeemed'] - result['released'] - result['limit'])
+        lost = result['redeemed'] - result['released'] - result['used_count']
+
+        self.stdout.write(
+            f"   попыток: {total}, погашено: {result['redeemed']}, отказов: {result['rejected']}, "
+            f"возвратов: {result['released']}, ошибок БД: {result['errors']}"
+        )
+        self.stdout.write(
+            f"   used_count: {result['used_count']} / лимит {result['limit']}, "
+            f"максимум в процессе: {result['max_seen']}"
+        )
+        self.stdout.write(f"   перерасход лимита: {overshoot}, потерянных обновлений: {lost}")
+        if total:
+            self.stdout.write(
+                f"   {total / result['elapsed']:.0f} оп/с, задержка p50 {self.pct(latencies, 50):.2f} мс, "
+                f"p95 {self.pct(latencies, 95):.2f} мс, p99 {self.pct(latencies, 99):.2f} мс"
+            )
+        windows = result['windows']
+        if len(windows) > 1 and statistics.mean(windows):
+            variation = statistics.pstdev(windows) / statistics.mean(windows)
+            self.stdout.write(
+                f"   по окнам {WINDOW * 1000:.0f} мс: {min(windows):.0f}–{max(windows):.0f} оп/с, "
+                f"разброс {variation:.0%}"
+            )
+
+    @staticmethod
+    def pct(values, percent):
+        index = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[index] * 1000
+
+    def verify(self, result, code):
+        problems = []
+        if result['max_seen'] > result['limit'] or result['used_count'] > result['limit']:
+            problems.append('счётчик превысил лимит')
+        if result['redeemed'] - result['released'] != result['used_count']:
+            problems.append('счётчик не сходится с погашениями и возвратами')
+        if result['errors']:
+            problems.append(f"ошибок БД: {result['errors']}")
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('✅ Перерасхода нет, счётчик сходится'))
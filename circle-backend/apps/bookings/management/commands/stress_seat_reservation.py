@@ -0,0 +1,338 @@
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.agencies.models import TravelAgency
+from apps.bookings.inventory import HOLDING_STATUSES, release_bookings
+from apps.bookings.models import Booking
+from apps.bookings.serializers import ApproveBookingSerializer, CreateBookingSerializer
+from apps.tours.models import Tour, TourSession
+from apps.users.models import User
+
+
+WINDOW = 0.1  # окно для оценки стабильности пропускной способности, c
+
+
+def legacy_book(session, user, seats):
+    """
+    Эталон прежнего поведения, если бы места списывались: остаток читается
+    и проверяется в validate() вне транзакции, затем пишется остаток - n.
+    Запись через update() — та же гонка.
+    """
+    left = TourSession.objects.values_list('available_seats', flat=True).get(pk=session.pk)
+    if left < seats:
+        return None
+    with transaction.atomic():
+        booking = Booking.objects.create(
+            user=user, session=session, tour_id=session.tour_id, seats_reserved=seats,
+            base_price=Decimal('100000'), final_price_paid=Decimal('100000'), holds_seats=True,
+        )
+        TourSession.objects.filter(pk=session.pk).update(available_seats=left - seats)
+    return booking
+
+
+def atomic_book(session, user, seats, factory=RequestFactory()):
+    request = factory.post('/api/v1/bookings/bookings/')
+    request.user = user
+    serializer = CreateBookingSerializer(
+        data={'session': session.pk, 'seats_reserved': seats}, context={'request': request},
+    )
+    try:
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+    except serializers.ValidationError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка учёта мест: много потоков бронируют одну сессию через '
+        'CreateBookingSerializer (условный UPDATE available_seats), часть броней '
+        'сразу отменяется, затем каждую заявку подтверждают два потока одновременно. '
+        'Проверяет, что мест не продано больше вместимости и остаток сходится; '
+        'с --legacy дополнительно показывает гонку read-modify-write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Параллельных потоков')
+        parser.add_argument('--attempts', type=int, default=1000, help='Всего попыток бронирования')
+        parser.add_argument('--capacity', type=int, default=300, help='Вместимость сессии')
+        parser.add_argument('--max-per-booking', type=int, default=3, help='Мест в одной брони: от 1 до N')
+        parser.add_argument(
+            '--cancel-rate', type=float, default=0.1,
+            help='Доля успешных броней, которые сразу отменяются',
+        )
+        parser.add_argument('--legacy', action='store_true', help='Прогнать и прежнюю реализацию для сравнения')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.options = options
+        agency, session, users = self.create_fixture()
+        try:
+            if options['legacy']:
+                self.reset(session)
+                self.stdout.write(self.style.HTTP_INFO('🐢 Прежняя реализация (read-modify-write)'))
+                legacy = self.run(session, users, legacy_book, cancel_rate=0)
+                self.report(legacy)
+
+            self.reset(session)
+            self.stdout.write(self.style.HTTP_INFO('🚀 Условный UPDATE (CreateBookingSerializer)'))
+            result = self.run(session, users, atomic_book, cancel_rate=options['cancel_rate'])
+            self.report(result)
+            approvals = self.approve_twice(session)
+            self.verify(result, approvals, session)
+        finally:
+            Booking.objects.filter(session=session).delete()
+            Tour.objects.filter(agency=agency).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+            agency.delete()
+
+    ########################################
+    # Данные
+    ########################################
+    def create_fixture(self):
+        suffix = f'{int(time.time())}-{random.randint(0, 10**6)}'
+        agency = TravelAgency.objects.create(name=f'Seats {suffix}')
+        tour = Tour.objects.create(
+            title='Seats tour', slug=f'seats-{suffix}', agency=agency, description='',
+            price_from=Decimal('100000'), base_price=Decimal('100000'),
+            duration_days=1, duration_nights=0,
+        )
+        session = TourSession.objects.create(
+            tour=tour, date_start=timezone.localdate() + timedelta(days=30),
+            capacity=self.options['capacity'], available_seats=self.options['capacity'],
+        )
+        users = User.objects.bulk_create([
+            User(username=f'seats-{suffix}-{i}') for i in range(self.options['threads'])
+        ])
+        return agency, session, users
+
+    def reset(self, session):
+        Booking.objects.filter(session=session).delete()
+        TourSession.objects.filter(pk=session.pk).update(available_seats=session.capacity)
+
+    ########################################
+    # Прогон
+    ########################################
+    def run(self, session, users, book, cancel_rate):
+        threads = self.options['threads']
+
+        lock = threading.Lock()
+        remaining = [self.options['attempts']]
+        stats = {'booked': 0, 'seats_booked': 0, 'rejected': 0, 'cancelled': 0, 'errors': 0}
+        latencies = []
+        finished_at = []
+        min_seen = [session.capacity]
+        stop = threading.Event()
+        barrier = threading.Barrier(threads + 1)
+
+        def take():
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker(index):
+            rng = random.Random(self.options['seed'] + index)
+            user = users[index]
+            local = {key: 0 for key in stats}
+            local_latencies = []
+            local_finished = []
+            barrier.wait()
+            try:
+                while take():
+                    seats = rng.randint(1, self.options['max_per_booking'])
+                    started = time.perf_counter()
+                    try:
+                        booking = book(session, user, seats)
+                        if booking is None:
+                            local['rejected'] += 1
+                        else:
+                            local['booked'] += 1
+                            local['seats_booked'] += seats
+                            if rng.random() < cancel_rate:
+                                release_bookings(Booking.objects.filter(pk=booking.pk), 'cancelled')
+                                local['cancelled'] += 1
+                    except OperationalError:
+                        local['errors'] += 1
+                    now = time.perf_counter()
+                    local_latencies.append(now - started)
+                    local_finished.append(now)
+            finally:
+                connection.close()
+            with lock:
+                for key, value in local.items():
+                    stats[key] += value
+                latencies.extend(local_latencies)
+                finished_at.extend(local_finished)
+
+        def monitor():
+            # Остаток не должен уходить в минус ни в один момент
+            while not stop.is_set():
+                try:
+                    left = TourSession.objects.values_list('available_seats', flat=True).get(pk=session.pk)
+                    min_seen[0] = min(min_seen[0], left)
+                except OperationalError:
+                    pass
+                time.sleep(0.005)
+            connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        watcher = threading.Thread(target=monitor)
+        for thread in workers:
+            thread.start()
+        watcher.start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        watcher.join()
+        close_old_connections()
+
+        held = (
+            Booking.objects.filter(session=session, status__in=HOLDING_STATUSES)
+            .aggregate(seats=Sum('seats_reserved'))['seats'] or 0
+        )
+        return {
+            **stats,
+            'capacity': session.capacity,
+            'elapsed': elapsed,
+            'latencies': sorted(latencies),
+            'windows': self.windows(started, finished_at),
+            'min_seen': min_seen[0],
+            'held': held,
+            'available': TourSession.objects.values_list('available_seats', flat=True).get(pk=session.pk),
+        }
+
+    def approve_twice(self, session):
+        """Каждую заявку подтверждают два потока сразу: пройти должно ровно одно"""
+        booking_ids = list(
+            Booking.objects.filter(session=session, status='requested').values_list('pk', flat=True)
+        )
+        manager = User.objects.filter(pk__in=Booking.objects.filter(session=session).values('user')).first()
+        lock = threading.Lock()
+        stats = {'approved': 0, 'duplicates': 0, 'errors': 0}
+        # Исходы по каждой заявке: оба потока могут откатиться с ошибкой БД
+        outcomes = {booking_id: [] for booking_id in booking_ids}
+
+        def approve(booking_id, barrier):
+            barrier.wait()
+            try:
+                booking = Booking.objects.select_related('session').get(pk=booking_id)
+                serializer = ApproveBookingSerializer(booking, data={}, partial=True)
+                try:
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save(approved_by=manager)
+                    key = 'approved'
+                except serializers.ValidationError:
+                    key = 'duplicates'
+            except OperationalError:
+                key = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                stats[key] += 1
+                outcomes[booking_id].append(key)
+
+        started = time.perf_counter()
+        for booking_id in booking_ids:
+            barrier = threading.Barrier(2)
+            pair = [threading.Thread(target=approve, args=(booking_id, barrier)) for _ in range(2)]
+            for thread in pair:
+                thread.start()
+            for thread in pair:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        close_old_connections()
+
+        self.stdout.write(
+            f"   подтверждений по {len(booking_ids)} заявкам (по два потока): прошло {stats['approved']}, "
+            f"отклонено как повтор {stats['duplicates']}, ошибок БД {stats['errors']}, за {elapsed:.1f} c"
+        )
+        # Ровно одно подтверждение, если хотя бы один поток дошёл до проверки статуса
+        stats['broken'] = sum(
+            keys.count('approved') != (1 if keys.count('errors') < 2 else 0)
+            for keys in outcomes.values()
+        )
+        return {**stats, 'requests': len(booking_ids)}
+
+    @staticmethod
+    def windows(started, finished_at):
+        """Операций в секунду по окнам WINDOW (без последнего неполного)"""
+        if not finished_at:
+            return []
+        counts = {}
+        for moment in finished_at:
+            bucket = int((moment - started) / WINDOW)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        last = max(counts)
+        return [counts.get(bucket, 0) / WINDOW for bucket in range(last)]
+
+    ########################################
+    # Отчёт
+    ########################################
+    def report(self, result):
+        latencies = result['latencies']
+        total = len(latencies)
+        oversold = max(0, result['held'] - result['capacity'])
+        self.stdout.write(
+            f"   попыток: {total}, броней: {result['booked']} ({result['seats_booked']} мест), "
+            f"отказов: {result['rejected']}, отмен: {result['cancelled']}, ошибок БД: {result['errors']}"
+        )
+        self.stdout.write(
+            f"   держат места: {result['held']} / вместимость {result['capacity']}, "
+            f"available_seats: {result['available']}, минимум в процессе: {result['min_seen']}"
+        )
+        self.stdout.write(
+            f"   продано сверх вместимости: {oversold}, "
+            f"расхождение остатка: {result['capacity'] - result['held'] - result['available']}"
+        )
+        if total:
+            self.stdout.write(
+                f"   {total / result['elapsed']:.0f} оп/с, задержка p50 {self.pct(latencies, 50):.2f} мс, "
+                f"p95 {self.pct(latencies, 95):.2f} мс, p99 {self.pct(latencies, 99):.2f} мс"
+            )
+        windows = result['windows']
+        if len(windows) > 1 and statistics.mean(windows):
+            variation = statistics.pstdev(windows) / statistics.mean(windows)
+            self.stdout.write(
+                f"   по окнам {WINDOW * 1000:.0f} мс: {min(windows):.0f}–{max(windows):.0f} оп/с, "
+                f"разброс {variation:.0%}"
+            )
+
+    @staticmethod
+    def pct(values, percent):
+        index = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[index] * 1000
+
+    def verify(self, result, approvals, session):
+        problems = []
+        if result['held'] > result['capacity'] or result['min_seen'] < 0:
+            problems.append('продано больше вместимости')
+        available = TourSession.objects.values_list('available_seats', flat=True).get(pk=session.pk)
+        if result['held'] + available != result['capacity']:
+            problems.append('остаток не сходится с бронями')
+        if approvals['broken']:
+            problems.append('заявка подтверждена дважды или не подтверждена')
+        errors = result['errors'] + approvals['errors']
+        if errors:
+            # Не нарушение учёта: попытка откатилась целиком.
+            # На SQLite так заканчивается ожидание блокировки записи
+            self.stdout.write(self.style.WARNING(f'   ⚠️ попыток, откатившихся с ошибкой БД: {errors}'))
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('✅ Мест сверх вместимости нет, остаток сходится'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='holds_seats',
+            field=models.BooleanField(default=False, help_text='Места списаны с остатка сессии и вернутся при отмене или истечении'),
+        ),
+    ]
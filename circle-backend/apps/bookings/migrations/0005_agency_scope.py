@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0002_initial'),
+        ('bookings', '0004_booking_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='agency',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='Агентство тура (копия session.tour.agency) для очередей менеджеров', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.travelagency'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['agency', 'status', '-created_at'], name='booking_agency_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0005_agency_scope'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)'), ('ndjson', 'NDJSON')], default='csv', max_length=10)),
+                ('filters', models.JSONField(blank=True, default=dict, help_text='date_from, date_to, status')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Собирается'), ('ready', 'Готова'), ('failed', 'Ошибка')], default='pending', max_length=20)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='exports/bookings/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Booking Export',
+                'verbose_name_plural': 'Booking Exports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def set_request_expiry(apps, schema_editor):
+    """
+    Заявкам, созданным до срока REQUEST_TTL, — срок от момента миграции:
+    менеджеры успеют разобрать очередь, а места не зависнут навсегда
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    ttl = timedelta(hours=getattr(settings, 'BOOKING_REQUEST_TTL_HOURS', 48))
+    Booking.objects.filter(status='requested', expires_at__isnull=True).update(expires_at=timezone.now() + ttl)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_waitlist'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_request_expiry, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 
 from apps.users.models import User
+from apps.agencies.models import TravelAgency
 from apps.tours.models import Tour, TourSession, PromoCode
 
 
@@ -32,7 +33,21 @@ class Booking(models.Model):
         on_delete=models.CASCADE,
         related_name="bookings"
     )
+    agency = models.ForeignKey(
+        TravelAgency,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # ведущее поле составных индексов ниже
+        related_name="+",
+        help_text="Агентство тура (копия session.tour.agency) для очередей менеджеров"
+    )
     seats_reserved = models.PositiveIntegerField(default=1)
+    holds_seats = models.BooleanField(
+        default=False,
+        help_text="Места списаны с остатка сессии и вернутся при отмене или истечении"
+    )
     base_price = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -100,12 +115,21 @@ class Booking(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
+        indexes = [
+            # Поиск просроченных заявок и подтверждений (apps.bookings.expiry)
+            models.Index(fields=['status', 'expires_at'], name='booking_status_expiry_idx'),
+            # Очереди менеджера агентства: pending — один проход по диапазону индекса
+            models.Index(fields=['agency', 'status', '-created_at'], name='booking_agency_queue_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} → {self.session.tour.title} on {self.session.date_start} ({self.status})"
 
     def is_expired(self):
-        return self.expires_at and timezone.now() > self.expires_at
+        """Срок оплаты прошёл; в 'expired' бронь переводит expire_overdue_bookings"""
+        if self.status == 'expired':
+            return True
+        return self.status == 'approved' and bool(self.expires_at) and timezone.now() > self.expires_at
 
     def calculate_final_price(self):
         """
@@ -133,4 +157,109 @@ class Booking(models.Model):
         self.base_price = self.session.price * self.seats_reserved
         self.discount_amount = discount
         self.final_price_paid = total_price
-        self.save()
\ No newline at end of file
+        self.save()
+
+
+def visible_bookings(queryset, user):
+    """
+    Брони, доступные пользователю: суперпользователю — все, менеджеру —
+    своего агентства, остальным — свои. Общая для API и фоновых выгрузок.
+    """
+    if user.is_superuser:
+        return queryset
+
+    if user.is_staff and hasattr(user, 'agency') and user.agency:
+        # Менеджеры турагентства видят только свои туры (agency денормализован — без JOIN)
+        return queryset.filter(agency=user.agency)
+
+    # Обычный пользователь видит только свои бронирования
+    return queryset.filter(user=user)
+
+
+class BookingExport(models.Model):
+    """
+    Фоновая выгрузка броней в файл: большие выгрузки (больше
+    BOOKING_EXPORT_SYNC_LIMIT строк) не стримятся в запросе, а собираются
+    задачей celery (apps.bookings.exports) и скачиваются по готовности.
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+        ('ndjson', 'NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Собирается'),
+        ('ready', 'Готова'),
+        ('failed', 'Ошибка'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_exports')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(default=dict, blank=True, help_text="date_from, date_to, status")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    row_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/bookings/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Booking Export"
+        verbose_name_plural = "Booking Exports"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.file_format}, {self.status})"
+
+
+class WaitlistEntry(models.Model):
+    """
+    Место в листе ожидания сессии без свободных мест. Освободившиеся места
+    (отмена, отклонение, истечение брони) сразу предлагаются следующим
+    в очереди: они снимаются с остатка на время claim и ждут, пока
+    пользователь оформит бронь. Логика — apps.bookings.waitlist.
+    """
+    STATUS_CHOICES = [
+        ('waiting', 'В очереди'),
+        ('offered', 'Предложены места'),
+        ('claimed', 'Забронировано'),
+        ('expired', 'Предложение истекло'),
+        ('cancelled', 'Вышел из очереди'),
+    ]
+    ACTIVE_STATUSES = ('waiting', 'offered')
+
+    session = models.ForeignKey(TourSession, on_delete=models.CASCADE, related_name='waitlist_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    seats = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    offered_at = models.DateTimeField(null=True, blank=True)
+    offer_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="До этого времени предложенные места держатся за пользователем"
+    )
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+        ordering = ['session', 'pk']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'user'],
+                condition=models.Q(status__in=('waiting', 'offered')),
+                name='waitlist_active_entry_uniq',
+            ),
+        ]
+        indexes = [
+            # Очередь сессии по порядку записи и позиция в ней
+            models.Index(fields=['session', 'status', 'id'], name='waitlist_queue_idx'),
+            # Истёкшие предложения (refresh_waitlists)
+            models.Index(fields=['status', 'offer_expires_at'], name='waitlist_offer_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → session {self.session_id} ({self.status})"
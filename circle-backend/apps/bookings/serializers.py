@@ -1,18 +1,30 @@
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
+from contextlib import ExitStack
 from decimal import Decimal
 
-from apps.bookings.models import Booking
-from apps.tours.models import TourSession, PromoCode
+from apps.bookings.models import Booking, BookingExport, WaitlistEntry
+from apps.bookings.inventory import (
+    REQUEST_TTL, SeatsUnavailable, approve_bookings, publish_booking_events, release_bookings, seat_reservation,
+)
+from apps.bookings.waitlist import (
+    WaitlistError, join_waitlist, mark_offer_claimed, release_offer_hold, waitlist_position,
+)
+from apps.tours.models import TourSession
+from apps.tours.pricing import (
+    PricingContext, PricingError, check_availability, get_bonus_balance, quote_booking,
+)
 from apps.users.models import User
 from apps.referrals.models import ReferralPartner
+from apps.core.fieldsets import SparseFieldsetMixin
 from apps.tours.serializers import PromotionSerializer, PromoCodeSerializer
 
 
 ############################################
 # Simple User Serializer
 ############################################
-class BookingUserSerializer(serializers.ModelSerializer):
+class BookingUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name']
@@ -21,7 +33,7 @@ class BookingUserSerializer(serializers.ModelSerializer):
 ############################################
 # Session Serializer with Discounts
 ############################################
-class BookingSessionSerializer(serializers.ModelSerializer):
+class BookingSessionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tour_title = serializers.CharField(source='tour.title', read_only=True)
     promotions = PromotionSerializer(many=True, read_only=True)
     promo_codes = PromoCodeSerializer(many=True, read_only=True)
@@ -42,7 +54,7 @@ class BookingSessionSerializer(serializers.ModelSerializer):
 ############################################
 # Booking Detail Serializer
 ############################################
-class BookingDetailSerializer(serializers.ModelSerializer):
+class BookingDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = BookingUserSerializer(read_only=True)
     session = BookingSessionSerializer(read_only=True)
     approved_by = BookingUserSerializer(read_only=True)
@@ -70,6 +82,9 @@ class BookingDetailSerializer(serializers.ModelSerializer):
             'comment',
             'created_at'
         ]
+        # Статус меняется только действиями approve/reject/cancel:
+        # они возвращают места и промокоды (release_bookings)
+        read_only_fields = fields
 
 
 ############################################
@@ -96,17 +111,15 @@ class CreateBookingSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, data):
-        session = data.get('session')
         seats = data.get('seats_reserved', 1)
-
-        if not session.is_active:
-            raise serializers.ValidationError("Выбранная дата тура недоступна для бронирования.")
-
-        if session.available_seats < seats:
-            raise serializers.ValidationError(
-                f"На выбранную дату осталось только {session.available_seats} мест."
-            )
-
+        # Claim предложения из листа ожидания: его места уже держатся за пользователем
+        entry = self.context.get('waitlist_entry')
+        if entry is not None and entry.status == 'offered':
+            seats = max(0, seats - entry.seats)
+        try:
+            check_availability(data.get('session'), seats)
+        except PricingError as exc:
+            raise serializers.ValidationError(exc.message)
         return data
 
     def create(self, validated_data):
@@ -115,74 +128,85 @@ class CreateBookingSerializer(serializers.ModelSerializer):
         session = validated_data['session']
         seats = validated_data.get('seats_reserved', 1)
         promo_code_str = validated_data.get('promo_code')
-        bonus_used = validated_data.get('bonus_used_amount', Decimal('0.00'))
 
-        # 1️⃣ Базовая цена
-        base_price = session.price * seats
-        total_discount = Decimal('0.00')
-        applied_promo = None
+        # 1️⃣–5️⃣ Цена, промокод, акции и бонусы — общий расчёт с котировками
+        pricing = PricingContext([session.pk], promo_codes=[promo_code_str])
+        try:
+            quote = quote_booking(
+                pricing, session, seats,
+                promo_code=promo_code_str,
+                bonus=validated_data.get('bonus_used_amount', Decimal('0.00')),
+                bonus_balance=get_bonus_balance(user),
+            )
+        except PricingError as exc:
+            raise serializers.ValidationError(exc.message)
 
-        # 2️⃣ Применяем промокод
-        if promo_code_str:
-            try:
-                promo = PromoCode.objects.get(code=promo_code_str, session=session)
-                if promo.is_currently_valid() and promo.can_use():
-                    discount = promo.calculate_discount(base_price)
-                    total_discount += discount
-                    applied_promo = promo
-                else:
-                    raise serializers.ValidationError("Промокод недействителен или превышен лимит использования.")
-            except PromoCode.DoesNotExist:
-                raise serializers.ValidationError("Промокод не найден.")
-
-        # 3️⃣ Применяем активные акции
-        for promo in session.promotions.filter(is_active=True):
-            if promo.is_currently_valid():
-                total_discount += promo.calculate_discount(base_price)
-
-        # 4️⃣ Проверка и применение бонусов пользователя
-        if bonus_used > user.bonus_balance:
-            raise serializers.ValidationError("Недостаточно бонусов на счёте.")
-        if bonus_used > (base_price - total_discount):
-            bonus_used = base_price - total_discount
-
-        # 5️⃣ Финальная сумма
-        final_price = base_price - total_discount - bonus_used
-        if final_price < 0:
-            final_price = Decimal('0.00')
-
-        # 6️⃣ Учитываем рефералку (только если это первый платный заказ)
+        base_price = quote['base_price']
+        total_discount = quote['discount_amount']
+        bonus_used = quote['bonus_used_amount']
+        final_price = quote['final_price']
+        applied_promo = quote['applied_promo']
+
+        # 6️⃣ Учитываем рефералку (только если это первый заказ).
+        # Связи «кто пригласил» у пользователя пока нет — без неё рефералки нет
         referral_partner = None
-        if user.is_first_booking():
-            referral_partner = user.invited_by
-
-        # 7️⃣ Создаём бронь
-        booking = Booking.objects.create(
-            user=user,
-            session=session,
-            tour=session.tour,
-            seats_reserved=seats,
-            base_price=base_price,
-            discount_amount=total_discount,
-            bonus_used_amount=bonus_used,
-            final_price_paid=final_price,
-            promo_code=applied_promo,
-            referral_partner=referral_partner,
-            selected_transport=validated_data.get('selected_transport', ''),
-            selected_accommodation=validated_data.get('selected_accommodation', ''),
-            comment=validated_data.get('comment', ''),
-            status='requested'
-        )
+        invited_by = getattr(user, 'invited_by', None)
+        if invited_by is not None and not user.bookings.exists():
+            referral_partner = invited_by
+
+        # Счётчик flash sale в Redis не откатывается с БД: при ошибке ExitStack
+        # вернёт списанные на нём места — в том числе если не прошёл сам коммит
+        with ExitStack() as reservations, transaction.atomic():
+            # Предложение из листа ожидания — удержанные места возвращаются под эту бронь
+            entry = self.context.get('waitlist_entry')
+            if entry is not None:
+                try:
+                    entry = release_offer_hold(entry.pk, user)
+                except WaitlistError as exc:
+                    raise serializers.ValidationError(str(exc))
+
+            # 7️⃣ Промокод — атомарно занимаем использование (без гонок и перерасхода лимита)
+            if applied_promo and not applied_promo.redeem():
+                raise serializers.ValidationError("Промокод недействителен или превышен лимит использования.")
+
+            # 8️⃣ Места — условным UPDATE (flash sale — на счётчике) — и бронь
+            try:
+                reservations.enter_context(seat_reservation(session, seats))
+            except SeatsUnavailable as exc:
+                raise serializers.ValidationError(str(exc))
+
+            booking = Booking.objects.create(
+                user=user,
+                session=session,
+                tour=session.tour,
+                seats_reserved=seats,
+                holds_seats=True,
+                base_price=base_price,
+                discount_amount=total_discount,
+                bonus_used_amount=bonus_used,
+                final_price_paid=final_price,
+                promo_code=applied_promo,
+                referral_partner=referral_partner,
+                selected_transport=validated_data.get('selected_transport', ''),
+                selected_accommodation=validated_data.get('selected_accommodation', ''),
+                comment=validated_data.get('comment', ''),
+                status='requested',
+                # Места держатся с момента заявки — без разбора менеджером она истекает
+                expires_at=timezone.now() + REQUEST_TTL,
+            )
 
-        # 8️⃣ Списание бонусов у пользователя
-        if bonus_used > 0:
-            user.bonus_balance -= bonus_used
-            user.save()
+            # 9️⃣ Списание бонусов у пользователя
+            if bonus_used > 0:
+                user.bonus_balance -= bonus_used
+                user.save()
 
-        # 9️⃣ Промокод — увеличение счетчика использования
-        if applied_promo:
-            applied_promo.used_count += 1
-            applied_promo.save()
+            # 🔟 Событие outbox — в той же транзакции, что и бронь
+            publish_booking_events('requested', [(
+                booking.pk, session.pk, booking.tour_id, booking.agency_id, user.pk, seats,
+            )])
+
+            if entry is not None:
+                mark_offer_claimed(entry, booking)
 
         return booking
 
@@ -199,19 +223,15 @@ class ApproveBookingSerializer(serializers.ModelSerializer):
         booking = self.instance
         if booking.status != 'requested':
             raise serializers.ValidationError("Эта заявка уже обработана.")
-        if booking.session.available_seats < booking.seats_reserved:
-            raise serializers.ValidationError(
-                f"Недостаточно мест. Осталось {booking.session.available_seats}."
-            )
         return data
 
     def save(self, approved_by):
         booking = self.instance
-        booking.status = 'approved'
-        booking.approved_by = approved_by
-        booking.approved_at = timezone.now()
-        booking.expires_at = timezone.now() + timezone.timedelta(minutes=60)
-        booking.save()
+        # Тот же механизм, что у массового подтверждения: статус и места в одной транзакции
+        result, = approve_bookings(Booking.objects.filter(pk=booking.pk), approved_by)
+        if 'error' in result:
+            raise serializers.ValidationError(result['error'])
+        booking.refresh_from_db()
         return booking
 
 
@@ -233,9 +253,125 @@ class RejectBookingSerializer(serializers.ModelSerializer):
 
     def save(self, approved_by):
         booking = self.instance
-        booking.status = 'cancelled'
-        booking.approved_by = approved_by
-        booking.approved_at = timezone.now()
-        booking.cancel_reason = self.validated_data.get('cancel_reason')
-        booking.save()
-        return booking
\ No newline at end of file
+        # Отмена возвращает использование промокода
+        released = release_bookings(
+            Booking.objects.filter(pk=booking.pk, status='requested'),
+            'cancelled',
+            from_statuses=('requested',),
+            approved_by=approved_by,
+            approved_at=timezone.now(),
+            cancel_reason=self.validated_data.get('cancel_reason'),
+        )
+        if not released:
+            raise serializers.ValidationError("Эта заявка уже обработана.")
+        booking.refresh_from_db()
+        return booking
+
+############################################
+# Bulk Approve / Reject Serializers
+############################################
+MAX_BULK_ITEMS = 500
+
+
+class BulkApproveBookingsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+    )
+
+    def validate_ids(self, value):
+        # Повторы не обрабатываем дважды, порядок результата — как в запросе
+        return list(dict.fromkeys(value))
+
+
+class BulkRejectBookingsSerializer(BulkApproveBookingsSerializer):
+    cancel_reason = serializers.CharField()
+
+
+
+############################################
+# Booking Export Serializers
+############################################
+class BookingExportParamsSerializer(serializers.Serializer):
+    """Параметры GET /bookings/export/ (query string)"""
+    file_format = serializers.ChoiceField(choices=BookingExport.FORMAT_CHOICES, default='csv')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=Booking.STATUS_CHOICES, required=False)
+    background = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from должна быть не позже date_to.")
+        return data
+
+    @property
+    def filters(self):
+        """Фильтры для BookingExport.filters: только JSON-совместимые значения"""
+        return {
+            key: str(self.validated_data[key])
+            for key in ('date_from', 'date_to', 'status')
+            if self.validated_data.get(key)
+        }
+
+
+class BookingExportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingExport
+        fields = [
+            'id',
+            'file_format',
+            'filters',
+            'status',
+            'row_count',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+
+############################################
+# Waitlist Serializers
+############################################
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id',
+            'session',
+            'seats',
+            'status',
+            'position',
+            'offered_at',
+            'offer_expires_at',
+            'booking',
+            'created_at',
+        ]
+        read_only_fields = ['id', 'status', 'position', 'offered_at', 'offer_expires_at', 'booking', 'created_at']
+
+    def get_position(self, obj):
+        return waitlist_position(obj)
+
+    def validate(self, data):
+        session = data['session']
+        seats = data.get('seats', 1)
+        if not session.is_active:
+            raise serializers.ValidationError("Выбранная дата тура недоступна для бронирования.")
+        if seats < 1 or seats > session.capacity:
+            raise serializers.ValidationError(f"Можно ждать от 1 до {session.capacity} мест.")
+        try:
+            check_availability(session, seats)
+        except PricingError:
+            return data
+        raise serializers.ValidationError("На эту дату есть свободные места — бронируйте сразу.")
+
+    def create(self, validated_data):
+        try:
+            return join_waitlist(validated_data['session'], validated_data['user'], validated_data.get('seats', 1))
+        except WaitlistError as exc:
+            raise serializers.ValidationError(str(exc))
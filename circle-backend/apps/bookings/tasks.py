@@ -0,0 +1,27 @@
+from celery import shared_task
+
+from .expiry import expire_overdue_bookings as expire_bookings
+from .exports import build_export
+from .waitlist import refresh_waitlists as refresh_session_waitlists
+
+
+@shared_task(ignore_result=True)
+def expire_overdue_bookings():
+    """Перевод заявок и подтверждений, не обработанных вовремя, в 'expired' с возвратом мест и промокодов"""
+    return expire_bookings()
+
+
+@shared_task(ignore_result=True)
+def build_booking_export(export_id):
+    """Фоновая выгрузка броней в файл (GET /api/bookings/export/ сверх лимита)"""
+    from .models import BookingExport
+
+    export = BookingExport.objects.filter(pk=export_id).first()
+    if export is not None and export.status != 'ready':
+        return build_export(export)
+
+
+@shared_task(ignore_result=True)
+def refresh_waitlists():
+    """Истёкшие предложения листа ожидания — следующим; свободные места — ожидающим"""
+    return refresh_session_waitlists()
@@ -1,7 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from . import api
 
 router = DefaultRouter()
 router.register(r'bookings', api.BookingViewSet, basename='booking')
+router.register(r'exports', api.BookingExportViewSet, basename='booking-export')
+router.register(r'waitlist', api.WaitlistViewSet, basename='waitlist')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    path('bulk-approve/', api.BulkApproveBookingsView.as_view(), name='booking-bulk-approve'),
+    path('bulk-reject/', api.BulkRejectBookingsView.as_view(), name='booking-bulk-reject'),
+] + router.urls
\ No newline at end of file
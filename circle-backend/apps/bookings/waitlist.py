@@ -0,0 +1,237 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.outbox import publish_many
+from apps.tours.aggregates import schedule_aggregates_refresh
+from apps.tours.cache import invalidate_catalog_cache
+from apps.tours.documents import schedule_document_rebuild
+from apps.tours.models import TourSession
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько предложенные места держатся за пользователем
+CLAIM_TTL = timedelta(minutes=getattr(settings, 'WAITLIST_CLAIM_MINUTES', 30))
+# Сколько записей очереди просматривать за раз при раздаче мест
+OFFER_SCAN_LIMIT = 200
+EXPIRY_CHUNK_SIZE = 500
+
+
+class WaitlistError(Exception):
+    """Действие с листом ожидания невозможно; сообщение — для пользователя"""
+
+
+########################################
+# Очередь
+########################################
+def join_waitlist(session, user, seats):
+    """Ставит пользователя в конец очереди сессии"""
+    from .models import WaitlistEntry
+
+    try:
+        with transaction.atomic():
+            return WaitlistEntry.objects.create(session=session, user=user, seats=seats)
+    except IntegrityError:
+        raise WaitlistError("Вы уже в листе ожидания на эту дату.")
+
+
+def waitlist_position(entry):
+    """Номер в очереди (1 — следующий); None, если запись уже не ждёт"""
+    from .models import WaitlistEntry
+
+    if entry.status != 'waiting':
+        return None
+    return WaitlistEntry.objects.filter(session_id=entry.session_id, status='waiting', pk__lte=entry.pk).count()
+
+
+########################################
+# Раздача освободившихся мест
+########################################
+def offer_freed_seats(session_ids, now=None):
+    """
+    Предлагает свободные места сессий следующим в очереди: по порядку
+    записи, пропуская тех, кому мест не хватает (их позиция сохраняется).
+    Предложенные места снимаются с остатка одним условным UPDATE на
+    сессию и держатся CLAIM_TTL; пользователи узнают о них из события
+    outbox waitlist.offered. Сессии во время flash sale пропускаются.
+
+    Вызывается внутри транзакции, вернувшей места (release_booking_ids),
+    или сама открывает её. Возвращает id сессий, где были предложения.
+    """
+    from .models import WaitlistEntry
+
+    now = now or timezone.now()
+    offered_sessions = []
+    with transaction.atomic():
+        queued = set(
+            WaitlistEntry.objects.filter(session_id__in=session_ids, status='waiting')
+            .values_list('session_id', flat=True).distinct()
+        )
+        for session_id in sorted(queued):
+            available = (
+                TourSession.objects.select_for_update()
+                .filter(pk=session_id, flash_sale_until__isnull=True, is_active=True)
+                .values_list('available_seats', flat=True)
+                .first()
+            )
+            if not available:
+                continue
+
+            picked = []
+            for pk, user_id, seats in (
+                WaitlistEntry.objects.select_for_update()
+                .filter(session_id=session_id, status='waiting')
+                .order_by('pk')
+                .values_list('pk', 'user_id', 'seats')[:OFFER_SCAN_LIMIT]
+            ):
+                if seats <= available:
+                    picked.append((pk, user_id, seats))
+                    available -= seats
+                if not available:
+                    break
+            total = sum(seats for _, _, seats in picked)
+            if not total or not TourSession.objects.filter(
+                pk=session_id, available_seats__gte=total,
+            ).update(available_seats=F('available_seats') - total):
+                continue
+
+            expires_at = now + CLAIM_TTL
+            WaitlistEntry.objects.filter(pk__in=[pk for pk, _, _ in picked]).update(
+                status='offered', offered_at=now, offer_expires_at=expires_at,
+            )
+            publish_many('waitlist.offered', 'waitlist_entry', [
+                (pk, {
+                    'entry_id': pk,
+                    'session_id': session_id,
+                    'user_id': user_id,
+                    'seats': seats,
+                    'offer_expires_at': expires_at.isoformat(),
+                })
+                for pk, user_id, seats in picked
+            ])
+            offered_sessions.append(session_id)
+            logger.info("Лист ожидания сессии %s: предложено %s мест %s записям", session_id, total, len(picked))
+    return offered_sessions
+
+
+def _return_held_seats(seats_by_session):
+    for session_id, seats in seats_by_session.items():
+        TourSession.objects.filter(pk=session_id).update(available_seats=F('available_seats') + seats)
+
+
+def _refresh_tours(session_ids):
+    # update() не отправляет post_save — обновляем витрину сами
+    tour_ids = set(TourSession.objects.filter(pk__in=session_ids).values_list('tour_id', flat=True))
+    if tour_ids:
+        invalidate_catalog_cache()
+        schedule_document_rebuild(tour_ids)
+        schedule_aggregates_refresh(tour_ids)
+
+
+########################################
+# Предложение: бронь, отказ, истечение
+########################################
+def release_offer_hold(entry_id, user):
+    """
+    Первая половина claim — в транзакции CreateBookingSerializer.create:
+    блокирует запись, проверяет, что предложение действует, и возвращает
+    удержанные места на остаток, откуда их тут же спишет бронь.
+    """
+    from .models import WaitlistEntry
+
+    entry = WaitlistEntry.objects.select_for_update().filter(pk=entry_id, user=user).first()
+    if entry is None or entry.status != 'offered' or entry.offer_expires_at <= timezone.now():
+        raise WaitlistError("Предложение мест истекло или уже использовано.")
+    _return_held_seats({entry.session_id: entry.seats})
+    return entry
+
+
+def mark_offer_claimed(entry, booking):
+    from .models import WaitlistEntry
+
+    WaitlistEntry.objects.filter(pk=entry.pk).update(status='claimed', booking=booking)
+
+
+def leave_waitlist(entry):
+    """Выход из очереди; удержанные по предложению места уходят следующим"""
+    from .models import WaitlistEntry
+
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update().get(pk=entry.pk)
+        if entry.status not in WaitlistEntry.ACTIVE_STATUSES:
+            raise WaitlistError("Запись уже не в очереди.")
+        held = entry.status == 'offered'
+        WaitlistEntry.objects.filter(pk=entry.pk).update(status='cancelled')
+        if held:
+            _return_held_seats({entry.session_id: entry.seats})
+            offer_freed_seats([entry.session_id])
+    if held:
+        _refresh_tours([entry.session_id])
+
+
+def expire_offers(now=None, chunk_size=EXPIRY_CHUNK_SIZE):
+    """
+    Переводит непринятые вовремя предложения в expired, возвращает
+    их места на остаток и в той же транзакции предлагает их следующим.
+    Возвращает {'expired', 'sessions', 'offered'} (id сессий).
+    """
+    from .models import WaitlistEntry
+
+    now = now or timezone.now()
+    stats = {'expired': 0, 'sessions': set(), 'offered': set()}
+    while True:
+        with transaction.atomic():
+            rows = list(
+                WaitlistEntry.objects.select_for_update()
+                .filter(status='offered', offer_expires_at__lte=now)
+                .order_by('pk')
+                .values_list('pk', 'session_id', 'user_id', 'seats')[:chunk_size]
+            )
+            if not rows:
+                break
+            WaitlistEntry.objects.filter(pk__in=[row[0] for row in rows]).update(status='expired')
+            seats = Counter()
+            for _, session_id, _, count in rows:
+                seats[session_id] += count
+            _return_held_seats(seats)
+            publish_many('waitlist.expired', 'waitlist_entry', [
+                (pk, {'entry_id': pk, 'session_id': session_id, 'user_id': user_id, 'seats': count})
+                for pk, session_id, user_id, count in rows
+            ])
+            stats['offered'] |= set(offer_freed_seats(list(seats), now=now))
+        stats['expired'] += len(rows)
+        stats['sessions'] |= set(seats)
+        if len(rows) < chunk_size:
+            break
+    return stats
+
+
+def refresh_waitlists(now=None):
+    """
+    Периодическая сверка (celery beat): истёкшие предложения уходят дальше
+    по очереди, а места, появившиеся без отмены брони (увеличили вместимость,
+    закончился flash sale), предлагаются ожидающим.
+    """
+    from .models import WaitlistEntry
+
+    now = now or timezone.now()
+    stats = expire_offers(now=now)
+    pending = set(
+        WaitlistEntry.objects.filter(
+            status='waiting',
+            session__available_seats__gt=0,
+            session__flash_sale_until__isnull=True,
+        ).values_list('session_id', flat=True).distinct()
+    )
+    offered = stats['offered'] | set(offer_freed_seats(pending, now=now) if pending else ())
+    _refresh_tours(stats['sessions'] | offered)
+    result = {'expired': stats['expired'], 'offered_sessions': len(offered)}
+    if any(result.values()):
+        logger.info("Листы ожидания: %s", result)
+    return result
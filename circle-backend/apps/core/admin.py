@@ -1,7 +1,7 @@
 # apps/core/admin.py
 
 from django.contrib import admin
-from .models import SystemConfig, SystemLogEntry
+from .models import IdempotencyKey, OutboxCursor, OutboxEvent, SystemConfig, SystemLogEntry
 
 
 @admin.register(SystemConfig)
@@ -42,4 +42,43 @@ class SystemLogEntryAdmin(admin.ModelAdmin):
     def message_short(self, obj):
         return (obj.message[:75] + '...') if len(obj.message) > 75 else obj.message
 
-    message_short.short_description = "Message"
\ No newline at end of file
+    message_short.short_description = "Message"
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'aggregate_type', 'aggregate_id', 'created_at')
+    list_filter = ('topic', 'aggregate_type')
+    search_fields = ('aggregate_id',)
+    ordering = ('-id',)
+    readonly_fields = ('topic', 'aggregate_type', 'aggregate_id', 'payload', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxCursor)
+class OutboxCursorAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'last_event_id', 'delivered_count', 'failures', 'updated_at')
+    readonly_fields = (
+        'consumer', 'delivered_count', 'failures', 'last_error', 'gap_event_id', 'gap_seen_at', 'updated_at',
+    )
+    # last_event_id редактируется: перемотка потребителя назад для повторной доставки
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'status_code', 'created_at', 'expires_at')
+    list_filter = ('status_code',)
+    search_fields = ('key', 'user__username')
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'user', 'key', 'request_hash', 'status_code', 'response_data', 'response_headers',
+        'locked_until', 'expires_at', 'created_at',
+    )
+
+    def has_add_permission(self, request):
+        return False
@@ -6,6 +6,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.conf import settings
 from .models import SystemConfig, SystemLogEntry
+from .pagination import PageOrCursorPagination
 from .serializers import SystemConfigSerializer, SystemLogEntrySerializer
 
 
@@ -73,4 +74,5 @@ class SystemLogEntryViewSet(mixins.ListModelMixin,
     """
     queryset = SystemLogEntry.objects.select_related('user').order_by('-timestamp')
     serializer_class = SystemLogEntrySerializer
-    permission_classes = [IsAdminPermission]
\ No newline at end of file
+    permission_classes = [IsAdminPermission]
+    pagination_class = PageOrCursorPagination
\ No newline at end of file
@@ -0,0 +1,145 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_spec(value):
+    """
+    'id,title,sessions.date_start' → {'id': {}, 'title': {}, 'sessions': {'date_start': {}}}
+    Пустой или отсутствующий параметр → None (без ограничений).
+    """
+    if not value:
+        return None
+    spec = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = spec
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return spec or None
+
+
+def get_request_spec(request):
+    if request is None:
+        return None, None
+    query_params = getattr(request, 'query_params', request.GET)
+    return (
+        parse_field_spec(query_params.get(FIELDS_PARAM)),
+        parse_field_spec(query_params.get(EXPAND_PARAM)),
+    )
+
+
+########################################
+# Serializer: ?fields= / ?expand=
+########################################
+class SparseFieldsetMixin:
+    """
+    Ограничивает набор полей сериализатора параметрами запроса:
+
+    - ?fields=id,title,sessions.date_start — только перечисленные поля
+      (через точку — поля вложенных сериализаторов);
+    - ?expand=sessions — добавить поля из Meta.expandable_fields,
+      которые по умолчанию не отдаются.
+
+    Meta.expandable_fields = {'name': (SerializerClass, {kwargs})}
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields_spec, expand_spec = self._get_sparse_spec()
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in (expand_spec or {}):
+            if name in expandable and name not in fields:
+                serializer_class, kwargs = expandable[name]
+                fields[name] = serializer_class(**kwargs)
+
+        if fields_spec is not None:
+            allowed = set(fields_spec) | set(expand_spec or {})
+            for name in list(fields):
+                if name not in allowed:
+                    fields.pop(name)
+
+        # Передаём вложенные части спецификации дочерним сериализаторам
+        for name, field in fields.items():
+            child = getattr(field, 'child', field)
+            if isinstance(child, SparseFieldsetMixin):
+                child._sparse_spec = (
+                    (fields_spec or {}).get(name) or None,
+                    (expand_spec or {}).get(name) or None,
+                )
+        return fields
+
+    def _get_sparse_spec(self):
+        if hasattr(self, '_sparse_spec'):
+            return self._sparse_spec
+        if not self._is_root():
+            return None, None
+        request = self.context.get('request')
+        if request is not None and request.method not in SAFE_METHODS:
+            return None, None
+        return get_request_spec(request)
+
+    def _is_root(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+
+########################################
+# ViewSet: подстройка queryset под запрошенные поля
+########################################
+class SparseFieldsetViewMixin:
+    """
+    Строит queryset под фактический набор полей сериализатора:
+    select_related/prefetch_related только для запрошенных связей
+    и .only() по нужным колонкам.
+
+    sparse_relations = {
+        'field_name': {
+            'select': [...],     # select_related
+            'prefetch': [...],   # prefetch_related
+            'only': [...],       # дополнительные колонки основной модели
+        },
+    }
+    sparse_always_only — колонки, нужные всегда (lookup, сортировка, курсор)
+    """
+    sparse_relations = {}
+    sparse_always_only = ('pk',)
+
+    def apply_sparse_fieldset(self, queryset):
+        if self.request.method not in SAFE_METHODS:
+            # Для изменений нужен полный объект
+            for options in self.sparse_relations.values():
+                queryset = queryset.select_related(*options.get('select', ()))
+                queryset = queryset.prefetch_related(*options.get('prefetch', ()))
+            return queryset
+
+        model_fields = {
+            field.name: field
+            for field in queryset.model._meta.concrete_fields
+        }
+        serializer = self.get_serializer()
+        only = set(self.sparse_always_only)
+        select, prefetch = [], []
+
+        for name, field in serializer.fields.items():
+            options = self.sparse_relations.get(name)
+            if options is not None:
+                select.extend(options.get('select', ()))
+                prefetch.extend(options.get('prefetch', ()))
+                only.update(options.get('only', ()))
+                only.update(path.split('__')[0] for path in options.get('select', ()))
+                continue
+            source = field.source.split('.')[0] if field.source != '*' else None
+            if source in model_fields:
+                only.add(source)
+
+        queryset = queryset.select_related(*select).prefetch_related(*prefetch)
+        return queryset.only(*only)
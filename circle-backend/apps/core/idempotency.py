@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Сколько хранится ответ для повторов
+KEY_TTL = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+# Сколько первый запрос держит ключ: если обработчик упал, повтор
+# после этого выполнит запрос заново
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 30))
+# Сколько параллельный дубль ждёт ответа первого запроса до 409
+WAIT_SECONDS = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 5)
+POLL_INTERVAL = 0.1
+# Заголовки ответа, которые повтор получает вместе с телом
+REPLAYED_HEADERS = ('Location',)
+PURGE_CHUNK_SIZE = 5000
+
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Запрос с этим Idempotency-Key ещё выполняется. Повторите позже."
+    default_code = 'idempotency_in_progress'
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key уже использован для другого запроса."
+    default_code = 'idempotency_mismatch'
+
+
+class Replay(Exception):
+    """Ответ уже сохранён: отдаём его вместо выполнения запроса"""
+
+    def __init__(self, record):
+        self.record = record
+
+
+########################################
+# Хранилище ключей
+########################################
+def request_fingerprint(request):
+    """Метод, адрес и тело: тот же ключ с другим запросом — ошибка клиента"""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    raw = f'{request.method}|{request.get_full_path()}|{body}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def claim_key(user, key, fingerprint):
+    """
+    Занимает ключ для выполнения запроса и возвращает запись-владение.
+    Если ответ уже сохранён — Replay; если тот же ключ выполняется
+    в параллельном запросе — ждёт его ответа до WAIT_SECONDS, затем 409.
+    Запись создаётся в отдельной короткой транзакции: параллельные дубли
+    видят её сразу, а не после ответа.
+    """
+    from .models import IdempotencyKey
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_hash=fingerprint,
+                    locked_until=now + LOCK_TIMEOUT,
+                    expires_at=now + KEY_TTL,
+                )
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+
+        if record is None:
+            continue
+        if record.expires_at <= now:
+            # Истёкший ключ ещё не удалён фоновой очисткой — используем заново
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at=record.expires_at).delete()
+            continue
+        if record.request_hash != fingerprint:
+            raise IdempotencyKeyMismatch()
+        if record.status_code is not None:
+            raise Replay(record)
+        if record.locked_until <= now and IdempotencyKey.objects.filter(
+            pk=record.pk, status_code__isnull=True, locked_until=record.locked_until,
+        ).update(locked_until=now + LOCK_TIMEOUT, expires_at=now + KEY_TTL):
+            # Первый обработчик не ответил вовремя — выполняем запрос сами
+            record.locked_until = now + LOCK_TIMEOUT
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgress()
+        time.sleep(POLL_INTERVAL)
+
+
+def store_response(record, response):
+    """
+    Сохраняет ответ для повторов. Ответ 5xx не сохраняется: ключ
+    освобождается, и повтор выполнит запрос заново.
+    """
+    from .models import IdempotencyKey
+
+    if response.status_code >= 500:
+        IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+        return
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        response_data=getattr(response, 'data', None),
+        response_headers={name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+    )
+
+
+def purge_expired_keys(now=None, chunk_size=PURGE_CHUNK_SIZE):
+    """Удаляет истёкшие ключи чанками, возвращает их число"""
+    from .models import IdempotencyKey
+
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+    if deleted:
+        logger.info("Удалено истёкших Idempotency-Key: %s", deleted)
+    return deleted
+
+
+########################################
+# Mixin для ViewSet
+########################################
+class IdempotentMixin:
+    """
+    Изменяющие действия из idempotent_actions с заголовком Idempotency-Key
+    выполняются один раз на пару (пользователь, ключ): повтор получает
+    сохранённый ответ с заголовком Idempotent-Replayed: true.
+    Без заголовка запрос обрабатывается как обычно.
+    """
+    idempotent_actions = ('create',)
+
+    def initial(self, request, *args, **kwargs):
+        self._idempotency_record = None
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(HEADER)
+        if (
+            key is None
+            or request.method in ('GET', 'HEAD', 'OPTIONS')
+            or self.action not in self.idempotent_actions
+            or not request.user.is_authenticated
+        ):
+            return
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f"Нужна непустая строка до {MAX_KEY_LENGTH} символов."})
+        self._idempotency_record = claim_key(request.user, key, request_fingerprint(request))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            record = exc.record
+            response = Response(record.response_data, status=record.status_code, headers=record.response_headers)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = getattr(self, '_idempotency_record', None)
+        if record is not None:
+            self._idempotency_record = None
+            store_response(record, response)
+        return response
@@ -65,6 +65,11 @@ class Command(BaseCommand):
                 
                 # Дополнительные связи
                 self.create_connections()
+
+                # loaddata не отправляет сигналы: перестраиваем поиск и документы туров целиком
+                call_command('rebuild_tour_search_index', verbosity=0)
+                call_command('reconcile_tour_aggregates', verbosity=0)
+                call_command('rebuild_tour_documents', verbosity=0)
                 
                 self.stdout.write('\n' + '='*50)
                 self.stdout.write(
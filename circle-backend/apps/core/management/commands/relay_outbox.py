@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.outbox import RELAY_BATCH_SIZE, relay_outbox
+
+
+class Command(BaseCommand):
+    help = 'Доставляет новые события outbox потребителям (то же, что задача celery beat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RELAY_BATCH_SIZE, help='Событий в одной пачке')
+        parser.add_argument('--consumer', action='append', help='Только указанные потребители')
+
+    def handle(self, *args, **options):
+        stats = relay_outbox(batch_size=options['batch_size'], consumers=options['consumer'])
+        for name, delivered in stats['delivered'].items():
+            self.stdout.write(f'   {name}: {delivered}')
+        self.stdout.write(f"   удалено старых событий: {stats['pruned']}, за {stats['seconds']} c")
+        self.stdout.write(self.style.SUCCESS(f"✅ Доставлено событий: {sum(stats['delivered'].values())}"))
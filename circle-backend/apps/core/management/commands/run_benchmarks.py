@@ -0,0 +1,344 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from apps.agencies.models import TravelAgency
+from apps.bookings.models import Booking
+from apps.bookings.serializers import CreateBookingSerializer
+from apps.core.utils import QueryCounter
+from apps.tours.activation import invalidate_active_set
+from apps.tours.aggregates import refresh_tour_aggregates
+from apps.tours.documents import get_document_queryset
+from apps.tours.models import Tour, TourCategory, TourSession, Promotion, PromoCode
+from apps.tours.serializers import TourListSerializer, TourDetailSerializer
+from apps.users.models import User
+
+
+SESSIONS_PER_TOUR = 50
+PAGE_SIZE = 20
+
+CASES = (
+    'session_discounted_price',
+    'promotion_calculate_discount',
+    'promo_code_calculate_discount',
+    'create_booking',
+    'tour_list_serializer',
+    'tour_detail_serializer',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарки горячих путей цен и бронирования на разных объёмах данных: '
+        'TourSession.calculate_discounted_price, Promotion/PromoCode.calculate_discount, '
+        'CreateBookingSerializer.create, сериализаторы списка и детальной тура. '
+        'Данные создаются в транзакции и откатываются; результаты пишутся в JSON '
+        'и могут сравниваться с прошлым прогоном (--compare).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='10,1000,10000',
+            help='Объёмы через запятую: столько сессий, акций и участников (до 100000)',
+        )
+        parser.add_argument('--cases', default=','.join(CASES), help='Какие замеры запускать')
+        parser.add_argument('--sample', type=int, default=200, help='Сколько вызовов замерять на каждом объёме')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output',
+            help='Куда записать результаты (по умолчанию — новый файл во временном каталоге)',
+        )
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое замедление медианы при --compare (0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',') if scale]
+        cases = [case for case in options['cases'].split(',') if case]
+        unknown = set(cases) - set(CASES)
+        if unknown:
+            raise CommandError(f'Неизвестные замеры: {", ".join(sorted(unknown))}')
+        if any(scale < 1 or scale > 100000 for scale in scales):
+            raise CommandError('Объём должен быть от 1 до 100000')
+
+        self.options = options
+        self.factory = RequestFactory()
+        results = []
+        for scale in scales:
+            self.rng = random.Random(options['seed'] + scale)
+            self.stdout.write(self.style.HTTP_INFO(f'🚀 Объём {scale}'))
+            try:
+                with transaction.atomic():
+                    data = self.build(scale)
+                    for case in cases:
+                        results.append(self.measure(case, scale, data))
+                    raise Rollback()
+            except Rollback:
+                pass
+            finally:
+                invalidate_active_set()  # набор видел откатываемые акции
+
+        report = {'meta': self.meta(), 'results': results}
+        if options['output']:
+            output = Path(options['output'])
+        else:
+            stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+            output = Path(tempfile.gettempdir()) / f'circle-benchmark-{stamp}.json'
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'✅ Результаты: {output}'))
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    ########################################
+    # Данные
+    ########################################
+    def build(self, scale):
+        """
+        scale сессий (по SESSIONS_PER_TOUR на тур), по акции на сессию,
+        промокод на каждую десятую и scale оплаченных участников первого тура.
+        """
+        rng = self.rng
+        now = timezone.now()
+        today = timezone.localdate()
+        suffix = f'{int(time.time())}-{scale}'
+        started = time.perf_counter()
+
+        agency = TravelAgency.objects.create(name=f'Benchmark {suffix}')
+        category = TourCategory.objects.create(name=f'Benchmark {suffix}')
+        tours = Tour.objects.bulk_create([
+            Tour(
+                title=f'Benchmark tour {i}', slug=f'benchmark-{suffix}-{i}',
+                agency=agency, type=category, description='Описание тура ' * 20,
+                price_from=Decimal('100000'), base_price=Decimal(rng.randrange(100000, 3000000, 1000)),
+                duration_days=3, duration_nights=2,
+            )
+            for i in range(max(1, (scale + SESSIONS_PER_TOUR - 1) // SESSIONS_PER_TOUR))
+        ])
+        sessions = TourSession.objects.bulk_create([
+            TourSession(
+                tour=tours[i // SESSIONS_PER_TOUR],
+                date_start=today + timedelta(days=1 + i % 365),
+                capacity=1000, available_seats=1000,
+            )
+            for i in range(scale)
+        ])
+
+        def window():
+            start = now + timedelta(days=rng.choice([-10, -1, -1, 3]))
+            return {'valid_from': start, 'valid_until': start + timedelta(days=rng.choice([5, 30]))}
+
+        promotions = Promotion.objects.bulk_create([
+            Promotion(
+                session=session, name='bench',
+                discount_percent=rng.choice([None, Decimal('5'), Decimal('12.5')]),
+                discount_amount=rng.choice([None, Decimal('2500')]),
+                **window(),
+            )
+            for session in sessions
+        ])
+        codes = PromoCode.objects.bulk_create([
+            PromoCode(
+                code=f'BENCH-{suffix}-{session.pk}', session=session,
+                discount_percent=Decimal('10'), usage_limit=10 ** 6,
+                valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=30),
+            )
+            for session in sessions[::10]
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'bench-{suffix}-{i}', first_name='Участник', last_name=str(i))
+            for i in range(scale)
+        ])
+        first_sessions = [session for session in sessions if session.tour_id == tours[0].pk]
+        Booking.objects.bulk_create([
+            Booking(
+                user=user, tour=tours[0], session=first_sessions[i % len(first_sessions)],
+                base_price=Decimal('100000'), final_price_paid=Decimal('100000'), status='paid',
+            )
+            for i, user in enumerate(users)
+        ])
+        # bulk_create не отправляет сигналов
+        invalidate_active_set()
+        refresh_tour_aggregates([tour.pk for tour in tours])
+
+        self.stdout.write(
+            f'   данные за {time.perf_counter() - started:.1f} c: туров {len(tours)}, сессий {len(sessions)}, '
+            f'акций {len(promotions)}, промокодов {len(codes)}, участников {len(users)}'
+        )
+        return {
+            'tours': tours,
+            'sessions': list(TourSession.objects.filter(tour__agency=agency).select_related('tour')),
+            'promotions': list(Promotion.objects.filter(session__tour__agency=agency)),
+            'codes': list(PromoCode.objects.filter(session__tour__agency=agency)),
+            'users': users,
+        }
+
+    def sample(self, items):
+        items = list(items)
+        size = min(len(items), self.options['sample'])
+        return self.rng.sample(items, size) if size < len(items) else items
+
+    ########################################
+    # Замеры
+    ########################################
+    def measure(self, case, scale, data):
+        calls = getattr(self, f'case_{case}')(data)
+        # Прогрев (кеши процесса, набор активации)
+        calls[0]()
+
+        queries = QueryCounter()
+        timings = []
+        with connection.execute_wrapper(queries):
+            for call in calls:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        result = {
+            'case': case,
+            'scale': scale,
+            'calls': len(timings),
+            'mean_ms': round(statistics.mean(timings), 4),
+            'median_ms': round(statistics.median(timings), 4),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+            'min_ms': round(timings[0], 4),
+            'queries_per_call': round(queries.count / len(timings), 2),
+        }
+        self.stdout.write(
+            f"   {case:<32} медиана {result['median_ms']:9.3f} мс, p95 {result['p95_ms']:9.3f} мс, "
+            f"запросов/вызов {result['queries_per_call']}"
+        )
+        return result
+
+    def case_session_discounted_price(self, data):
+        codes = {code.session_id: code.code for code in data['codes']}
+        return [
+            lambda session=session: session.calculate_discounted_price(session.price, codes.get(session.pk))
+            for session in self.sample(data['sessions'])
+        ]
+
+    def case_promotion_calculate_discount(self, data):
+        return [
+            lambda promo=promo: promo.calculate_discount(Decimal('250000'))
+            for promo in self.sample(data['promotions'])
+        ]
+
+    def case_promo_code_calculate_discount(self, data):
+        return [
+            lambda code=code: code.calculate_discount(Decimal('250000'))
+            for code in self.sample(data['codes'])
+        ]
+
+    def case_create_booking(self, data):
+        codes = {code.session_id: code.code for code in data['codes']}
+        request = self.factory.post('/api/v1/bookings/bookings/')
+
+        def create(session, user):
+            request.user = user
+            serializer = CreateBookingSerializer(
+                data={'session': session.pk, 'seats_reserved': 1, 'promo_code': codes.get(session.pk)},
+                context={'request': request},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        sessions = self.sample(data['sessions'])
+        users = data['users']
+        return [
+            lambda session=session, user=users[i % len(users)]: create(session, user)
+            for i, session in enumerate(sessions)
+        ]
+
+    def case_tour_list_serializer(self, data):
+        request = self.factory.get('/api/v1/tours/tours/')
+        context = {'request': request, 'wishlisted_ids': frozenset()}
+
+        def render():
+            page = (
+                Tour.objects.filter(is_active=True, agency=data['tours'][0].agency_id)
+                .select_related('type', 'main_image')
+                .order_by('pk')[:PAGE_SIZE]
+            )
+            return TourListSerializer(page, many=True, context=dict(context)).data
+
+        return [render for _ in range(min(self.options['sample'], 50))]
+
+    def case_tour_detail_serializer(self, data):
+        request = self.factory.get('/api/v1/tours/tours/')
+        context = {'request': request, 'wishlisted_ids': frozenset()}
+        tour_id = data['tours'][0].pk
+
+        def render():
+            tour = get_document_queryset().get(pk=tour_id)
+            return TourDetailSerializer(tour, context=dict(context)).data
+
+        return [render for _ in range(min(self.options['sample'], 20))]
+
+    ########################################
+    # Отчёт
+    ########################################
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'sample': self.options['sample'],
+            'seed': self.options['seed'],
+        }
+
+    def compare(self, results, path, threshold):
+        previous = json.loads(Path(path).read_text())
+        baseline = {(row['case'], row['scale']): row for row in previous['results']}
+        commit = previous.get('meta', {}).get('commit') or path
+        self.stdout.write(self.style.HTTP_INFO(f'📊 Сравнение с {commit}'))
+
+        regressions = []
+        for row in results:
+            old = baseline.get((row['case'], row['scale']))
+            if old is None or not old['median_ms']:
+                continue
+            ratio = row['median_ms'] / old['median_ms']
+            line = (
+                f"   {row['case']:<32} {row['scale']:>6}: {old['median_ms']:9.3f} → "
+                f"{row['median_ms']:9.3f} мс (x{ratio:.2f}), запросов {old['queries_per_call']} → "
+                f"{row['queries_per_call']}"
+            )
+            if ratio > 1 + threshold or row['queries_per_call'] > old['queries_per_call']:
+                regressions.append(row)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('✅ Регрессий нет'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxcursor',
+            name='gap_event_id',
+            field=models.BigIntegerField(blank=True, help_text='Пропущенный id, которого ждёт курсор', null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxcursor',
+            name='gap_seen_at',
+            field=models.DateTimeField(blank=True, help_text='Когда relay впервые увидел пропуск', null=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 # apps/core/models.py
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -55,4 +56,84 @@ class SystemLogEntry(models.Model):
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f"[{self.level}] {self.source} @ {self.timestamp}"
\ No newline at end of file
+        return f"[{self.level}] {self.source} @ {self.timestamp}"
+
+class OutboxEvent(models.Model):
+    """
+    Событие transactional outbox: пишется в той же транзакции, что и смена
+    состояния (бронь подтверждена, отменена, оплачена), и доставляется
+    потребителям фоновым relay (apps.core.outbox) — запрос их не ждёт.
+    """
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=100, help_text="Тип события, например booking.approved")
+    aggregate_type = models.CharField(max_length=50, help_text="Сущность: booking, payment, ...")
+    aggregate_id = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Outbox Event"
+        verbose_name_plural = "Outbox Events"
+        ordering = ['id']
+        indexes = [
+            # Очистка доставленных событий по возрасту
+            models.Index(fields=['created_at'], name='outbox_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.topic} {self.aggregate_type}:{self.aggregate_id}"
+
+
+class OutboxCursor(models.Model):
+    """
+    Позиция потребителя в outbox: id последнего доставленного события.
+    Сдвигается только после успешной обработки пачки — доставка at-least-once.
+    """
+    consumer = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    delivered_count = models.PositiveBigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0, help_text="Ошибок подряд")
+    last_error = models.TextField(blank=True)
+    gap_event_id = models.BigIntegerField(null=True, blank=True, help_text="Пропущенный id, которого ждёт курсор")
+    gap_seen_at = models.DateTimeField(null=True, blank=True, help_text="Когда relay впервые увидел пропуск")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Outbox Cursor"
+        verbose_name_plural = "Outbox Cursors"
+        ordering = ['consumer']
+
+    def __str__(self):
+        return f"{self.consumer} → #{self.last_event_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на изменяющий запрос с заголовком Idempotency-Key: повтор
+    с тем же ключом получает сохранённый ответ, а не выполняется снова.
+    Пока status_code пуст, запрос ещё выполняется (locked_until — до когда
+    его держит первый обработчик). Логика — apps.core.idempotency.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64, help_text="Метод, адрес и тело запроса")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    response_headers = models.JSONField(default=dict, blank=True)
+    locked_until = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            # Удаление истёкших ключей
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
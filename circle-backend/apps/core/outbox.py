@@ -0,0 +1,186 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+RELAY_BATCH_SIZE = 500
+RELAY_MAX_BATCHES = 20
+# Событие с меньшим id может ещё не быть закоммичено (длинная транзакция):
+# на пропуске в id потребитель ждёт столько с момента, когда его увидел
+GAP_TIMEOUT = timedelta(seconds=getattr(settings, 'OUTBOX_GAP_TIMEOUT', 60))
+RETENTION = timedelta(days=getattr(settings, 'OUTBOX_RETENTION_DAYS', 7))
+
+
+########################################
+# Запись событий (в транзакции смены состояния)
+########################################
+def publish(topic, aggregate_type, aggregate_id, payload):
+    """Одно событие — один INSERT в текущей транзакции"""
+    publish_many(topic, aggregate_type, [(aggregate_id, payload)])
+
+
+def publish_many(topic, aggregate_type, items):
+    """
+    События одного типа для нескольких сущностей одним INSERT.
+    items — [(aggregate_id, payload), ...]. Вызывается внутри
+    transaction.atomic(): откат смены состояния откатывает и события.
+    """
+    from .models import OutboxEvent
+
+    if not connection.in_atomic_block:
+        raise RuntimeError("События outbox пишутся только внутри transaction.atomic()")
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(topic=topic, aggregate_type=aggregate_type, aggregate_id=str(pk), payload=payload)
+        for pk, payload in items
+    ])
+
+
+########################################
+# Потребители
+########################################
+def get_consumers():
+    """
+    settings.OUTBOX_CONSUMERS:
+    {'имя': {'handler': 'dotted.path', 'topics': ['booking.']}}
+    handler(events) получает пачку OutboxEvent в порядке id; topics — префиксы
+    (пусто — все события). Исключение в handler — пачка будет доставлена снова.
+    """
+    return {
+        name: (import_string(config['handler']), tuple(config.get('topics') or ()))
+        for name, config in getattr(settings, 'OUTBOX_CONSUMERS', {}).items()
+    }
+
+
+def audit_log_consumer(events):
+    """Журнал событий в SystemLogEntry — потребитель по умолчанию"""
+    from .models import SystemLogEntry
+
+    SystemLogEntry.objects.bulk_create([
+        SystemLogEntry(
+            source=f'outbox:{event.topic}',
+            message=f'{event.aggregate_type} {event.aggregate_id}: {event.topic}',
+            extra_data={'event_id': event.id, **event.payload},
+        )
+        for event in events
+    ])
+
+
+########################################
+# Relay (celery beat)
+########################################
+def _deliverable(events, cursor, now):
+    """
+    События до первого пропуска в id, который ждём меньше GAP_TIMEOUT:
+    пропущенное событие может принадлежать ещё не закоммиченной транзакции,
+    и курсор не должен его перепрыгнуть. Срок считается с момента, когда
+    relay впервые увидел пропуск (cursor.gap_event_id, cursor.gap_seen_at),
+    а не от created_at соседних событий: id выдаётся при INSERT, а виден
+    становится только при коммите. Пропуск дольше GAP_TIMEOUT — откат,
+    его больше не ждём. Поля пропуска меняются в cursor, сохраняет вызывающий.
+    """
+    ready = []
+    expected = cursor.last_event_id + 1
+    for event in events:
+        if event.id != expected:
+            if cursor.gap_event_id != expected:
+                cursor.gap_event_id, cursor.gap_seen_at = expected, now
+            if cursor.gap_seen_at > now - GAP_TIMEOUT:
+                return ready
+            logger.warning("Outbox: курсор %s пропускает #%s–#%s", cursor.consumer, expected, event.id - 1)
+        ready.append(event)
+        expected = event.id + 1
+    cursor.gap_event_id = cursor.gap_seen_at = None
+    return ready
+
+
+def relay_consumer(name, handler, topics, batch_size=RELAY_BATCH_SIZE, max_batches=RELAY_MAX_BATCHES):
+    """
+    Доставляет потребителю новые события пачками. Курсор блокируется
+    на время пачки (два relay не обработают её одновременно) и сдвигается
+    в той же транзакции после успешного handler. Возвращает число
+    доставленных событий.
+    """
+    from .models import OutboxCursor, OutboxEvent
+
+    OutboxCursor.objects.get_or_create(consumer=name)
+    delivered = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            cursor = OutboxCursor.objects.select_for_update().get(consumer=name)
+            events = list(
+                OutboxEvent.objects.filter(id__gt=cursor.last_event_id).order_by('id')[:batch_size]
+            )
+            gap = (cursor.gap_event_id, cursor.gap_seen_at)
+            ready = _deliverable(events, cursor, timezone.now())
+            if not ready:
+                if (cursor.gap_event_id, cursor.gap_seen_at) != gap:
+                    cursor.save(update_fields=['gap_event_id', 'gap_seen_at'])
+                break
+
+            matching = [event for event in ready if not topics or event.topic.startswith(topics)]
+            try:
+                if matching:
+                    with transaction.atomic():
+                        handler(matching)
+            except Exception as exc:
+                logger.exception("Outbox: потребитель %s не обработал пачку после #%s", name, cursor.last_event_id)
+                OutboxCursor.objects.filter(pk=cursor.pk).update(
+                    failures=cursor.failures + 1, last_error=f'{type(exc).__name__}: {exc}',
+                    gap_event_id=cursor.gap_event_id, gap_seen_at=cursor.gap_seen_at,
+                )
+                break
+
+            cursor.last_event_id = ready[-1].id
+            cursor.delivered_count += len(matching)
+            cursor.failures = 0
+            cursor.last_error = ''
+            cursor.save()
+        delivered += len(matching)
+        if len(events) < batch_size or len(ready) < len(events):
+            break
+    return delivered
+
+
+def prune_outbox(now=None):
+    """Удаляет события, которые прошли все потребители и старше RETENTION"""
+    from .models import OutboxCursor, OutboxEvent
+
+    consumers = list(get_consumers())
+    positions = list(
+        OutboxCursor.objects.filter(consumer__in=consumers).values_list('last_event_id', flat=True)
+    )
+    if len(positions) < len(consumers):
+        return 0
+    now = now or timezone.now()
+    deleted, _ = OutboxEvent.objects.filter(
+        id__lte=min(positions, default=0), created_at__lt=now - RETENTION,
+    ).delete()
+    return deleted
+
+
+def relay_outbox(batch_size=RELAY_BATCH_SIZE, consumers=None):
+    """
+    Один проход relay по всем потребителям (или только consumers).
+    Возвращает {'delivered': {имя: число}, 'pruned', 'seconds'}.
+    """
+    started = time.perf_counter()
+    delivered = {}
+    for name, (handler, topics) in get_consumers().items():
+        if consumers and name not in consumers:
+            continue
+        delivered[name] = relay_consumer(name, handler, topics, batch_size=batch_size)
+    stats = {
+        'delivered': delivered,
+        'pruned': prune_outbox(),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    if any(delivered.values()) or stats['pruned']:
+        logger.info("Outbox: %s", stats)
+    return stats
@@ -0,0 +1,193 @@
+import base64
+import datetime
+import decimal
+import json
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+########################################
+# Keyset (cursor) пагинация
+########################################
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу: WHERE (created_at, id) < (:created_at, :id) LIMIT n.
+
+    В отличие от PageNumberPagination не делает COUNT(*) и OFFSET,
+    поэтому стоимость страницы не зависит от глубины прокрутки.
+    Порядок берётся из queryset (например, из OrderingFilter), затем из
+    view.cursor_ordering, затем из Meta.ordering; id добавляется как
+    последний ключ, чтобы порядок был строго определён.
+    NULL в nullable-ключах всегда идут в конце (в обоих направлениях).
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    default_ordering = ('-created_at', '-pk')
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.nullable = self.get_nullable_fields(queryset.model)
+
+        queryset = queryset.order_by(*[
+            self._order_expression(field) if field.lstrip('-') in self.nullable else field
+            for field in self.ordering
+        ])
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self._after(self.decode_cursor(encoded)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        ordering = [
+            field for field in queryset.query.order_by
+            if isinstance(field, str)
+        ]
+        if not ordering:
+            ordering = list(
+                getattr(view, 'cursor_ordering', None)
+                or queryset.model._meta.ordering
+                or self.default_ordering
+            )
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def get_nullable_fields(self, model):
+        nullable = set()
+        for field in self.ordering:
+            name = field.lstrip('-')
+            try:
+                if model._meta.get_field(name).null:
+                    nullable.add(name)
+            except FieldDoesNotExist:
+                continue
+        return nullable
+
+    @staticmethod
+    def _order_expression(field):
+        if field.startswith('-'):
+            return F(field[1:]).desc(nulls_last=True)
+        return F(field).asc(nulls_last=True)
+
+    def _after(self, values):
+        """
+        Лексикографическое условие «строго после курсора»:
+        (a < x) OR (a = x AND b < y) OR ...
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            if value is None:
+                # Внутри группы NULL ключ не меняется, дальше — только следующие ключи
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            after = Q(**{f'{name}__{lookup}': value})
+            if name in self.nullable:
+                after |= Q(**{f'{name}__isnull': True})
+            condition |= equal & after
+            equal &= Q(**{name: value})
+        return condition
+
+    ########################################
+    # Курсор
+    ########################################
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = attrgetter(field.lstrip('-').replace('__', '.'))(obj)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                value = value.isoformat()
+            elif isinstance(value, decimal.Decimal):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+########################################
+# Номер страницы или курсор — по выбору клиента
+########################################
+class PageOrCursorPagination(PageNumberPagination):
+    """
+    По умолчанию — обычные страницы (?page=N, с count).
+    Курсорный режим включается запросом ?pagination=cursor
+    (или наличием ?cursor=) — для бесконечной прокрутки в WebApp.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def wants_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_cursor(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .idempotency import purge_expired_keys
+from .outbox import relay_outbox as relay
+
+
+@shared_task(ignore_result=True)
+def relay_outbox():
+    """Доставка новых событий outbox всем потребителям"""
+    return relay()
+
+
+@shared_task(ignore_result=True)
+def purge_idempotency_keys():
+    """Удаление сохранённых ответов с истёкшим Idempotency-Key"""
+    return purge_expired_keys()
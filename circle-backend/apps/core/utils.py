@@ -0,0 +1,23 @@
+class QueryCounter:
+    """
+    Считает запросы к БД (без ограничения журнала DEBUG):
+
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        ...
+    counter.count
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: строка сразу отдаётся в поток ответа"""
+
+    def write(self, value):
+        return value
@@ -0,0 +1,123 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'versions:{family}'
+MODIFIED_KEY = 'versions:{family}:modified'
+
+
+########################################
+# Версии семейств ресурсов
+########################################
+def get_version(family):
+    """
+    Текущая версия семейства ресурсов (tours, categories, spheres, ...).
+    Хранится в общем кеше (settings.CACHES): запись в любом web-воркере
+    или задаче celery сразу видна всем процессам.
+    Версия только растёт: при потере ключа стартует с текущего времени
+    в микросекундах, то есть заведомо выше любой выданной ранее.
+    """
+    key = VERSION_KEY.format(family=family)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        cache.add(MODIFIED_KEY.format(family=family), int(time.time()), None)
+        version = cache.get(key)
+    return version
+
+
+def get_last_modified(family):
+    modified = cache.get(MODIFIED_KEY.format(family=family))
+    if modified is None:
+        get_version(family)
+        modified = cache.get(MODIFIED_KEY.format(family=family))
+    return modified
+
+
+def bump_version(*families):
+    """Увеличивает версию семейств после записи"""
+    now = int(time.time())
+    for family in families:
+        key = VERSION_KEY.format(family=family)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключа нет — get_version заведёт новую, более старшую версию
+            get_version(family)
+        cache.set(MODIFIED_KEY.format(family=family), now, None)
+
+
+########################################
+# Условные GET (ETag / Last-Modified)
+########################################
+class NotModified(Exception):
+    """Ответ 304: у клиента актуальная версия"""
+
+
+class VersionedResourceMixin:
+    """
+    Для list/retrieve отвечает 304 по If-None-Match / If-Modified-Since
+    сразу после аутентификации, до построения queryset: ETag считается
+    из версий семейств ресурсов, адреса запроса и формата ответа.
+
+    version_families — семейства, от которых зависит ответ.
+    get_personal_families() — семейства текущего пользователя
+    (например, его wishlist); такие ответы кешируются только приватно.
+    """
+    version_families = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_personal_families(self, request):
+        return ()
+
+    def get_etag(self, request, families):
+        versions = ','.join(f'{family}:{get_version(family)}' for family in families)
+        renderer = getattr(request, 'accepted_media_type', '')
+        raw = f'{versions}|{request.get_host()}|{request.get_full_path()}|{renderer}'
+        return '"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        self._etag = None
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return
+
+        self._personal = tuple(self.get_personal_families(request))
+        families = tuple(self.version_families) + self._personal
+        self._etag = self.get_etag(request, families)
+        self._last_modified = max(get_last_modified(family) for family in families)
+        if self._not_modified(request, self._etag, self._last_modified):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_etag', None) and response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response['ETag'] = self._etag
+            response['Last-Modified'] = http_date(self._last_modified)
+            response['Cache-Control'] = 'private, no-cache' if self._personal else 'no-cache'
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    @staticmethod
+    def _not_modified(request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return etag in tags or '*' in tags
+
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and last_modified <= since
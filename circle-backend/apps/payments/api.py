@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 
+from apps.core.pagination import PageOrCursorPagination
 from .models import PaymentTransaction, AccountingTransaction
 from .serializers import PaymentTransactionSerializer, AccountingTransactionSerializer
 
@@ -30,6 +31,7 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = PaymentTransactionSerializer
     permission_classes = [IsAuthenticatedStaffOrAdmin]
+    pagination_class = PageOrCursorPagination
     queryset = PaymentTransaction.objects.select_related(
         'user', 'agency', 'booking'
     ).order_by('-created_at')
@@ -59,6 +61,7 @@ class AccountingTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = AccountingTransactionSerializer
     permission_classes = [IsAuthenticatedStaffOrAdmin]
+    pagination_class = PageOrCursorPagination
     queryset = AccountingTransaction.objects.select_related(
         'agency', 'payment_transaction'
     ).order_by('-created_at')
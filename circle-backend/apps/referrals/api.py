@@ -2,6 +2,8 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from apps.core.idempotency import IdempotentMixin
+from apps.core.pagination import PageOrCursorPagination
 from .permissions import IsAdminPermission
 from .models import ReferralPartner, ReferralBonus, WithdrawalRequest
 from .serializers import (
@@ -52,6 +54,7 @@ class ReferralBonusViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = ReferralBonus.objects.select_related('partner', 'partner__user')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageOrCursorPagination
     serializer_class = ReferralBonusSerializer
 
     def get_permissions(self):
@@ -75,15 +78,16 @@ class ReferralBonusViewSet(viewsets.ReadOnlyModelViewSet):
 ######################################
 # ViewSet для заявок на вывод
 ######################################
-class WithdrawalRequestViewSet(viewsets.ModelViewSet):
+class WithdrawalRequestViewSet(IdempotentMixin, viewsets.ModelViewSet):
     """
     /api/referrals/withdrawals/
-    - POST → подать заявку
+    - POST → подать заявку (с Idempotency-Key — один раз на ключ)
     - GET my/ → список своих заявок
     - GET list (для админов)
     """
     queryset = WithdrawalRequest.objects.select_related('partner', 'partner__user')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageOrCursorPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -0,0 +1,190 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core.versioning import bump_version, get_version
+from .cache import invalidate_catalog_cache
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVATION_FAMILY = 'promotions'
+ACTIVATION_KEY = 'promotions:active'
+# valid_until включительно: запись перестаёт действовать сразу после него
+AFTER = timedelta(microseconds=1)
+# Даже без ближайшей границы снимок живёт не дольше этого: страховка
+# от изменений в обход сигналов (update(), правка в БД)
+MAX_AGE = timedelta(minutes=10)
+
+
+########################################
+# Снимок действующих акций и промокодов
+########################################
+class ActiveSet:
+    """
+    Действующие акции и промокоды по сессиям на отрезке [computed_at, next_boundary):
+    до ближайшего начала или конца окна набор не меняется,
+    поэтому даты не нужно сравнивать на каждый запрос.
+    """
+
+    def __init__(self, promotions, promo_codes, computed_at, next_boundary, version=None):
+        # {session_id: (id, ...)}
+        self.promotions = promotions
+        self.promo_codes = promo_codes
+        self.promotion_ids = frozenset(pk for ids in promotions.values() for pk in ids)
+        self.promo_code_ids = frozenset(pk for ids in promo_codes.values() for pk in ids)
+        self.computed_at = computed_at
+        self.next_boundary = next_boundary
+        self.version = version
+
+    def is_fresh(self, now):
+        if now >= self.computed_at + MAX_AGE:
+            return False
+        return self.next_boundary is None or now < self.next_boundary
+
+    def session_promotions(self, session_id):
+        return self.promotions.get(session_id, ())
+
+    def session_promo_codes(self, session_id):
+        return self.promo_codes.get(session_id, ())
+
+    def to_cache(self):
+        return {
+            'promotions': self.promotions,
+            'promo_codes': self.promo_codes,
+            'computed_at': self.computed_at,
+            'next_boundary': self.next_boundary,
+            'version': self.version,
+        }
+
+    @classmethod
+    def from_cache(cls, data):
+        return cls(**data)
+
+
+def compute_active_set(now=None):
+    """
+    Два запроса по не истёкшим записям: действующие сейчас
+    попадают в набор, будущие — только в расчёт ближайшей границы.
+    """
+    from .models import Promotion, PromoCode
+
+    now = now or timezone.now()
+    boundaries = []
+
+    def collect(queryset):
+        active = defaultdict(list)
+        rows = (
+            queryset
+            .filter(is_active=True, valid_until__gte=now)
+            .order_by('-created_at')  # порядок акций — как Meta.ordering
+            .values_list('pk', 'session_id', 'valid_from', 'valid_until')
+        )
+        for pk, session_id, valid_from, valid_until in rows:
+            if valid_from <= now:
+                active[session_id].append(pk)
+                boundaries.append(valid_until + AFTER)
+            else:
+                boundaries.append(valid_from)
+        return {session_id: tuple(ids) for session_id, ids in active.items()}
+
+    promotions = collect(Promotion.objects.all())
+    # Коды кампаний (PromoCodeBatch) не индексируются: их сотни тысяч,
+    # окно проверяется по строке кода при бронировании
+    promo_codes = collect(PromoCode.objects.filter(batch__isnull=True))
+    return ActiveSet(promotions, promo_codes, now, min(boundaries, default=None))
+
+
+########################################
+# Чтение (кеш процесса → общий кеш → БД)
+########################################
+_local = None
+
+
+def get_active_set(now=None):
+    """
+    Текущий набор действующих акций и промокодов.
+    Обычно — из памяти процесса: одна проверка версии семейства 'promotions'
+    в общем кеше, так что изменение в любом процессе сбрасывает снимки всех.
+    После границы окна или через MAX_AGE процесс пересчитывает набор сам,
+    не дожидаясь задачи.
+    """
+    global _local
+
+    now = now or timezone.now()
+    version = get_version(ACTIVATION_FAMILY)
+    current = _local
+    if current is not None and current.version == version and current.is_fresh(now):
+        return current
+
+    stored = cache.get(ACTIVATION_KEY)
+    if stored is not None:
+        stored = ActiveSet.from_cache(stored)
+    if stored is not None and stored.version == version and stored.is_fresh(now):
+        current = stored
+    else:
+        current = compute_active_set(now)
+        current.version = version
+        # Общий кеш заполняем только если его нет: смену набора на границе
+        # публикует refresh_active_promotions (вместе с версией каталога)
+        if stored is None:
+            cache.add(ACTIVATION_KEY, current.to_cache(), None)
+    _local = current
+    return current
+
+
+def invalidate_active_set():
+    """Акции или промокоды изменены — набор пересчитывается при следующем чтении"""
+    cache.delete(ACTIVATION_KEY)
+    bump_version(ACTIVATION_FAMILY)
+
+
+########################################
+# Переключение на границах окон (celery beat)
+########################################
+def refresh_active_promotions():
+    """
+    Пересчитывает набор и, если он изменился (началась или закончилась акция),
+    публикует его, увеличивает версию каталога и пересчитывает агрегаты
+    затронутых туров (min_price). Возвращает число затронутых сессий.
+    """
+    from .aggregates import refresh_tour_aggregates
+    from .models import TourSession
+
+    stored = cache.get(ACTIVATION_KEY)
+    previous = ActiveSet.from_cache(stored) if stored is not None else None
+    current = compute_active_set()
+
+    if previous is not None:
+        changed = {
+            session_id
+            for mapping, old in (
+                (current.promotions, previous.promotions),
+                (current.promo_codes, previous.promo_codes),
+            )
+            for session_id in set(mapping) | set(old)
+            if mapping.get(session_id) != old.get(session_id)
+        }
+        if not changed:
+            # Набор тот же — продлеваем снимок (MAX_AGE, граница), версию не трогаем
+            current.version = previous.version
+            cache.set(ACTIVATION_KEY, current.to_cache(), None)
+            return 0
+    else:
+        changed = set()
+
+    bump_version(ACTIVATION_FAMILY)
+    current.version = get_version(ACTIVATION_FAMILY)
+    cache.set(ACTIVATION_KEY, current.to_cache(), None)
+    invalidate_catalog_cache()
+
+    if changed:
+        tour_ids = set(
+            TourSession.objects.filter(pk__in=changed).values_list('tour_id', flat=True)
+        )
+        refresh_tour_aggregates(tour_ids)
+        logger.info("Окна акций: изменились %s сессий, туров %s", len(changed), len(tour_ids))
+    return len(changed)
@@ -1,6 +1,14 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.utils import timezone
+from .aggregates import refresh_tour_aggregates
+from .cache import invalidate_catalog_cache
+from .documents import schedule_document_rebuild
+from .flash_sale import close_flash_sale, open_flash_sale
 from .models import (
     TourCategory,
+    Destination,
     Tour,
     TourSchedule,
     TourParameterDefinition,
@@ -9,8 +17,9 @@ from .models import (
     TourSession,
     TourWishlist
 )
-from .models import Promotion, PromoCode
+from .models import Promotion, PromoCode, PromoCodeBatch
 
+FLASH_SALE_DURATION = timedelta(hours=2)
 
 
 @admin.register(TourCategory)
@@ -21,6 +30,14 @@ class TourCategoryAdmin(admin.ModelAdmin):
     ordering = ("name",)
 
 
+@admin.register(Destination)
+class DestinationAdmin(admin.ModelAdmin):
+    list_display = ("name", "region", "order", "is_active")
+    search_fields = ("name",)
+    list_filter = ("region", "is_active")
+    ordering = ("order", "name")
+
+
 class TourParameterValueInline(admin.TabularInline):
     model = TourParameterValue
     extra = 1
@@ -43,9 +60,11 @@ class TourSessionInline(admin.TabularInline):
     extra = 1
     fields = [
         'date_start', 'date_end', 'capacity',
-        'available_seats', 'price_override', 'is_active'
+        'available_seats', 'price_override', 'is_active', 'flash_sale_until'
     ]
-    readonly_fields = ['available_seats']
+    # Режим распродажи меняется только действиями TourSessionAdmin:
+    # они открывают и закрывают счётчик мест вместе с полем
+    readonly_fields = ['available_seats', 'flash_sale_until']
     verbose_name = "Tour Date"
     verbose_name_plural = "Available Dates"
     ordering = ['date_start']
@@ -54,15 +73,15 @@ class TourSessionInline(admin.TabularInline):
 @admin.register(Tour)
 class TourAdmin(admin.ModelAdmin):
     list_display = ("title", "agency", "type", "price_from", "sessions_count", "is_active")
-    list_filter = ("is_active", "type", "agency", "created_at", "season_start")
+    list_filter = ("is_active", "type", "destination", "agency", "created_at", "season_start")
     search_fields = ("title", "description", "agency__name")
     prepopulated_fields = {"slug": ("title",)}
-    autocomplete_fields = ['agency', 'type', 'participants']
+    autocomplete_fields = ['agency', 'type', 'destination', 'participants']
     inlines = [TourSessionInline, TourParameterValueInline, TourScheduleInline]
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         (None, {
-            'fields': ('title', 'slug', 'agency', 'type', 'description')
+            'fields': ('title', 'slug', 'agency', 'type', 'destination', 'description')
         }),
         ('Pricing & Details', {
             'fields': (
@@ -86,11 +105,15 @@ class TourAdmin(admin.ModelAdmin):
     
     def activate_tours(self, request, queryset):
         updated = queryset.update(is_active=True)
+        invalidate_catalog_cache()  # update() не отправляет post_save
+        schedule_document_rebuild(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} tours activated.')
     activate_tours.short_description = "Activate selected tours"
     
     def deactivate_tours(self, request, queryset):
         updated = queryset.update(is_active=False)
+        invalidate_catalog_cache()  # update() не отправляет post_save
+        schedule_document_rebuild(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{updated} tours deactivated.')
     deactivate_tours.short_description = "Deactivate selected tours"
 
@@ -99,12 +122,37 @@ class TourAdmin(admin.ModelAdmin):
 class TourSessionAdmin(admin.ModelAdmin):
     list_display = (
         "tour", "date_start", "date_end",
-        "capacity", "available_seats", "price_override", "is_active"
+        "capacity", "available_seats", "price_override", "is_active", "flash_sale_until"
     )
     list_filter = ("is_active", "tour")
     search_fields = ("tour__title",)
     autocomplete_fields = ['tour']
     ordering = ['date_start']
+    # Только через start/stop: правка поля в форме оставила бы счётчик
+    # открытым, и продажи из БД затёрлись бы при закрытии распродажи
+    readonly_fields = ['flash_sale_until']
+    actions = ['start_flash_sale', 'stop_flash_sale']
+
+    def start_flash_sale(self, request, queryset):
+        until = timezone.now() + FLASH_SALE_DURATION
+        started = 0
+        for session in queryset.filter(is_active=True):
+            TourSession.objects.filter(pk=session.pk).update(flash_sale_until=until)
+            open_flash_sale(session.pk)
+            started += 1
+        self.message_user(request, f'Flash sale started for {started} sessions until {until:%Y-%m-%d %H:%M}.')
+    start_flash_sale.short_description = "Start flash sale (2 hours)"
+
+    def stop_flash_sale(self, request, queryset):
+        sessions = list(queryset.filter(flash_sale_until__isnull=False).values_list('pk', 'tour_id'))
+        for session_id, _ in sessions:
+            close_flash_sale(session_id)
+        tour_ids = {tour_id for _, tour_id in sessions}
+        invalidate_catalog_cache()  # update() не отправляет post_save
+        schedule_document_rebuild(tour_ids)
+        refresh_tour_aggregates(tour_ids)
+        self.message_user(request, f'Flash sale stopped for {len(sessions)} sessions.')
+    stop_flash_sale.short_description = "Stop flash sale (write seats back)"
 
 
 @admin.register(TourSchedule)
@@ -148,7 +196,7 @@ class TourChatAdmin(admin.ModelAdmin):
 @admin.register(Promotion)
 class PromotionAdmin(admin.ModelAdmin):
     list_display = ('name', 'session', 'discount_percent', 'discount_amount', 'valid_from', 'valid_until', 'is_active')
-    list_filter = ('is_active', 'valid_from', 'valid_until', 'session__tour__agency')
+    list_filter = ('is_active', 'valid_from', 'valid_until', 'agency')
     search_fields = ('name', 'description')
     readonly_fields = ('created_at', 'updated_at')
 
@@ -171,9 +219,9 @@ class PromotionAdmin(admin.ModelAdmin):
 @admin.register(PromoCode)
 class PromoCodeAdmin(admin.ModelAdmin):
     list_display = ('code', 'session', 'discount_percent', 'discount_amount', 'usage_limit', 'used_count', 'valid_from', 'valid_until', 'is_active')
-    list_filter = ('is_active', 'valid_from', 'valid_until', 'session__tour__agency')
+    list_filter = ('is_active', 'valid_from', 'valid_until', 'agency', 'batch')
     search_fields = ('code', 'description')
-    readonly_fields = ('created_at', 'updated_at', 'used_count')
+    readonly_fields = ('created_at', 'updated_at', 'used_count', 'batch')
 
     fieldsets = (
         (None, {
@@ -194,6 +242,15 @@ class PromoCodeAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(PromoCodeBatch)
+class PromoCodeBatchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'session', 'requested_count', 'created_count', 'status', 'codes_per_second', 'created_at')
+    list_filter = ('status', 'session__tour__agency')
+    search_fields = ('name', 'prefix')
+    raw_id_fields = ('session',)
+    readonly_fields = ('created_count', 'status', 'error', 'created_by', 'created_at', 'started_at', 'finished_at')
+
+
 @admin.register(TourWishlist)
 class TourWishlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'tour', 'priority', 'added_at')
@@ -0,0 +1,98 @@
+import logging
+from collections import defaultdict
+
+from django.apps import apps
+
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 2000
+
+# Модели с денормализованным agency_id и путь к агентству через сессию
+SCOPED_MODELS = {
+    'bookings.Booking': 'session__tour__agency_id',
+    'tours.Promotion': 'session__tour__agency_id',
+    'tours.PromoCode': 'session__tour__agency_id',
+}
+
+
+def scoped_models():
+    return {apps.get_model(label): lookup for label, lookup in SCOPED_MODELS.items()}
+
+
+########################################
+# Заполнение при записи
+########################################
+def session_agency_id(instance):
+    """
+    Агентство записи по её сессии. Без запроса, если тур уже загружен
+    (бронирование создаётся с session и tour из валидации).
+    """
+    from .models import Tour, TourSession
+
+    model = type(instance)
+    if hasattr(model, 'tour') and model.tour.is_cached(instance) and instance.tour is not None:
+        return instance.tour.agency_id
+    if model.session.is_cached(instance) and instance.session is not None:
+        session = instance.session
+        if TourSession.tour.is_cached(session):
+            return session.tour.agency_id
+        return Tour.objects.filter(pk=session.tour_id).values_list('agency_id', flat=True).first()
+    return (
+        TourSession.objects.filter(pk=instance.session_id)
+        .values_list('tour__agency_id', flat=True)
+        .first()
+    )
+
+
+def sync_tour_agency(tour):
+    """Тур передали другому агентству — переносим его брони, акции и промокоды"""
+    updated = 0
+    for model, lookup in scoped_models().items():
+        tour_lookup = lookup.replace('__agency_id', '_id')
+        updated += (
+            model.objects.filter(**{tour_lookup: tour.pk})
+            .exclude(agency_id=tour.agency_id)
+            .update(agency_id=tour.agency_id)
+        )
+    if updated:
+        logger.info("Тур %s: агентство обновлено у %s записей", tour.pk, updated)
+    return updated
+
+
+########################################
+# Заполнение существующих строк
+########################################
+def backfill_agency(model, lookup, chunk_size=BACKFILL_CHUNK_SIZE, progress=None):
+    """
+    Проставляет agency_id строкам model чанками по первичному ключу:
+    один SELECT с агентством через сессию и по одному UPDATE на агентство
+    в чанке. Исправляет и разошедшиеся значения. Можно прерывать
+    и запускать повторно.
+
+    progress(scanned, updated) вызывается после каждого чанка.
+    Возвращает {'scanned', 'updated'}.
+    """
+    stats = {'scanned': 0, 'updated': 0}
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'agency_id', lookup)[:chunk_size]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        stale = defaultdict(list)
+        for pk, current, agency_id in rows:
+            if current != agency_id:
+                stale[agency_id].append(pk)
+        for agency_id, pks in stale.items():
+            stats['updated'] += model.objects.filter(pk__in=pks).update(agency_id=agency_id)
+
+        stats['scanned'] += len(rows)
+        if progress:
+            progress(stats['scanned'], stats['updated'])
+    return stats
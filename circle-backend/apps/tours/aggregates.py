@@ -0,0 +1,128 @@
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import invalidate_catalog_cache
+from .pricing import PricingContext
+
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_FIELDS = ('next_departure', 'min_price', 'seats_left', 'participants_count')
+
+
+########################################
+# Расчёт
+########################################
+def compute_tour_aggregates(tour_ids):
+    """
+    Считает агрегаты для набора туров четырьмя запросами
+    (туры, предстоящие сессии, их акции, участники).
+    Возвращает {tour_id: {'next_departure', 'min_price', 'seats_left', 'participants_count'}}
+    """
+    from apps.bookings.models import Booking
+    from .models import Tour, TourSession
+
+    tour_ids = list(tour_ids)
+    base_prices = dict(Tour.objects.filter(pk__in=tour_ids).values_list('pk', 'base_price'))
+    result = {
+        tour_id: {
+            'next_departure': None,
+            'min_price': None,
+            'seats_left': 0,
+            'participants_count': 0,
+        }
+        for tour_id in base_prices
+    }
+    if not result:
+        return result
+
+    sessions = list(
+        TourSession.objects
+        .filter(tour_id__in=result, is_active=True, date_start__gte=timezone.localdate())
+        .only('tour_id', 'date_start', 'available_seats', 'price_override')
+    )
+    # Цена с учётом акций (без промокодов) — общий расчёт из pricing
+    pricing = PricingContext([session.pk for session in sessions])
+    for session in sessions:
+        entry = result[session.tour_id]
+        base_price = session.price_override if session.price_override is not None else base_prices[session.tour_id]
+        price = pricing.discounted_price(session.pk, base_price)
+
+        entry['seats_left'] += session.available_seats
+        if entry['next_departure'] is None or session.date_start < entry['next_departure']:
+            entry['next_departure'] = session.date_start
+        if entry['min_price'] is None or price < entry['min_price']:
+            entry['min_price'] = price
+
+    # Уникальные пользователи с оплаченной бронью — как в load_participants
+    participants = (
+        Booking.objects
+        .filter(tour_id__in=result, status='paid')
+        .values('tour_id')
+        .annotate(count=Count('user_id', distinct=True))
+    )
+    for row in participants:
+        result[row['tour_id']]['participants_count'] = row['count']
+
+    for entry in result.values():
+        if entry['min_price'] is not None:
+            entry['min_price'] = entry['min_price'].quantize(Decimal('0.01'))
+    return result
+
+
+########################################
+# Запись
+########################################
+def refresh_tour_aggregates(tour_ids, only_changed=False):
+    """
+    Пересчитывает и сохраняет агрегаты туров.
+    update() по строкам не вызывает post_save у Tour — без рекурсии сигналов.
+    Возвращает число обновлённых туров.
+    """
+    from .models import Tour
+
+    aggregates = compute_tour_aggregates(tour_ids)
+    if only_changed:
+        current = Tour.objects.filter(pk__in=aggregates).values('pk', *AGGREGATE_FIELDS)
+        for row in current:
+            if all(row[field] == aggregates[row['pk']][field] for field in AGGREGATE_FIELDS):
+                del aggregates[row['pk']]
+
+    if not aggregates:
+        return 0
+
+    now = timezone.now()
+    with transaction.atomic():
+        for tour_id, values in aggregates.items():
+            Tour.objects.filter(pk=tour_id).update(aggregates_updated_at=now, **values)
+    # Списки витрины показывают агрегаты — сбрасываем уже после записи
+    invalidate_catalog_cache()
+    return len(aggregates)
+
+
+def schedule_aggregates_refresh(tour_ids):
+    """Пересчёт агрегатов после коммита текущей транзакции"""
+    tour_ids = sorted({tour_id for tour_id in tour_ids if tour_id})
+    if tour_ids:
+        transaction.on_commit(lambda: refresh_tour_aggregates(tour_ids))
+
+
+def reconcile_tour_aggregates(batch_size=500):
+    """
+    Сверка агрегатов всех туров: исправляет расхождения (смена дня,
+    начало/конец акций, массовые update() без сигналов).
+    Возвращает число исправленных туров.
+    """
+    from .models import Tour
+
+    tour_ids = list(Tour.objects.values_list('pk', flat=True))
+    fixed = 0
+    for start in range(0, len(tour_ids), batch_size):
+        fixed += refresh_tour_aggregates(tour_ids[start:start + batch_size], only_changed=True)
+    if fixed:
+        logger.info("Агрегаты туров: исправлено расхождений %s из %s", fixed, len(tour_ids))
+    return fixed
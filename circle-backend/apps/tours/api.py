@@ -1,17 +1,32 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import cache
 from django.db.models import Q
-from .models import Tour, TourCategory, TourWishlist
+from django.shortcuts import get_object_or_404
+from apps.core.fieldsets import SparseFieldsetViewMixin
+from apps.core.idempotency import IdempotentMixin
+from apps.core.pagination import PageOrCursorPagination
+from apps.core.versioning import VersionedResourceMixin
+from .cache import CATALOG_CACHE_TIMEOUT, CATALOG_FAMILY, list_cache_key
+from .documents import get_tour_document, render_tour_document, schedule_document_rebuild
+from .filters import TourFilter
+from .search import TourSearchFilter, TourOrderingFilter
+from .models import Tour, TourCategory, Destination, TourWishlist, public_promo_codes
 from .serializers import (
     TourListSerializer,
     TourDetailSerializer,
     TourCategorySerializer,
+    DestinationSerializer,
+    BookingQuoteRequestSerializer,
+    BookingQuoteSerializer,
 )
+from .pricing import quote_bookings
 
 
-class TourCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class TourCategoryViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """
     /api/tours/categories/
     - список категорий туров для фильтра
@@ -19,68 +34,151 @@ class TourCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = TourCategory.objects.filter(is_active=True)
     serializer_class = TourCategorySerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('categories',)
 
 
+class DestinationViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    /api/tours/destinations/
+    - список направлений для фильтра (?destination=)
+    """
+    queryset = Destination.objects.filter(is_active=True)
+    serializer_class = DestinationSerializer
+    permission_classes = [permissions.AllowAny]
+    version_families = ('destinations',)
+
+
+class BookingQuoteView(APIView):
+    """
+    POST /api/tours/quote/
+    - разбивка цены для нескольких позиций за один запрос
+    - {"items": [{"session": 1, "seats": 2, "promo_code": "SUMMER", "bonus": "0"}, ...]}
+    - считается тем же кодом, что и создание брони (apps.tours.pricing.quote_booking);
+      ошибки позиций возвращаются в поле error, остальные позиции считаются
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = BookingQuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quotes = quote_bookings(serializer.validated_data['items'], user=request.user)
+        return Response({'results': BookingQuoteSerializer(quotes, many=True).data})
 
 
 
-class TourViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TourViewSet(IdempotentMixin, VersionedResourceMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     /api/tours/
     - GET → список туров (витрина) с фильтрацией
-    - GET /{id}/ → детальная страница тура
+    - GET /{id}/ или /{slug}/ → детальная страница тура (из TourDocument)
     
-    Фильтры:
+    Фильтры (см. TourFilter):
     - ?category={id} - по типу тура
     - ?destination={id} - по направлению  
-    - ?price_min={amount} - минимальная цена
-    - ?price_max={amount} - максимальная цена
-    - ?search={text} - поиск по названию/описанию
+    - ?price_min={amount} / ?price_max={amount} - диапазон цены
+    - ?duration_min={days} / ?duration_max={days} - длительность
+    - ?season_from={date} / ?season_to={date} - окно сезона
+    - ?date_from={date} / ?date_to={date} - даты выезда
+    - ?has_seats=true - есть свободные места
+    - ?search={text} - полнотекстовый поиск (по релевантности, с подсветкой)
+    - ?ordering=price_from|-price_from|duration_days|-created_at
+    - ?ordering=next_departure|min_price - ближайший выезд / цена с учётом акций
+    - ?pagination=cursor - курсорная пагинация для бесконечной прокрутки
+    - ?fields=id,title,sessions.date_start - только нужные поля
+    - ?expand=sessions - даты выездов в списке
+
+    Ответы list/retrieve несут ETag от версии каталога (и wishlist
+    пользователя): повторный запрос с If-None-Match получает 304.
+    POST/DELETE /{id}/wishlist/ принимают Idempotency-Key.
     """
     permission_classes = [permissions.AllowAny]
-    filter_backends = []  # Временно отключаем фильтры для исправления ошибки
-    filterset_fields = ['type']
-    search_fields = ['title', 'description']
-    ordering_fields = ['price_from', 'duration_days', 'created_at']
+    pagination_class = PageOrCursorPagination
+    filter_backends = [DjangoFilterBackend, TourSearchFilter, TourOrderingFilter]
+    filterset_class = TourFilter
+    ordering_fields = ['price_from', 'duration_days', 'created_at', 'next_departure', 'min_price']
     ordering = ['-created_at']
+    version_families = (CATALOG_FAMILY,)
+    idempotent_actions = ('wishlist',)
+
+    # Связи загружаются только если соответствующее поле попало в ответ
+    sparse_relations = {
+        'category': {'select': ['type']},
+        'main_image': {'select': ['main_image']},
+        'gallery': {'prefetch': ['gallery']},
+        'schedule': {'prefetch': ['schedule']},
+        'sessions': {'prefetch': ['sessions__promotions', public_promo_codes('sessions__promo_codes')]},
+        'parameter_values': {'prefetch': ['parameter_values__parameter_definition']},
+    }
+    # lookup, фильтры по умолчанию и ключи сортировки/курсора
+    sparse_always_only = (
+        'pk', 'slug', 'is_active', 'created_at', 'price_from', 'duration_days',
+        'next_departure', 'min_price',
+    )
 
     def get_queryset(self):
-        queryset = (
-            Tour.objects.filter(is_active=True)
-            .select_related('type', 'agency')
-            .prefetch_related(
-                'gallery',
-                'schedule',
-                'sessions',
-                'parameter_values__parameter_definition',
-                'participants'
-            )
-        )
-        
-        # Фильтр по цене (с поддержкой обычных Django request)
-        query_params = getattr(self.request, 'query_params', self.request.GET)
-        price_min = query_params.get('price_min')
-        price_max = query_params.get('price_max')
-        
-        if price_min:
-            try:
-                queryset = queryset.filter(price_from__gte=float(price_min))
-            except ValueError:
-                pass
-                
-        if price_max:
-            try:
-                queryset = queryset.filter(price_from__lte=float(price_max))
-            except ValueError:
-                pass
-        
-        return queryset
+        return self.apply_sparse_fieldset(Tour.objects.filter(is_active=True))
 
     def get_serializer_class(self):
         if self.action == 'list':
             return TourListSerializer
         return TourDetailSerializer
 
+    def get_personal_families(self, request):
+        # is_wishlisted зависит от пользователя
+        if request.user.is_authenticated:
+            return (TourWishlist.version_family(request.user.pk),)
+        return ()
+
+    def get_object(self):
+        # Тур доступен и по id, и по slug
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        field = 'pk' if str(lookup).isdigit() else 'slug'
+        obj = get_object_or_404(self.get_queryset(), **{field: lookup})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            # Общий (анонимный) рендер для кеша; персональные поля
+            # накладываются в _apply_user_fields
+            context['wishlisted_ids'] = frozenset()
+        else:
+            context['wishlisted_ids'] = TourWishlist.get_wishlisted_tour_ids(self.request.user)
+        return context
+
+    def _apply_user_fields(self, tours_data):
+        """Накладывает персональные поля (is_wishlisted) на общий рендер"""
+        wishlisted_ids = TourWishlist.get_wishlisted_tour_ids(self.request.user)
+        for tour_data in tours_data:
+            if 'is_wishlisted' in tour_data:
+                tour_data['is_wishlisted'] = tour_data['id'] in wishlisted_ids
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, CATALOG_CACHE_TIMEOUT)
+
+        results = data['results'] if isinstance(data, dict) else data
+        self._apply_user_fields(results)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = get_tour_document(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if data is not None:
+            data = render_tour_document(data, request)
+        else:
+            # Документ ещё не собран — отдаём живой рендер и ставим сборку
+            instance = self.get_object()
+            data = self.get_serializer(instance).data
+            schedule_document_rebuild([instance.pk])
+
+        self._apply_user_fields([data])
+        return Response(data)
+
     @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated])
     def wishlist(self, request, pk=None):
         """
@@ -105,6 +203,7 @@ class TourViewSet(viewsets.ReadOnlyModelViewSet):
 
         elif request.method == 'DELETE':
             deleted_count, _ = TourWishlist.objects.filter(user=user, tour=tour).delete()
+            TourWishlist.invalidate_cache(user.pk)
             if deleted_count > 0:
                 return Response({
                     'message': 'Тур удален из планов',
@@ -120,8 +219,11 @@ class TourViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 
-from .models import Promotion, PromoCode
-from .serializers import PromotionSerializer, PromoCodeSerializer
+from django.http import StreamingHttpResponse
+from rest_framework import mixins
+from .models import Promotion, PromoCode, PromoCodeBatch
+from .promo_batches import iter_batch_csv, schedule_batch_generation
+from .serializers import PromotionSerializer, PromoCodeSerializer, PromoCodeBatchSerializer
 
 
 ########################################
@@ -151,7 +253,7 @@ class PromotionViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             return qs
         if user.is_staff and user.agency:
-            return qs.filter(session__tour__agency=user.agency)
+            return qs.filter(agency=user.agency)
         return Promotion.objects.none()
 
 
@@ -174,10 +276,46 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             return qs
         if user.is_staff and user.agency:
-            return qs.filter(session__tour__agency=user.agency)
+            return qs.filter(agency=user.agency)
         return PromoCode.objects.none()
 
 
+########################################
+# PromoCodeBatch ViewSet
+########################################
+class PromoCodeBatchViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    /api/tours/promo-batches/
+    - POST → пачка одноразовых кодов кампании (генерируется в фоне, status → ready)
+    - GET /{id}/ → ход генерации: created_count, codes_per_second
+    - GET /{id}/export/ → потоковая выгрузка кодов в CSV
+    - только сотрудники; менеджер видит пачки своего агентства или созданные им
+    """
+    serializer_class = PromoCodeBatchSerializer
+    permission_classes = [permissions.IsAdminUser]
+    queryset = PromoCodeBatch.objects.select_related('session', 'session__tour').order_by('-created_at')
+
+    def get_queryset(self):
+        user = self.request.user
+        qs = self.queryset
+        if user.is_superuser:
+            return qs
+        if getattr(user, 'agency', None):
+            return qs.filter(session__tour__agency=user.agency)
+        return qs.filter(created_by=user)
+
+    def perform_create(self, serializer):
+        batch = serializer.save(created_by=self.request.user)
+        schedule_batch_generation(batch)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        batch = self.get_object()
+        response = StreamingHttpResponse(iter_batch_csv(batch), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="promo-codes-{batch.pk}.csv"'
+        return response
+
+
 ########################################
 # TourWishlist ViewSet  
 ########################################
@@ -186,8 +324,10 @@ class TourWishlistViewSet(viewsets.ReadOnlyModelViewSet):
     /api/tours/wishlist/
     - GET → список запланированных туров пользователя
     - GET /{id}/ → детали запланированного тура
+    - ?pagination=cursor → список порциями (по умолчанию — весь список)
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageOrCursorPagination
     
     def get_queryset(self):
         return (
@@ -209,22 +349,31 @@ class TourWishlistViewSet(viewsets.ReadOnlyModelViewSet):
     def list(self, request, *args, **kwargs):
         """Возвращает список запланированных туров"""
         queryset = self.get_queryset()
+        use_cursor = self.paginator.wants_cursor(request)
+        if use_cursor:
+            queryset = self.paginate_queryset(queryset)
+        else:
+            queryset = list(queryset)
         
         # Извлекаем туры из wishlist объектов
         tours = [wishlist_item.tour for wishlist_item in queryset]
         
-        # Добавляем метаданные wishlist
-        tours_data = []
+        # Сериализуем все туры разом, чтобы участники грузились одним запросом
         serializer_class = self.get_serializer_class()
+        serialized_tours = serializer_class(tours, many=True, context={'request': request}).data
         
-        for wishlist_item in queryset:
-            tour_data = serializer_class(wishlist_item.tour, context={'request': request}).data
+        # Добавляем метаданные wishlist
+        tours_data = []
+        for wishlist_item, tour_data in zip(queryset, serialized_tours):
             tour_data['wishlist_meta'] = {
                 'added_at': wishlist_item.added_at,
                 'priority': wishlist_item.priority,
                 'notes': wishlist_item.notes
             }
             tours_data.append(tour_data)
+
+        if use_cursor:
+            return self.get_paginated_response(tours_data)
         
         return Response({
             'count': len(tours_data),
@@ -235,6 +384,7 @@ class TourWishlistViewSet(viewsets.ReadOnlyModelViewSet):
     def clear(self, request):
         """Очистить все запланированные туры"""
         deleted_count, _ = self.get_queryset().delete()
+        TourWishlist.invalidate_cache(request.user.pk)
         return Response({
             'message': f'Удалено {deleted_count} запланированных туров',
             'deleted_count': deleted_count
@@ -0,0 +1,41 @@
+import hashlib
+
+from django.conf import settings
+
+from apps.core.versioning import get_version, bump_version
+
+
+CATALOG_FAMILY = 'tours'
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'TOUR_CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_catalog_generation():
+    """
+    Текущее поколение кеша каталога — версия семейства ресурсов 'tours'.
+    Все ключи витрины (и ETag) включают версию, поэтому её увеличение
+    разом делает устаревшими все закешированные страницы. Версия и страницы
+    лежат в общем кеше (settings.CACHES): сброс из задачи celery или
+    другого web-воркера сразу виден всем процессам.
+    """
+    return get_version(CATALOG_FAMILY)
+
+
+def invalidate_catalog_cache():
+    """Сбрасывает весь кеш списков витрины туров"""
+    bump_version(CATALOG_FAMILY)
+
+
+def _request_digest(request):
+    query_params = getattr(request, 'query_params', request.GET)
+    params = sorted(
+        (name, value)
+        for name in query_params
+        for value in query_params.getlist(name)
+    )
+    raw = f"{request.get_host()}|{params}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def list_cache_key(request):
+    """Ключ страницы списка: фильтры, сортировка, номер страницы, набор полей"""
+    return f"tours:list:{get_catalog_generation()}:{_request_digest(request)}"
@@ -0,0 +1,148 @@
+import logging
+
+from django.db import transaction
+from kombu.exceptions import OperationalError
+
+from apps.core.fieldsets import get_request_spec
+from .cache import invalidate_catalog_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Поля с путями к файлам: в документе хранятся относительными,
+# абсолютный URL достраивается под хост запроса
+URL_KEYS = ('url', 'avatar', 'image')
+
+
+########################################
+# Сборка документов
+########################################
+def get_document_queryset():
+    from .models import Tour, public_promo_codes
+
+    return (
+        Tour.objects.filter(is_active=True)
+        .select_related('type', 'main_image')
+        .prefetch_related(
+            'gallery',
+            'schedule',
+            'sessions__promotions',
+            public_promo_codes('sessions__promo_codes'),
+            'parameter_values__parameter_definition',
+        )
+    )
+
+
+def build_tour_documents(tour_ids):
+    """
+    Пересобирает документы указанных туров.
+    Неактивные и удалённые туры лишаются документа (детальная → 404).
+    """
+    from .models import TourDocument
+    from .serializers import TourDetailSerializer
+
+    tour_ids = set(tour_ids)
+    if not tour_ids:
+        return 0
+
+    tours = list(get_document_queryset().filter(pk__in=tour_ids))
+    # Общий рендер без пользователя: is_wishlisted накладывается при чтении
+    context = {'wishlisted_ids': frozenset()}
+
+    with transaction.atomic():
+        for tour in tours:
+            data = TourDetailSerializer(tour, context=context).data
+            # slug мог перейти от другого тура
+            TourDocument.objects.filter(slug=tour.slug).exclude(pk=tour.pk).delete()
+            TourDocument.objects.update_or_create(
+                tour_id=tour.pk,
+                defaults={'slug': tour.slug, 'data': data},
+            )
+        TourDocument.objects.filter(
+            pk__in=tour_ids - {tour.pk for tour in tours}
+        ).delete()
+    # Новая версия каталога: ETag, выданный до пересборки, перестаёт совпадать
+    invalidate_catalog_cache()
+    return len(tours)
+
+
+def rebuild_all_documents(batch_size=200):
+    """Пересобирает документы всех активных туров и удаляет лишние"""
+    from .models import TourDocument
+
+    tour_ids = list(get_document_queryset().values_list('pk', flat=True))
+    for start in range(0, len(tour_ids), batch_size):
+        build_tour_documents(tour_ids[start:start + batch_size])
+    TourDocument.objects.exclude(pk__in=tour_ids).delete()
+    return len(tour_ids)
+
+
+def schedule_document_rebuild(tour_ids):
+    """
+    Ставит пересборку документов в очередь после коммита транзакции.
+    Если брокер недоступен — собирает сразу, чтобы не отдавать устаревшее.
+    """
+    tour_ids = sorted({tour_id for tour_id in tour_ids if tour_id})
+    if not tour_ids:
+        return
+
+    def enqueue():
+        from .tasks import rebuild_tour_documents
+
+        try:
+            rebuild_tour_documents.delay(tour_ids)
+        except OperationalError:
+            logger.warning("Очередь недоступна, документы туров %s собираются синхронно", tour_ids)
+            build_tour_documents(tour_ids)
+
+    transaction.on_commit(enqueue)
+
+
+########################################
+# Чтение
+########################################
+def get_tour_document(lookup):
+    """Документ тура по id или slug — один запрос по уникальному ключу"""
+    from .models import TourDocument
+
+    field = 'pk' if str(lookup).isdigit() else 'slug'
+    return (
+        TourDocument.objects.filter(**{field: lookup})
+        .values_list('data', flat=True)
+        .first()
+    )
+
+
+def render_tour_document(data, request):
+    """Применяет ?fields= и абсолютные URL файлов к документу"""
+    fields_spec, _ = get_request_spec(request)
+    if fields_spec is not None:
+        data = _prune(data, fields_spec)
+    return _absolutize(data, request)
+
+
+def _prune(data, spec):
+    if isinstance(data, list):
+        return [_prune(item, spec) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {
+        key: _prune(value, spec[key]) if spec[key] else value
+        for key, value in data.items()
+        if key in spec
+    }
+
+
+def _absolutize(data, request):
+    if isinstance(data, list):
+        return [_absolutize(item, request) for item in data]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for key, value in data.items():
+        if key in URL_KEYS and isinstance(value, str) and value.startswith('/'):
+            value = request.build_absolute_uri(value)
+        else:
+            value = _absolutize(value, request)
+        result[key] = value
+    return result
@@ -0,0 +1,98 @@
+import django_filters
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Tour, TourCategory, Destination, TourSession
+
+
+class TourFilter(django_filters.FilterSet):
+    """
+    Фильтры витрины туров.
+
+    Каждый фильтр опирается на индекс из миграции 0008:
+    - цена/длительность → (is_active, price_from, created_at), (is_active, duration_days)
+    - категория → (type, is_active, created_at)
+    - даты выезда и свободные места → частичные индексы TourSession
+    - только свободные места (без дат) → денормализованный Tour.seats_left
+    """
+    category = django_filters.ModelMultipleChoiceFilter(
+        field_name='type',
+        queryset=TourCategory.objects.filter(is_active=True),
+        help_text="Тип тура (можно несколько: ?category=1&category=2)"
+    )
+    destination = django_filters.ModelMultipleChoiceFilter(
+        queryset=Destination.objects.filter(is_active=True),
+        help_text="Направление тура"
+    )
+    price_min = django_filters.NumberFilter(field_name='price_from', lookup_expr='gte')
+    price_max = django_filters.NumberFilter(field_name='price_from', lookup_expr='lte')
+    duration_min = django_filters.NumberFilter(field_name='duration_days', lookup_expr='gte')
+    duration_max = django_filters.NumberFilter(field_name='duration_days', lookup_expr='lte')
+    season_from = django_filters.DateFilter(
+        method='filter_season',
+        help_text="Сезон тура пересекается с окном [season_from, season_to]"
+    )
+    season_to = django_filters.DateFilter(method='filter_season')
+    date_from = django_filters.DateFilter(
+        method='filter_sessions',
+        help_text="Есть выезд не раньше этой даты"
+    )
+    date_to = django_filters.DateFilter(method='filter_sessions', help_text="Есть выезд не позже этой даты")
+    has_seats = django_filters.BooleanFilter(
+        method='filter_sessions',
+        help_text="Есть предстоящий выезд со свободными местами"
+    )
+
+    class Meta:
+        model = Tour
+        fields = ['type']
+
+    def filter_season(self, queryset, name, value):
+        # Применяется целиком в filter_queryset, чтобы границы окна работали вместе
+        return queryset
+
+    def filter_sessions(self, queryset, name, value):
+        # Все условия по датам выезда и местам должны выполняться для одной сессии
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        data = self.form.cleaned_data
+
+        season_from = data.get('season_from')
+        season_to = data.get('season_to')
+        if season_to:
+            queryset = queryset.filter(Q(season_start__isnull=True) | Q(season_start__lte=season_to))
+        if season_from:
+            queryset = queryset.filter(Q(season_end__isnull=True) | Q(season_end__gte=season_from))
+
+        date_from = data.get('date_from')
+        date_to = data.get('date_to')
+        has_seats = data.get('has_seats')
+        if has_seats is not None and not (date_from or date_to):
+            # Агрегаты по предстоящим выездам уже лежат в Tour
+            if has_seats:
+                return queryset.filter(seats_left__gt=0)
+            return queryset.filter(next_departure__isnull=False, seats_left=0)
+
+        if date_from or date_to or has_seats is not None:
+            sessions = TourSession.objects.filter(tour=OuterRef('pk'), is_active=True)
+            if date_from:
+                sessions = sessions.filter(date_start__gte=date_from)
+            if date_to:
+                sessions = sessions.filter(date_start__lte=date_to)
+            if has_seats is not None and not date_from:
+                sessions = sessions.filter(date_start__gte=timezone.localdate())
+
+            if has_seats is None:
+                queryset = queryset.filter(Exists(sessions))
+            elif has_seats:
+                queryset = queryset.filter(Exists(sessions.filter(available_seats__gt=0)))
+            else:
+                # Выезды есть, но все распроданы
+                queryset = queryset.filter(
+                    Exists(sessions),
+                    ~Exists(sessions.filter(available_seats__gt=0))
+                )
+
+        return queryset
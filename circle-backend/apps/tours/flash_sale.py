@@ -0,0 +1,246 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_catalog_cache
+
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_KEY = 'flash:sessions'
+# Сентинел: счётчика нет (распродажа не открыта или уже закрыта) — источник мест БД
+NO_COUNTER = None
+
+
+def seats_key(session_id):
+    return f'flash:session:{session_id}:seats'
+
+
+########################################
+# Скрипты Lua: каждая операция атомарна на стороне Redis
+########################################
+# KEYS: счётчик сессии, набор сессий распродажи; ARGV: id сессии, число мест
+
+# Списать ARGV[2] мест: {1, осталось} или {0, осталось}; без счётчика — nil
+RESERVE_SCRIPT = """
+local left = redis.call('GET', KEYS[1])
+if not left then return false end
+left = tonumber(left)
+local seats = tonumber(ARGV[2])
+if left < seats then return {0, left} end
+return {1, redis.call('DECRBY', KEYS[1], seats)}
+"""
+
+# Вернуть ARGV[2] мест: новый остаток; без счётчика — nil
+RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+return redis.call('INCRBY', KEYS[1], ARGV[2])
+"""
+
+# Создать счётчик, если его нет: 1 — создан, 0 — уже был
+OPEN_SCRIPT = """
+redis.call('SADD', KEYS[2], ARGV[1])
+if redis.call('SET', KEYS[1], ARGV[2], 'NX') then return 1 end
+return 0
+"""
+
+# Забрать остаток и удалить счётчик одним шагом: после него списания идут в БД
+CLOSE_SCRIPT = """
+local left = redis.call('GET', KEYS[1])
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[1])
+return left
+"""
+
+
+########################################
+# Клиент
+########################################
+_client = None
+_scripts = {}
+
+
+def get_client():
+    """
+    Клиент хранилища счётчиков (settings.FLASH_SALE_REDIS_URL).
+    fakeredis:// — процессная замена Redis для локальной разработки и нагрузочного теста.
+    """
+    global _client
+
+    if _client is None:
+        url = settings.FLASH_SALE_REDIS_URL
+        if url.startswith('fakeredis://'):
+            import fakeredis
+
+            _client = fakeredis.FakeStrictRedis()
+        else:
+            import redis
+
+            _client = redis.Redis.from_url(url)
+        _scripts.update(
+            reserve=_client.register_script(RESERVE_SCRIPT),
+            release=_client.register_script(RELEASE_SCRIPT),
+            open=_client.register_script(OPEN_SCRIPT),
+            close=_client.register_script(CLOSE_SCRIPT),
+        )
+    return _client
+
+
+def _run(script, session_id, seats=0):
+    get_client()
+    return _scripts[script](keys=[seats_key(session_id), SESSIONS_KEY], args=[session_id, seats])
+
+
+########################################
+# Операции со счётчиком
+########################################
+def reserve_flash_seats(session_id, seats):
+    """
+    Атомарно списывает места со счётчика сессии.
+    Возвращает (успех, остаток) или NO_COUNTER, если распродажа не открыта.
+    """
+    result = _run('reserve', session_id, seats)
+    if result is None:
+        return NO_COUNTER
+    ok, left = result
+    return bool(ok), int(left)
+
+
+def release_flash_seats(session_id, seats):
+    """Возвращает места на счётчик: новый остаток или NO_COUNTER"""
+    result = _run('release', session_id, seats)
+    return NO_COUNTER if result is None else int(result)
+
+
+def get_flash_seats(session_id):
+    """Остаток на счётчике или NO_COUNTER"""
+    value = get_client().get(seats_key(session_id))
+    return NO_COUNTER if value is None else int(value)
+
+
+def get_available_seats(session):
+    """Свободные места: во время распродажи — со счётчика, иначе — из БД"""
+    if session.flash_sale_until is not None:
+        left = get_flash_seats(session.pk)
+        if left is not NO_COUNTER:
+            return left
+    return session.available_seats
+
+
+########################################
+# Открытие и закрытие распродажи
+########################################
+def open_flash_sale(session_id):
+    """
+    Переносит остаток сессии на счётчик. Строка сессии блокируется,
+    поэтому списание из БД не может пройти между чтением остатка
+    и созданием счётчика. Возвращает True, если счётчик есть
+    (создан сейчас или раньше), и False, если сессия не в режиме распродажи.
+    """
+    from .models import TourSession
+
+    with transaction.atomic():
+        session = (
+            TourSession.objects.select_for_update()
+            .filter(pk=session_id, flash_sale_until__isnull=False)
+            .only('pk', 'available_seats')
+            .first()
+        )
+        if session is None:
+            return False
+        created = bool(_run('open', session.pk, session.available_seats))
+    if created:
+        logger.info("Flash sale: сессия %s, счётчик открыт с %s мест", session_id, session.available_seats)
+    return True
+
+
+def close_flash_sale(session_id):
+    """
+    Записывает остаток со счётчика в available_seats, удаляет счётчик
+    и снимает режим распродажи. Возвращает записанный остаток
+    или NO_COUNTER, если счётчика уже не было.
+    """
+    from .models import TourSession
+
+    with transaction.atomic():
+        # Сначала блокировка строки: возврат мест, опоздавший к счётчику,
+        # дождётся записи остатка и прибавится к нему, а не потеряется
+        list(TourSession.objects.select_for_update().filter(pk=session_id).values_list('pk'))
+        left = _run('close', session_id)
+        fields = {'flash_sale_until': None}
+        if left is not None:
+            left = int(left)
+            fields['available_seats'] = left
+        TourSession.objects.filter(pk=session_id).update(**fields)
+    logger.info("Flash sale: сессия %s закрыта, остаток %s", session_id, left)
+    return NO_COUNTER if left is None else left
+
+
+########################################
+# Сверка счётчиков с БД (celery beat)
+########################################
+def reconcile_flash_sales(now=None):
+    """
+    Для каждой распродажи:
+    - окно закончилось или режима уже нет, а счётчик остался — закрывает
+      (остаток в БД);
+    - счётчика нет — открывает (новая распродажа или потерянный Redis);
+    - иначе записывает остаток в available_seats, если он изменился.
+    Затронутым турам обновляет витрину и агрегаты. Возвращает
+    {'opened', 'closed', 'synced'}.
+    """
+    from .aggregates import refresh_tour_aggregates
+    from .documents import schedule_document_rebuild
+    from .models import TourSession
+
+    now = now or timezone.now()
+    client = get_client()
+    tracked = {int(session_id) for session_id in client.smembers(SESSIONS_KEY)}
+    rows = {
+        pk: (tour_id, until, seats)
+        for pk, tour_id, until, seats in TourSession.objects.filter(
+            Q(pk__in=tracked) | Q(flash_sale_until__isnull=False)
+        ).values_list('pk', 'tour_id', 'flash_sale_until', 'available_seats')
+    }
+    stats = {'opened': 0, 'closed': 0, 'synced': 0}
+    changed_tours = set()
+
+    for session_id in sorted(tracked | set(rows)):
+        tour_id, until, seats = rows.get(session_id, (None, None, None))
+        if tour_id is None:
+            # Сессию удалили — убираем счётчик
+            _run('close', session_id)
+            continue
+        if until is None or until <= now:
+            close_flash_sale(session_id)
+            stats['closed'] += 1
+            changed_tours.add(tour_id)
+            continue
+
+        left = get_flash_seats(session_id)
+        if left is NO_COUNTER:
+            if session_id in tracked:
+                logger.warning("Flash sale: счётчик сессии %s пропал, открываем заново из БД", session_id)
+            open_flash_sale(session_id)
+            stats['opened'] += 1
+            continue
+        if left != seats:
+            # Только пока распродажа открыта: закрытие уже записало точный остаток
+            synced = TourSession.objects.filter(
+                pk=session_id, flash_sale_until__isnull=False
+            ).update(available_seats=left)
+            stats['synced'] += synced
+            if synced:
+                changed_tours.add(tour_id)
+
+    if changed_tours:
+        # update() не отправляет post_save — обновляем витрину сами
+        invalidate_catalog_cache()
+        schedule_document_rebuild(changed_tours)
+        refresh_tour_aggregates(changed_tours)
+    if any(stats.values()):
+        logger.info("Flash sale: %s", stats)
+    return stats
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db.models import Count, F, Min, Window
+from django.db.models.functions import RowNumber
+
+
+PARTICIPANTS_PREVIEW_LIMIT = getattr(settings, 'TOUR_PARTICIPANTS_PREVIEW_LIMIT', 5)
+
+
+def load_participants(tours, limit=PARTICIPANTS_PREVIEW_LIMIT):
+    """
+    Загружает участников (оплаченные брони) сразу для всех туров страницы.
+
+    Два запроса на всю страницу вместо запроса на каждый тур.
+    Возвращает {tour_id: {'count': int, 'preview': [User, ...]}},
+    где preview — первые `limit` уникальных участников по дате брони.
+
+    Уникальные участники нумеруются в БД (ROW_NUMBER по туру), и наружу
+    выходят только первые `limit` на тур вместе с общим числом — объём
+    не растёт с числом броней популярного тура.
+    """
+    from apps.bookings.models import Booking
+    from apps.users.models import User
+
+    tour_ids = [tour.pk for tour in tours]
+    result = {tour_id: {'count': 0, 'preview': []} for tour_id in tour_ids}
+    if not tour_ids:
+        return result
+
+    participants = (
+        Booking.objects
+        .filter(tour_id__in=tour_ids, status='paid')
+        .values('tour_id', 'user_id')
+        .annotate(first_booked_at=Min('created_at'), first_booking_id=Min('id'))
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('tour_id'),
+                order_by=(F('first_booked_at').asc(), F('first_booking_id').asc()),
+            ),
+            total=Window(Count('*'), partition_by=F('tour_id')),
+        )
+        .order_by('tour_id', 'position')
+    )
+    if limit is not None:
+        participants = participants.filter(position__lte=limit)
+
+    rows = list(participants.values_list('tour_id', 'user_id', 'total'))
+    users = User.objects.select_related('sphere', 'specialization').in_bulk(
+        {user_id for _, user_id, _ in rows}
+    )
+    for tour_id, user_id, total in rows:
+        entry = result[tour_id]
+        entry['count'] = total
+        entry['preview'].append(users[user_id])
+
+    return result
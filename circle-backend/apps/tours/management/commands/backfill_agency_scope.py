@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tours.agency_scope import BACKFILL_CHUNK_SIZE, SCOPED_MODELS, backfill_agency, scoped_models
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет денормализованный agency_id у броней, акций и промокодов '
+        'чанками по первичному ключу (миграция tours 0017 заполняет их сама; команда — для сверки расхождений)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models', default=','.join(SCOPED_MODELS),
+            help='Какие модели заполнять, например bookings.Booking',
+        )
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help='Строк в одном чанке')
+
+    def handle(self, *args, **options):
+        labels = [label for label in options['models'].split(',') if label]
+        unknown = set(labels) - set(SCOPED_MODELS)
+        if unknown:
+            raise CommandError(f'Неизвестные модели: {", ".join(sorted(unknown))}')
+
+        models = {model._meta.label: (model, lookup) for model, lookup in scoped_models().items()}
+        total = 0
+        for label in labels:
+            model, lookup = models[label]
+            self.stdout.write(self.style.HTTP_INFO(f'🚀 {label}'))
+            started = time.perf_counter()
+
+            def progress(scanned, updated):
+                self.stdout.write(f'   просмотрено {scanned}, обновлено {updated}')
+
+            stats = backfill_agency(model, lookup, chunk_size=options['chunk_size'], progress=progress)
+            seconds = time.perf_counter() - started
+            rate = round(stats['scanned'] / seconds) if seconds else 0
+            self.stdout.write(f"   за {seconds:.1f} c ({rate} строк/с)")
+            total += stats['updated']
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Обновлено строк: {total}'))
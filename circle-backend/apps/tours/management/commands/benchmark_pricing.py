@@ -0,0 +1,202 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from apps.agencies.models import TravelAgency
+from apps.core.utils import QueryCounter
+from apps.tours.models import Tour, TourSession, Promotion, PromoCode
+from apps.tours.activation import invalidate_active_set
+from apps.tours.pricing import calculate_discounted_prices
+
+
+SESSIONS_PER_TOUR = 50
+
+
+def legacy_discounted_price(session, base_price, promo_code=None):
+    """
+    Эталон: прежняя реализация TourSession.calculate_discounted_price
+    (запрос акций по датам и exists() + first() по промокоду на каждую сессию).
+    """
+    now = timezone.now()
+    price = Decimal(base_price)
+
+    promotions = session.promotions.filter(
+        is_active=True,
+        valid_from__lte=now,
+        valid_until__gte=now
+    )
+    for promo in promotions:
+        if promo.discount_percent:
+            price -= (price * promo.discount_percent / Decimal('100'))
+        if promo.discount_amount:
+            price -= promo.discount_amount
+
+    if promo_code:
+        code_qs = session.promo_codes.filter(
+            code=promo_code,
+            is_active=True,
+            valid_from__lte=now,
+            valid_until__gte=now,
+            usage_limit__gt=models.F('used_count')
+        )
+        if code_qs.exists():
+            code = code_qs.first()
+            if code.discount_percent:
+                price -= (price * code.discount_percent / Decimal('100'))
+            if code.discount_amount:
+                price -= code.discount_amount
+
+    return max(price, Decimal('0'))
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пакетный расчёт цен (apps.tours.pricing) с прежним '
+        'посессионным: время, число запросов и совпадение результатов. '
+        'Тестовые данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=10000, help='Сколько сессий оценивать')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора данных')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self.run(options['sessions'])
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            # Набор активации видел откатываемые акции
+            invalidate_active_set()
+
+    def run(self, count):
+        self.stdout.write(self.style.HTTP_INFO(f'🚀 Генерирую {count} сессий...'))
+        items = self.build_items(count)
+
+        self.stdout.write('⏱  Прежний расчёт (по одной сессии)...')
+        legacy_queries = QueryCounter()
+        with connection.execute_wrapper(legacy_queries):
+            started = time.perf_counter()
+            legacy = [legacy_discounted_price(*item) for item in items]
+            legacy_time = time.perf_counter() - started
+
+        self.stdout.write('⏱  Пакетный расчёт...')
+        bulk_queries = QueryCounter()
+        with connection.execute_wrapper(bulk_queries):
+            started = time.perf_counter()
+            bulk = calculate_discounted_prices(items)
+            bulk_time = time.perf_counter() - started
+
+        mismatches = [
+            (session.pk, old, new)
+            for (session, _, _), old, new in zip(items, legacy, bulk)
+            if old != new
+        ]
+
+        self.stdout.write(f'   прежний:  {legacy_time:8.3f} c, запросов: {legacy_queries.count}')
+        self.stdout.write(f'   пакетный: {bulk_time:8.3f} c, запросов: {bulk_queries.count}')
+        if bulk_time:
+            self.stdout.write(f'   ускорение: x{legacy_time / bulk_time:.1f}')
+
+        if mismatches:
+            for session_id, old, new in mismatches[:10]:
+                self.stdout.write(self.style.ERROR(f'   ❌ сессия {session_id}: {old} != {new}'))
+            raise CommandError(f'Расхождений: {len(mismatches)} из {len(items)}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Все {len(items)} цен совпадают до копейки'))
+
+    ########################################
+    # Тестовые данные
+    ########################################
+    def build_items(self, count):
+        rng = self.rng
+        now = timezone.now()
+        today = timezone.localdate()
+        suffix = f'{int(time.time())}-{rng.randint(0, 10**6)}'
+
+        agency = TravelAgency.objects.create(name=f'Benchmark {suffix}')
+        tours = Tour.objects.bulk_create([
+            Tour(
+                title=f'Benchmark tour {i}',
+                slug=f'benchmark-{suffix}-{i}',
+                agency=agency,
+                description='',
+                price_from=Decimal('100000'),
+                base_price=Decimal(rng.randrange(100000, 3000000, 1000)),
+                duration_days=1,
+                duration_nights=0,
+            )
+            for i in range((count + SESSIONS_PER_TOUR - 1) // SESSIONS_PER_TOUR)
+        ])
+        sessions = TourSession.objects.bulk_create([
+            TourSession(
+                tour=tours[i // SESSIONS_PER_TOUR],
+                date_start=today + timedelta(days=i % 365),
+                capacity=20,
+                available_seats=rng.randint(0, 20),
+                price_override=rng.choice([None, None, Decimal(rng.randrange(50000, 2000000, 500))]),
+            )
+            for i in range(count)
+        ])
+
+        def window():
+            # Действующие, будущие и истёкшие окна
+            start = now + timedelta(days=rng.choice([-10, -1, 3]))
+            return start, start + timedelta(days=rng.choice([1, 5, 30]))
+
+        def discount():
+            percent = rng.choice([None, Decimal('5'), Decimal('12.5'), Decimal('33.33')])
+            amount = rng.choice([None, Decimal('10000'), Decimal('2500.50')])
+            return percent, amount
+
+        promotions = []
+        codes = []
+        for session in sessions:
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                (valid_from, valid_until), (percent, amount) = window(), discount()
+                promotions.append(Promotion(
+                    session=session, name='bench',
+                    discount_percent=percent, discount_amount=amount,
+                    valid_from=valid_from, valid_until=valid_until,
+                    is_active=rng.random() > 0.1,
+                ))
+            if rng.random() < 0.3:
+                (valid_from, valid_until), (percent, amount) = window(), discount()
+                usage_limit = rng.randint(1, 5)
+                codes.append(PromoCode(
+                    code=f'B{suffix}-{session.pk}', session=session,
+                    discount_percent=percent, discount_amount=amount,
+                    usage_limit=usage_limit, used_count=rng.randint(0, usage_limit),
+                    valid_from=valid_from, valid_until=valid_until,
+                    is_active=rng.random() > 0.1,
+                ))
+        Promotion.objects.bulk_create(promotions)
+        PromoCode.objects.bulk_create(codes)
+        invalidate_active_set()  # bulk_create не отправляет сигналов
+
+        code_by_session = {code.session_id: code.code for code in codes}
+        sessions = TourSession.objects.filter(pk__in=[s.pk for s in sessions]).select_related('tour')
+        items = []
+        for session in sessions:
+            promo_code = rng.choice([
+                None,
+                code_by_session.get(session.pk),
+                'NO-SUCH-CODE',
+            ])
+            items.append((session, session.price, promo_code))
+
+        self.stdout.write(
+            f'   туров: {len(tours)}, акций: {len(promotions)}, промокодов: {len(codes)}'
+        )
+        return items
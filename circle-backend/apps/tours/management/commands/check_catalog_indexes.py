@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.tours.filters import TourFilter
+from apps.tours.models import Tour
+
+
+class Command(BaseCommand):
+    help = 'Проверяет, что фильтры витрины туров используют индексы из миграций 0008 и 0016'
+
+    def get_cases(self):
+        """
+        (описание, параметры фильтра, сортировка, ожидаемые индексы, только для PostgreSQL)
+
+        SQLite не использует индексы, начинающиеся с булева поля,
+        поэтому такие проверки выполняются только на PostgreSQL.
+        """
+        today = timezone.localdate()
+        return [
+            ('Витрина по умолчанию', {}, ['-created_at'],
+             ['tour_active_created_idx'], True),
+            ('Диапазон цены', {'price_min': '100000', 'price_max': '500000'}, ['price_from'],
+             ['tour_active_price_idx'], True),
+            ('Длительность', {'duration_min': '2', 'duration_max': '5'}, ['-created_at'],
+             ['tour_active_duration_idx', 'tour_active_created_idx'], True),
+            ('Категория', {'category': list(self.category_ids())}, ['-created_at'],
+             ['tour_type_active_idx'], True),
+            ('Окно сезона', {'season_from': today, 'season_to': today + timedelta(days=30)}, ['-created_at'],
+             ['tour_season_idx', 'tour_active_created_idx'], True),
+            ('Даты выезда', {'date_from': today, 'date_to': today + timedelta(days=30)}, ['-created_at'],
+             ['session_departure_idx'], False),
+            ('Есть свободные места', {'has_seats': 'true'}, ['-created_at'],
+             ['tour_seats_left_idx'], False),
+            ('Распродано', {'has_seats': 'false'}, ['-created_at'],
+             ['tour_seats_left_idx'], False),
+            ('Свободные места на даты', {'has_seats': 'true', 'date_from': today}, ['-created_at'],
+             ['session_free_seats_idx', 'session_departure_idx'], False),
+        ]
+
+    def category_ids(self):
+        from apps.tours.models import TourCategory
+        return TourCategory.objects.filter(is_active=True).values_list('pk', flat=True)[:1] or []
+
+    def handle(self, *args, **options):
+        is_postgres = connection.vendor == 'postgresql'
+        base = Tour.objects.filter(is_active=True)
+        failures = []
+
+        for description, data, ordering, expected, postgres_only in self.get_cases():
+            if not data.get('category', True):
+                self.stdout.write(self.style.WARNING(f'⚠️  {description}: нет категорий, пропускаю'))
+                continue
+
+            filterset = TourFilter(data=data, queryset=base)
+            if not filterset.is_valid():
+                raise CommandError(f'{description}: некорректные параметры {filterset.errors}')
+            queryset = filterset.qs.order_by(*ordering)
+
+            with transaction.atomic():
+                if is_postgres:
+                    # На маленьких таблицах планировщик выбирает seq scan,
+                    # поэтому проверяем, что индекс вообще может быть использован
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+
+            used = [name for name in expected if name in plan]
+            if used:
+                self.stdout.write(self.style.SUCCESS(f'✅ {description}: {", ".join(used)}'))
+            elif postgres_only and not is_postgres:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  {description}: проверка доступна только на PostgreSQL'
+                ))
+            else:
+                failures.append(description)
+                self.stdout.write(self.style.ERROR(f'❌ {description}: ожидался один из {expected}'))
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'Индексы не используются: {", ".join(failures)}')
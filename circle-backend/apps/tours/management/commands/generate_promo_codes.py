@@ -0,0 +1,73 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.tours.models import TourSession, PromoCodeBatch
+from apps.tours.promo_batches import CHUNK_SIZE, generate_batch, iter_batch_csv, validate_batch_params
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует пачку уникальных промокодов кампании для сессии тура '
+        '(bulk_create чанками) и сообщает скорость; --csv выгружает коды в файл.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, required=True, help='ID сессии тура')
+        parser.add_argument('--count', type=int, required=True, help='Сколько кодов')
+        parser.add_argument('--name', default='', help='Название кампании')
+        parser.add_argument('--prefix', default='', help='Префикс кодов, например SUMMER-')
+        parser.add_argument('--length', type=int, default=10, help='Длина случайной части')
+        parser.add_argument('--percent', type=Decimal, help='Скидка, %%')
+        parser.add_argument('--amount', type=Decimal, help='Скидка, сумма')
+        parser.add_argument('--usage-limit', type=int, default=1, help='Использований на код')
+        parser.add_argument('--min-purchase', type=Decimal, help='Минимальная сумма брони')
+        parser.add_argument('--days', type=int, default=30, help='Срок действия с текущего момента, дней')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Кодов в одном bulk_create')
+        parser.add_argument('--csv', help='Путь для выгрузки кодов в CSV')
+
+    def handle(self, *args, **options):
+        session = TourSession.objects.filter(pk=options['session']).first()
+        if session is None:
+            raise CommandError(f"Сессия {options['session']} не найдена")
+        if not options['percent'] and not options['amount']:
+            raise CommandError('Укажите --percent или --amount')
+        prefix = options['prefix'].upper()
+        try:
+            validate_batch_params(options['count'], prefix, options['length'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        now = timezone.now()
+        batch = PromoCodeBatch.objects.create(
+            name=options['name'] or f'Кампания {now:%Y-%m-%d %H:%M}',
+            session=session,
+            prefix=prefix,
+            code_length=options['length'],
+            requested_count=options['count'],
+            discount_percent=options['percent'],
+            discount_amount=options['amount'],
+            usage_limit=options['usage_limit'],
+            min_purchase_amount=options['min_purchase'],
+            valid_from=now,
+            valid_until=now + timedelta(days=options['days']),
+        )
+        self.stdout.write(self.style.HTTP_INFO(f'🚀 Пачка #{batch.pk}: {batch.requested_count} кодов'))
+
+        def progress(created, total):
+            self.stdout.write(f'   {created}/{total}')
+
+        stats = generate_batch(batch, chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(
+            f"   за {stats['seconds']} c: {stats['codes_per_second']} кодов/с, повторов {stats['collisions']}"
+        )
+
+        if options['csv']:
+            with open(options['csv'], 'w', encoding='utf-8', newline='') as output:
+                for line in iter_batch_csv(batch):
+                    output.write(line)
+            self.stdout.write(f"   CSV: {options['csv']}")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Создано кодов: {stats["created"]}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.documents import rebuild_all_documents
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает документы детальной страницы для всех активных туров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Сколько туров собирать за один проход',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_all_documents(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Собрано документов туров: {count}'))
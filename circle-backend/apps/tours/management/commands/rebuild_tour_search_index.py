@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.models import Tour
+from apps.tours.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает поисковый индекс туров (например, после loaddata)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько туров индексировать за один проход',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tour_ids = list(Tour.objects.values_list('pk', flat=True))
+
+        for start in range(0, len(tour_ids), batch_size):
+            update_search_index(tour_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Проиндексировано туров: {len(tour_ids)}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.aggregates import reconcile_tour_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные агрегаты туров (выезд, цена, места, участники)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько туров пересчитывать за один проход',
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_tour_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Исправлено туров: {fixed}'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.activation import get_active_set, refresh_active_promotions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает набор действующих акций и промокодов (то же, что задача celery beat)'
+
+    def handle(self, *args, **options):
+        changed = refresh_active_promotions()
+        active = get_active_set()
+        self.stdout.write(
+            f'   акций: {len(active.promotion_ids)}, промокодов: {len(active.promo_code_ids)}, '
+            f'следующая граница: {active.next_boundary or "—"}'
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Затронуто сессий: {changed}'))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0007_add_tour_wishlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='destination',
+            field=models.ForeignKey(blank=True, help_text='Направление тура', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tours', to='tours.destination'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', '-created_at'], name='tour_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', 'price_from', 'created_at'], name='tour_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', 'duration_days'], name='tour_active_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['type', 'is_active', 'created_at'], name='tour_type_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True), ('season_start__isnull', False)), fields=['season_start', 'season_end'], name='tour_season_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toursession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['tour', 'date_start'], name='session_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toursession',
+            index=models.Index(condition=models.Q(('available_seats__gt', 0), ('is_active', True)), fields=['tour', 'date_start'], name='session_free_seats_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:40
+
+from django.conf import settings
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+SEARCH_CONFIG = getattr(settings, 'TOUR_SEARCH_CONFIG', 'russian')
+
+
+def create_search_index(apps, schema_editor):
+    """
+    PostgreSQL: GIN-индекс по search_vector.
+    SQLite (разработка): FTS5-таблица tours_tour_fts с rowid = id тура.
+    Индекс существующих туров заполняется здесь же — без импорта кода
+    приложения, который со временем меняется вместе с моделями.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS tour_search_vector_gin '
+            'ON tours_tour USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS tours_tour_fts USING fts5('
+            'title, description, destination, category, schedule, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+    else:
+        return
+
+    Tour = apps.get_model('tours', 'Tour')
+    tours = (
+        Tour.objects.using(schema_editor.connection.alias)
+        .select_related('type', 'destination')
+        .prefetch_related('schedule')
+    )
+    for tour in tours.iterator(chunk_size=500):
+        document = {
+            'title': tour.title,
+            'description': tour.description,
+            'destination': tour.destination.name if tour.destination_id else '',
+            'category': tour.type.name if tour.type_id else '',
+            'schedule': ' '.join(day.title for day in tour.schedule.all()),
+        }
+        if vendor == 'postgresql':
+            vector = (
+                SearchVector(Value(document['title']), weight='A', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['destination']), weight='A', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['category']), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['schedule']), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['description']), weight='C', config=SEARCH_CONFIG)
+            )
+            Tour.objects.using(schema_editor.connection.alias).filter(pk=tour.pk).update(search_vector=vector)
+        else:
+            schema_editor.execute(
+                'INSERT INTO tours_tour_fts (rowid, title, description, destination, category, schedule) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                [tour.pk, document['title'], document['description'], document['destination'],
+                 document['category'], document['schedule']],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS tour_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS tours_tour_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0008_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Поисковый вектор (PostgreSQL), обновляется при сохранении тура', null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
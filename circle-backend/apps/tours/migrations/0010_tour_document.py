@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0009_tour_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourDocument',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='tours.tour', verbose_name='Тур')),
+                ('slug', models.SlugField(unique=True, verbose_name='Slug тура')),
+                ('data', models.JSONField(verbose_name='Документ')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Собран')),
+            ],
+            options={
+                'verbose_name': 'Документ тура',
+                'verbose_name_plural': 'Документы туров',
+            },
+        ),
+    ]
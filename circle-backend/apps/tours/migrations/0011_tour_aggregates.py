@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0010_tour_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='aggregates_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Минимальная цена ближайших выездов с учётом акций', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='next_departure',
+            field=models.DateField(blank=True, editable=False, help_text='Ближайшая дата выезда', null=True),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='participants_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество участников (оплаченные брони)'),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='seats_left',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Свободные места на всех предстоящих выездах'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', 'next_departure'], name='tour_active_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', 'min_price'], name='tour_active_min_price_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tours', '0012_promotion_activation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromoCodeBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('prefix', models.CharField(blank=True, help_text='Общее начало кодов, например SUMMER-', max_length=20)),
+                ('code_length', models.PositiveSmallIntegerField(default=10, help_text='Длина случайной части кода')),
+                ('requested_count', models.PositiveIntegerField(help_text='Сколько кодов сгенерировать')),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('discount_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('discount_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('usage_limit', models.PositiveIntegerField(default=1)),
+                ('min_purchase_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('valid_from', models.DateTimeField()),
+                ('valid_until', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('generating', 'Генерируется'), ('ready', 'Готова'), ('failed', 'Ошибка')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='promo_code_batches', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promo_code_batches', to='tours.toursession')),
+            ],
+            options={
+                'verbose_name': 'Promo Code Batch',
+                'verbose_name_plural': 'Promo Code Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='promocode',
+            name='batch',
+            field=models.ForeignKey(blank=True, help_text='Пачка кампании, если код сгенерирован массово', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='tours.promocodebatch'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0013_promo_code_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='toursession',
+            name='flash_sale_until',
+            field=models.DateTimeField(blank=True, help_text='Режим flash sale до этого момента: места продаются из атомарного счётчика Redis', null=True),
+        ),
+    ]
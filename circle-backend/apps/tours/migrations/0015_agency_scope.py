@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0002_initial'),
+        ('tours', '0014_flash_sale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promocode',
+            name='agency',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='Агентство тура (копия session.tour.agency) для списков менеджера', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.travelagency'),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='agency',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='Агентство тура (копия session.tour.agency) для списков менеджера', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.travelagency'),
+        ),
+        migrations.AddIndex(
+            model_name='promocode',
+            index=models.Index(fields=['agency', '-created_at'], name='promocode_agency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['agency', '-created_at'], name='promotion_agency_idx'),
+        ),
+    ]
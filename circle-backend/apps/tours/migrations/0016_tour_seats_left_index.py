@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0015_agency_scope'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['seats_left', 'next_departure'], name='tour_seats_left_idx'),
+        ),
+    ]
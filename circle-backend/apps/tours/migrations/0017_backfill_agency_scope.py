@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+CHUNK_SIZE = 2000
+
+# Модели с денормализованным agency_id и путь к агентству через сессию
+SCOPED_MODELS = {
+    ('bookings', 'Booking'): 'session__tour__agency_id',
+    ('tours', 'Promotion'): 'session__tour__agency_id',
+    ('tours', 'PromoCode'): 'session__tour__agency_id',
+}
+
+
+def backfill_agency_scope(apps, schema_editor):
+    """
+    agency_id существующих броней, акций и промокодов — чанками по первичному
+    ключу, по одному UPDATE на агентство в чанке (как backfill_agency_scope,
+    который остаётся для сверки расхождений)
+    """
+    for (app_label, model_name), lookup in SCOPED_MODELS.items():
+        model = apps.get_model(app_label, model_name)
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'agency_id', lookup)[:CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            stale = defaultdict(list)
+            for pk, current, agency_id in rows:
+                if current != agency_id:
+                    stale[agency_id].append(pk)
+            for agency_id, pks in stale.items():
+                model.objects.filter(pk__in=pks).update(agency_id=agency_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_agency_scope'),
+        ('tours', '0016_tour_seats_left_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_agency_scope, migrations.RunPython.noop, elidable=True),
+    ]
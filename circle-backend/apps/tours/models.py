@@ -1,9 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models.functions import Greatest
 from apps.users.models import User
 from apps.media.models import Media
 from apps.agencies.models import TravelAgency
 from decimal import Decimal
 from django.utils import timezone
+from apps.core.versioning import bump_version
 
 
 class TourCategory(models.Model):
@@ -70,6 +75,14 @@ class Tour(models.Model):
         related_name="tours",
         help_text="Тип/категория тура"
     )
+    destination = models.ForeignKey(
+        Destination,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tours",
+        help_text="Направление тура"
+    )
 
     price_from = models.DecimalField(
         max_digits=10,
@@ -121,6 +134,40 @@ class Tour(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Денормализованные агрегаты по датам выездов (см. apps/tours/aggregates.py).
+    # Обновляются при изменении сессий, акций и броней, сверяются по расписанию.
+    next_departure = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Ближайшая дата выезда"
+    )
+    min_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Минимальная цена ближайших выездов с учётом акций"
+    )
+    seats_left = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Свободные места на всех предстоящих выездах"
+    )
+    participants_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Количество участников (оплаченные брони)"
+    )
+    aggregates_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Поисковый вектор (PostgreSQL), обновляется при сохранении тура"
+    )
+
     participants = models.ManyToManyField(
         User,
         blank=True,
@@ -132,6 +179,27 @@ class Tour(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Tour"
         verbose_name_plural = "Tours"
+        indexes = [
+            # Витрина: активные туры по дате добавления
+            models.Index(fields=['is_active', '-created_at'], name='tour_active_created_idx'),
+            # Диапазон и сортировка по цене
+            models.Index(fields=['is_active', 'price_from', 'created_at'], name='tour_active_price_idx'),
+            # Фильтр по длительности
+            models.Index(fields=['is_active', 'duration_days'], name='tour_active_duration_idx'),
+            # Фильтр по категории
+            models.Index(fields=['type', 'is_active', 'created_at'], name='tour_type_active_idx'),
+            # Сортировка по ближайшему выезду и по цене с учётом акций
+            models.Index(fields=['is_active', 'next_departure'], name='tour_active_departure_idx'),
+            models.Index(fields=['is_active', 'min_price'], name='tour_active_min_price_idx'),
+            # «Есть свободные места» / «распродано» без дат — по агрегатам
+            models.Index(fields=['seats_left', 'next_departure'], name='tour_seats_left_idx'),
+            # Окно сезона (только туры с заданным сезоном)
+            models.Index(
+                fields=['season_start', 'season_end'],
+                name='tour_season_idx',
+                condition=models.Q(is_active=True, season_start__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -163,63 +231,59 @@ class TourSession(models.Model):
         blank=True,
         help_text="Специальная цена для этой даты (если отличается)"
     )
+    flash_sale_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Режим flash sale до этого момента: места продаются из атомарного счётчика Redis"
+    )
 
     class Meta:
         ordering = ["date_start"]
         verbose_name = "Tour Session"
         verbose_name_plural = "Tour Sessions"
+        indexes = [
+            # Фильтр витрины по датам выезда
+            models.Index(
+                fields=['tour', 'date_start'],
+                name='session_departure_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Фильтр «есть свободные места»
+            models.Index(
+                fields=['tour', 'date_start'],
+                name='session_free_seats_idx',
+                condition=models.Q(is_active=True, available_seats__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.tour.title} on {self.date_start}"
 
     def get_active_promotions(self):
-        now = timezone.now()
-        return self.promotions.filter(
-            is_active=True,
-            valid_from__lte=now,
-            valid_until__gte=now
-        )
+        """Действующие акции — по набору активации, без фильтра по датам"""
+        from .activation import get_active_set
+        ids = get_active_set().session_promotions(self.pk)
+        return self.promotions.filter(pk__in=ids) if ids else self.promotions.none()
 
     def get_active_promo_codes(self):
-        now = timezone.now()
-        return self.promo_codes.filter(
-            is_active=True,
-            valid_from__lte=now,
-            valid_until__gte=now
-        )
+        from .activation import get_active_set
+        ids = get_active_set().session_promo_codes(self.pk)
+        return self.promo_codes.filter(pk__in=ids) if ids else self.promo_codes.none()
+
+    @property
+    def price(self):
+        """Цена места на эту дату: специальная или базовая цена тура"""
+        if self.price_override is not None:
+            return self.price_override
+        return self.tour.base_price
 
     def calculate_discounted_price(self, base_price, promo_code=None):
         """
-        Рассчитывает итоговую цену с учетом акций и промокодов
+        Рассчитывает итоговую цену с учетом акций и промокодов.
+        Для многих сессий используйте apps.tours.pricing.calculate_discounted_prices.
         """
-        now = timezone.now()
-        price = Decimal(base_price)
-
-        # Акции
-        for promo in self.get_active_promotions():
-            if promo.discount_percent:
-                price -= (price * promo.discount_percent / Decimal('100'))
-            if promo.discount_amount:
-                price -= promo.discount_amount
-
-        # Промокод (если указан)
-        if promo_code:
-            code_qs = self.promo_codes.filter(
-                code=promo_code,
-                is_active=True,
-                valid_from__lte=now,
-                valid_until__gte=now,
-                usage_limit__gt=models.F('used_count')
-            )
-            if code_qs.exists():
-                code = code_qs.first()
-                if code.discount_percent:
-                    price -= (price * code.discount_percent / Decimal('100'))
-                if code.discount_amount:
-                    price -= code.discount_amount
-
-        # Никогда не меньше нуля
-        return max(price, Decimal('0'))
+        from .pricing import calculate_discounted_prices
+        return calculate_discounted_prices([(self, base_price, promo_code)])[0]
 
 class TourSchedule(models.Model):
     tour = models.ForeignKey(
@@ -326,6 +390,16 @@ class Promotion(models.Model):
     Акция/скидка для определённой сессии тура
     """
     session = models.ForeignKey(TourSession, on_delete=models.CASCADE, related_name='promotions')
+    agency = models.ForeignKey(
+        TravelAgency,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # ведущее поле составного индекса
+        related_name="+",
+        help_text="Агентство тура (копия session.tour.agency) для списков менеджера"
+    )
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
@@ -343,13 +417,26 @@ class Promotion(models.Model):
         verbose_name = "Promotion"
         verbose_name_plural = "Promotions"
         ordering = ['-created_at']
+        indexes = [
+            # Набор активации: включённые и ещё не истёкшие акции
+            models.Index(
+                fields=['valid_until'],
+                name='promotion_live_until_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Список акций менеджера агентства
+            models.Index(fields=['agency', '-created_at'], name='promotion_agency_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.session})"
 
     def is_currently_valid(self):
-        now = timezone.now()
-        return self.is_active and self.valid_from <= now <= self.valid_until
+        if self.pk is None:
+            now = timezone.now()
+            return self.is_active and self.valid_from <= now <= self.valid_until
+        from .activation import get_active_set
+        return self.pk in get_active_set().promotion_ids
 
     def calculate_discount(self, base_price):
         if not self.is_currently_valid():
@@ -368,6 +455,24 @@ class PromoCode(models.Model):
     """
     code = models.CharField(max_length=50, unique=True)
     session = models.ForeignKey(TourSession, on_delete=models.CASCADE, related_name='promo_codes')
+    agency = models.ForeignKey(
+        TravelAgency,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # ведущее поле составного индекса
+        related_name="+",
+        help_text="Агентство тура (копия session.tour.agency) для списков менеджера"
+    )
+    batch = models.ForeignKey(
+        'PromoCodeBatch',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='codes',
+        help_text="Пачка кампании, если код сгенерирован массово"
+    )
     description = models.TextField(blank=True)
 
     discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
@@ -395,18 +500,58 @@ class PromoCode(models.Model):
         verbose_name = "Promo Code"
         verbose_name_plural = "Promo Codes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['valid_until'],
+                name='promocode_live_until_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Список промокодов менеджера агентства
+            models.Index(fields=['agency', '-created_at'], name='promocode_agency_idx'),
+        ]
 
     def __str__(self):
         return self.code
 
     def is_currently_valid(self):
+        if self.used_count >= self.usage_limit:
+            return False
+        if self.pk is None or self.batch_id is not None:
+            # Коды пачек не входят в набор активации — проверяем окно по строке
+            now = timezone.now()
+            return self.is_active and self.valid_from <= now <= self.valid_until
+        from .activation import get_active_set
+        return self.pk in get_active_set().promo_code_ids
+
+    def redeem(self):
+        """
+        Атомарно занимает одно использование промокода:
+        UPDATE ... SET used_count = used_count + 1 WHERE used_count < usage_limit.
+        Проверка и увеличение — один оператор, поэтому параллельные брони
+        не теряют обновления и не превышают лимит. True, если использование занято.
+        """
         now = timezone.now()
-        return (
-            self.is_active and
-            self.used_count < self.usage_limit and
-            self.valid_from <= now <= self.valid_until
+        return bool(
+            PromoCode.objects.filter(
+                pk=self.pk,
+                is_active=True,
+                valid_from__lte=now,
+                valid_until__gte=now,
+                used_count__lt=models.F('usage_limit'),
+            ).update(used_count=models.F('used_count') + 1)
         )
 
+    @classmethod
+    def release_uses(cls, counts):
+        """
+        Возвращает использования отменённых/просроченных броней.
+        counts — {promo_code_id: число}; счётчик не уходит ниже нуля.
+        """
+        for promo_code_id, count in counts.items():
+            cls.objects.filter(pk=promo_code_id).update(
+                used_count=Greatest(models.F('used_count') - count, 0)
+            )
+
     def calculate_discount(self, base_price):
         if not self.is_currently_valid():
             return 0
@@ -422,6 +567,70 @@ class PromoCode(models.Model):
         return min(discount, base_price)
 
 
+def public_promo_codes(lookup='promo_codes'):
+    """
+    Prefetch промокодов сессии без кодов кампаний: их сотни тысяч
+    и они персональные — в витрину и документы тура не попадают.
+    """
+    return models.Prefetch(lookup, queryset=PromoCode.objects.filter(batch__isnull=True))
+
+
+class PromoCodeBatch(models.Model):
+    """
+    Пачка одноразовых промокодов партнёрской кампании.
+    Коды генерирует apps.tours.promo_batches (команда generate_promo_codes
+    или POST /api/tours/promo-batches/), параметры скидки копируются в каждый код.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('generating', 'Генерируется'),
+        ('ready', 'Готова'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=255)
+    session = models.ForeignKey(TourSession, on_delete=models.CASCADE, related_name='promo_code_batches')
+    prefix = models.CharField(max_length=20, blank=True, help_text="Общее начало кодов, например SUMMER-")
+    code_length = models.PositiveSmallIntegerField(default=10, help_text="Длина случайной части кода")
+    requested_count = models.PositiveIntegerField(help_text="Сколько кодов сгенерировать")
+    created_count = models.PositiveIntegerField(default=0)
+
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    usage_limit = models.PositiveIntegerField(default=1)
+    min_purchase_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    valid_from = models.DateTimeField()
+    valid_until = models.DateTimeField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='promo_code_batches'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Promo Code Batch"
+        verbose_name_plural = "Promo Code Batches"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.created_count}/{self.requested_count})"
+
+    @property
+    def codes_per_second(self):
+        if not (self.started_at and self.finished_at and self.created_count):
+            return None
+        elapsed = (self.finished_at - self.started_at).total_seconds()
+        return round(self.created_count / elapsed) if elapsed > 0 else None
+
+
 class TourWishlist(models.Model):
     """Запланированные туры пользователя (wishlist)"""
     user = models.ForeignKey(
@@ -464,6 +673,55 @@ class TourWishlist(models.Model):
     def __str__(self):
         return f"{self.user.first_name} → {self.tour.title}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.invalidate_cache(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache(user_id)
+        return result
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f"tours:wishlist_ids:{user_id}"
+
+    @staticmethod
+    def version_family(user_id):
+        return f"wishlist:{user_id}"
+
+    @classmethod
+    def _drop_cache(cls, user_id):
+        cache.delete(cls._cache_key(user_id))
+        bump_version(cls.version_family(user_id))
+
+    @classmethod
+    def invalidate_cache(cls, user_id):
+        """Сбрасывает закешированный набор wishlist пользователя"""
+        cls._drop_cache(user_id)
+        if connection.in_atomic_block:
+            # Набор, прочитанный другим процессом до коммита, видел старые данные
+            transaction.on_commit(lambda: cls._drop_cache(user_id))
+
+    @classmethod
+    def get_wishlisted_tour_ids(cls, user):
+        """
+        Возвращает множество id туров в wishlist пользователя.
+        Набор кешируется по пользователю в общем кеше (settings.CACHES)
+        и сбрасывается при любом изменении — для всех процессов сразу.
+        """
+        if not user or not user.is_authenticated:
+            return frozenset()
+        key = cls._cache_key(user.pk)
+        tour_ids = cache.get(key)
+        if tour_ids is None:
+            tour_ids = frozenset(
+                cls.objects.filter(user=user).values_list('tour_id', flat=True)
+            )
+            cache.set(key, tour_ids, getattr(settings, 'TOUR_WISHLIST_CACHE_TIMEOUT', 300))
+        return tour_ids
+
     @classmethod
     def toggle_wishlist(cls, user, tour):
         """Переключает тур в/из wishlist. Возвращает (объект, создан_ли_новый)"""
@@ -485,4 +743,28 @@ class TourWishlist(models.Model):
         """Проверяет находится ли тур в wishlist пользователя"""
         if not user or not user.is_authenticated:
             return False
-        return cls.objects.filter(user=user, tour=tour).exists()
\ No newline at end of file
+        return tour.pk in cls.get_wishlisted_tour_ids(user)
+
+class TourDocument(models.Model):
+    """
+    Предрасчитанный JSON детальной страницы тура.
+    Перестраивается фоновой задачей при изменении тура и связанных данных
+    (см. apps/tours/documents.py), чтение — один запрос по ключу.
+    """
+    tour = models.OneToOneField(
+        Tour,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name="Тур"
+    )
+    slug = models.SlugField(unique=True, verbose_name="Slug тура")
+    data = models.JSONField(verbose_name="Документ")
+    built_at = models.DateTimeField(auto_now=True, verbose_name="Собран")
+
+    class Meta:
+        verbose_name = 'Документ тура'
+        verbose_name_plural = 'Документы туров'
+
+    def __str__(self):
+        return f"Документ тура {self.slug}"
@@ -0,0 +1,278 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .flash_sale import get_available_seats
+
+
+HUNDRED = Decimal('100')
+ZERO = Decimal('0')
+
+
+########################################
+# Контекст цен: акции и промокоды для набора сессий
+########################################
+class PricingContext:
+    """
+    Загружает действующие акции и промокоды сразу для всех сессий
+    (не больше двух запросов) и считает цены в памяти.
+
+    ctx = PricingContext([session.pk, ...], promo_codes=['SUMMER'])
+    ctx.discounted_price(session.pk, session.price, 'SUMMER')
+    """
+
+    def __init__(self, session_ids, promo_codes=(), now=None):
+        from .activation import get_active_set
+        from .models import Promotion, PromoCode
+
+        # Без явного now действие акций и промокодов берётся из набора
+        # активации (apps.tours.activation), а не из сравнения дат
+        self.active = get_active_set() if now is None else None
+        self.now = now or timezone.now()
+        session_ids = set(session_ids)
+
+        self.promotions = defaultdict(list)
+        if self.active is not None:
+            promotion_ids = [
+                pk for session_id in session_ids
+                for pk in self.active.session_promotions(session_id)
+            ]
+            promotions = Promotion.objects.filter(pk__in=promotion_ids) if promotion_ids else ()
+        elif session_ids:
+            promotions = Promotion.objects.filter(
+                session_id__in=session_ids,
+                is_active=True,
+                valid_from__lte=self.now,
+                valid_until__gte=self.now,
+            )
+        else:
+            promotions = ()
+        # Порядок — Meta.ordering, как у TourSession.get_active_promotions
+        for promo in promotions:
+            self.promotions[promo.session_id].append(promo)
+
+        # Загружаем и недействующие коды: бронирование отличает
+        # «не найден» от «недействителен»
+        self.promo_codes = {}
+        promo_codes = {code for code in promo_codes if code}
+        if session_ids and promo_codes:
+            codes = PromoCode.objects.filter(code__in=promo_codes, session_id__in=session_ids)
+            for code in codes:
+                self.promo_codes[(code.session_id, code.code)] = code
+
+    def get_promotions(self, session_id):
+        return self.promotions.get(session_id, [])
+
+    def find_promo_code(self, session_id, code):
+        """Промокод сессии независимо от его состояния"""
+        if not code:
+            return None
+        return self.promo_codes.get((session_id, code))
+
+    def get_promo_code(self, session_id, code):
+        """Только действующий промокод"""
+        promo = self.find_promo_code(session_id, code)
+        if promo is not None and self.is_valid_code(promo):
+            return promo
+        return None
+
+    def is_valid_code(self, promo):
+        """То же, что PromoCode.is_currently_valid, на момент self.now"""
+        if promo.used_count >= promo.usage_limit:
+            return False
+        if self.active is not None and promo.batch_id is None:
+            return promo.pk in self.active.promo_code_ids
+        return promo.is_active and promo.valid_from <= self.now <= promo.valid_until
+
+    def discounted_price(self, session_id, base_price, promo_code=None):
+        """
+        Цена с учётом акций и промокода — та же Decimal-арифметика,
+        что исторически была в TourSession.calculate_discounted_price:
+        скидки применяются последовательно к текущей цене, итог не меньше нуля.
+        """
+        price = Decimal(base_price)
+
+        for promo in self.get_promotions(session_id):
+            price = apply_discount(price, promo)
+
+        code = self.get_promo_code(session_id, promo_code)
+        if code is not None:
+            price = apply_discount(price, code)
+
+        return max(price, ZERO)
+
+
+def apply_discount(price, discount):
+    """Процент от текущей цены, затем фиксированная сумма"""
+    if discount.discount_percent:
+        price -= (price * discount.discount_percent / HUNDRED)
+    if discount.discount_amount:
+        price -= discount.discount_amount
+    return price
+
+
+########################################
+# Пакетный расчёт
+########################################
+def calculate_discounted_prices(items, now=None):
+    """
+    Цены для пачки позиций за два запроса.
+
+    items — последовательность (session, base_price, promo_code);
+    base_price=None → цена сессии (session.price).
+    Возвращает список Decimal в том же порядке.
+    """
+    items = list(items)
+    context = PricingContext(
+        [session.pk for session, _, _ in items],
+        promo_codes=[code for _, _, code in items],
+        now=now,
+    )
+    return [
+        context.discounted_price(
+            session.pk,
+            session.price if base_price is None else base_price,
+            promo_code,
+        )
+        for session, base_price, promo_code in items
+    ]
+
+
+########################################
+# Расчёт брони (общий для бронирования и котировок)
+########################################
+class PricingError(Exception):
+    """Цену брони посчитать нельзя: сообщение показывается пользователю"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def booking_discount(discount, amount):
+    """
+    Скидка акции/промокода от суммы брони (как Promotion/PromoCode.calculate_discount):
+    процент и фиксированная сумма считаются от исходной суммы, не больше самой суммы.
+    """
+    value = ZERO
+    if discount.discount_percent:
+        value += amount * discount.discount_percent / HUNDRED
+    if discount.discount_amount:
+        value += discount.discount_amount
+    return min(value, amount)
+
+
+def get_bonus_balance(user):
+    """Бонусный баланс пользователя; у анонима и без поля баланса — ноль"""
+    if user is None or not user.is_authenticated:
+        return ZERO
+    return getattr(user, 'bonus_balance', None) or ZERO
+
+
+def quote_booking(context, session, seats, promo_code=None, bonus=ZERO, bonus_balance=ZERO):
+    """
+    Разбивка цены брони. Единственный источник правды для
+    CreateBookingSerializer.create и POST /api/v1/tours/quote/.
+
+    Скидки брони суммируются от базовой цены (в отличие от витринной
+    discounted_price): промокод (с учётом min_purchase_amount) плюс каждая
+    действующая акция. Бонусы — не больше баланса и оставшейся суммы.
+    context — PricingContext, загруженный для session и promo_code.
+    Бросает PricingError.
+    """
+    base_price = session.price * seats
+
+    applied_promo = context.find_promo_code(session.pk, promo_code)
+    if promo_code and applied_promo is None:
+        raise PricingError("Промокод не найден.")
+    if applied_promo is not None and not context.is_valid_code(applied_promo):
+        raise PricingError("Промокод недействителен или превышен лимит использования.")
+
+    promo_code_discount = ZERO
+    if applied_promo is not None:
+        minimum = applied_promo.min_purchase_amount
+        if not (minimum and base_price < minimum):
+            promo_code_discount = booking_discount(applied_promo, base_price)
+
+    promotions_discount = sum(
+        (booking_discount(promo, base_price) for promo in context.get_promotions(session.pk)),
+        ZERO,
+    )
+    discount_amount = promo_code_discount + promotions_discount
+
+    bonus = Decimal(bonus or ZERO)
+    if bonus > bonus_balance:
+        raise PricingError("Недостаточно бонусов на счёте.")
+    payable = max(base_price - discount_amount, ZERO)
+    bonus_used = min(bonus, payable)
+
+    return {
+        'session': session.pk,
+        'seats': seats,
+        'unit_price': session.price,
+        'base_price': base_price,
+        'promotions_discount': promotions_discount,
+        'promo_code': applied_promo.code if applied_promo else None,
+        'promo_code_discount': promo_code_discount,
+        'discount_amount': discount_amount,
+        'bonus_used_amount': bonus_used,
+        'final_price': payable - bonus_used,
+        'applied_promo': applied_promo,
+    }
+
+
+def quote_bookings(items, user=None, now=None):
+    """
+    Котировки для пачки позиций за три запроса (сессии, акции, промокоды).
+
+    items — последовательность словарей {'session': id, 'seats', 'promo_code', 'bonus'}.
+    Возвращает список в том же порядке: разбивка цены или {'error': ...}.
+    Бонусы каждой позиции проверяются против баланса независимо.
+    """
+    from .models import TourSession
+
+    items = list(items)
+    sessions = TourSession.objects.select_related('tour').in_bulk(
+        {item['session'] for item in items}
+    )
+    context = PricingContext(
+        sessions,
+        promo_codes=[item.get('promo_code') for item in items],
+        now=now,
+    )
+    bonus_balance = get_bonus_balance(user)
+
+    results = []
+    for item in items:
+        seats = item.get('seats', 1)
+        session = sessions.get(item['session'])
+        try:
+            if session is None:
+                raise PricingError("Сессия тура не найдена.")
+            check_availability(session, seats)
+            quote = quote_booking(
+                context, session, seats,
+                promo_code=item.get('promo_code'),
+                bonus=item.get('bonus'),
+                bonus_balance=bonus_balance,
+            )
+        except PricingError as exc:
+            results.append({'session': item['session'], 'seats': seats, 'error': exc.message})
+            continue
+        quote.pop('applied_promo')
+        quote['error'] = None
+        results.append(quote)
+    return results
+
+
+def check_availability(session, seats):
+    """
+    Проверки бронирования сессии — те же сообщения, что у CreateBookingSerializer.
+    Во время flash sale остаток берётся со счётчика, а не из available_seats.
+    """
+    if not session.is_active:
+        raise PricingError("Выбранная дата тура недоступна для бронирования.")
+    available = get_available_seats(session)
+    if available < seats:
+        raise PricingError(f"На выбранную дату осталось только {available} мест.")
@@ -0,0 +1,185 @@
+import csv
+import logging
+import re
+import secrets
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from apps.core.utils import Echo
+
+
+logger = logging.getLogger(__name__)
+
+# 32 символа без похожих 0/O и 1/I: по 5 бит случайности на символ
+ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+BITS = 5
+CODE_MAX_LENGTH = 50
+CHUNK_SIZE = 5000
+MAX_BATCH_SIZE = 500000
+# Пространство кодов должно быть много больше пачки: повторы редки,
+# а подобрать чужой код перебором практически невозможно
+MIN_KEYSPACE_RATIO = 10 ** 6
+PREFIX_RE = re.compile(r'^[A-Z0-9-]*$')
+
+
+########################################
+# Проверка параметров
+########################################
+def keyspace(length):
+    return len(ALPHABET) ** length
+
+
+def validate_batch_params(count, prefix, length):
+    """Бросает ValueError с сообщением для пользователя"""
+    if not 1 <= count <= MAX_BATCH_SIZE:
+        raise ValueError(f"Размер пачки — от 1 до {MAX_BATCH_SIZE} кодов.")
+    if not PREFIX_RE.match(prefix):
+        raise ValueError("Префикс может содержать только латинские заглавные буквы, цифры и дефис.")
+    if len(prefix) + length > CODE_MAX_LENGTH:
+        raise ValueError(f"Код длиннее {CODE_MAX_LENGTH} символов: сократите префикс или длину.")
+    if keyspace(length) < count * MIN_KEYSPACE_RATIO:
+        raise ValueError("Слишком короткий код для такой пачки: увеличьте длину случайной части.")
+
+
+########################################
+# Генерация
+########################################
+def random_codes(count, prefix, length):
+    """count криптографически случайных кодов вида PREFIX + length символов ALPHABET"""
+    nbytes = (length * BITS + 7) // 8
+    mask = len(ALPHABET) - 1
+    for _ in range(count):
+        value = int.from_bytes(secrets.token_bytes(nbytes), 'big')
+        chars = []
+        for _ in range(length):
+            chars.append(ALPHABET[value & mask])
+            value >>= BITS
+        yield prefix + ''.join(chars)
+
+
+def _unique_chunk(size, batch, seen, stats):
+    """
+    size новых кодов: без повторов в текущем прогоне (seen)
+    и без занятых в БД — один запрос на каждую попытку.
+    """
+    from .models import PromoCode
+
+    codes = set()
+    while len(codes) < size:
+        candidates = set(random_codes(size - len(codes), batch.prefix, batch.code_length))
+        candidates -= seen
+        candidates -= codes
+        taken = set(PromoCode.objects.filter(code__in=candidates).values_list('code', flat=True))
+        stats['collisions'] += (size - len(codes)) - len(candidates) + len(taken)
+        codes |= candidates - taken
+    seen |= codes
+    return codes
+
+
+def generate_batch(batch, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Генерирует недостающие коды пачки и пишет их bulk_create чанками
+    (каждый чанк — своя транзакция). Повторный запуск продолжает с места
+    остановки. Если параллельный процесс успел занять код, чанк
+    перепроверяется и генерируется заново.
+
+    progress(created, total) вызывается после каждого чанка.
+    Возвращает {'created', 'collisions', 'seconds', 'codes_per_second'}.
+    """
+    from .models import PromoCode, PromoCodeBatch
+
+    batch.status = 'generating'
+    batch.started_at = timezone.now()
+    batch.error = ''
+    batch.save(update_fields=['status', 'started_at', 'error'])
+
+    stats = {'created': 0, 'collisions': 0}
+    seen = set()
+    # bulk_create не отправляет pre_save — агентство проставляем сами
+    agency_id = batch.session.tour.agency_id
+    started = time.perf_counter()
+    try:
+        remaining = batch.requested_count - batch.codes.count()
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            codes = _unique_chunk(size, batch, seen, stats)
+            try:
+                with transaction.atomic():
+                    PromoCode.objects.bulk_create([
+                        PromoCode(
+                            code=code,
+                            session_id=batch.session_id,
+                            agency_id=agency_id,
+                            batch=batch,
+                            description=batch.name,
+                            discount_percent=batch.discount_percent,
+                            discount_amount=batch.discount_amount,
+                            usage_limit=batch.usage_limit,
+                            min_purchase_amount=batch.min_purchase_amount,
+                            valid_from=batch.valid_from,
+                            valid_until=batch.valid_until,
+                        )
+                        for code in codes
+                    ], batch_size=chunk_size)
+                    PromoCodeBatch.objects.filter(pk=batch.pk).update(created_count=F('created_count') + size)
+            except IntegrityError:
+                stats['collisions'] += 1
+                continue
+
+            stats['created'] += size
+            remaining -= size
+            if progress:
+                progress(batch.requested_count - remaining, batch.requested_count)
+    except Exception as exc:
+        PromoCodeBatch.objects.filter(pk=batch.pk).update(status='failed', error=str(exc))
+        raise
+
+    seconds = time.perf_counter() - started
+    batch.status = 'ready'
+    batch.finished_at = timezone.now()
+    batch.created_count = batch.codes.count()
+    batch.save(update_fields=['status', 'finished_at', 'created_count'])
+
+    stats['seconds'] = round(seconds, 3)
+    stats['codes_per_second'] = round(stats['created'] / seconds) if seconds else None
+    logger.info(
+        "Пачка промокодов %s: создано %s за %.1f c (%s кодов/с), повторов %s",
+        batch.pk, stats['created'], seconds, stats['codes_per_second'], stats['collisions'],
+    )
+    return stats
+
+
+def schedule_batch_generation(batch):
+    """Генерация в очереди после коммита; без брокера — сразу"""
+    batch_id = batch.pk
+
+    def enqueue():
+        from .models import PromoCodeBatch
+        from .tasks import generate_promo_code_batch
+
+        try:
+            generate_promo_code_batch.delay(batch_id)
+        except OperationalError:
+            logger.warning("Очередь недоступна, пачка промокодов %s генерируется синхронно", batch_id)
+            generate_batch(PromoCodeBatch.objects.get(pk=batch_id))
+
+    transaction.on_commit(enqueue)
+
+
+########################################
+# Экспорт
+########################################
+EXPORT_FIELDS = ('code', 'usage_limit', 'used_count', 'valid_from', 'valid_until', 'is_active')
+
+
+def iter_batch_csv(batch, chunk_size=2000):
+    """Строки CSV пачки по мере чтения из БД — без загрузки всей пачки в память"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    rows = batch.codes.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,226 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Value, FloatField, CharField, F, Q
+from django.utils.html import escape
+from rest_framework import filters
+
+
+SEARCH_CONFIG = getattr(settings, 'TOUR_SEARCH_CONFIG', 'russian')
+SEARCH_MAX_RESULTS = getattr(settings, 'TOUR_SEARCH_MAX_RESULTS', 500)
+FTS_TABLE = 'tours_tour_fts'
+
+# Границы совпадений во фрагменте от БД — управляющие символы, а не HTML:
+# описание экранируется целиком, и только потом они становятся <b>…</b>
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+HIGHLIGHT_START = '<b>'
+HIGHLIGHT_STOP = '</b>'
+
+
+########################################
+# Документ для индекса
+########################################
+def build_documents(tours):
+    """
+    Собирает поля поискового документа для каждого тура:
+    название, описание, направление, категория и заголовки дней программы.
+    """
+    tours = (
+        tours.select_related('type', 'destination')
+        .prefetch_related('schedule')
+    )
+    for tour in tours:
+        yield tour.pk, {
+            'title': tour.title,
+            'description': tour.description,
+            'destination': tour.destination.name if tour.destination_id else '',
+            'category': tour.type.name if tour.type_id else '',
+            'schedule': ' '.join(day.title for day in tour.schedule.all()),
+        }
+
+
+def update_search_index(tour_ids, tour_model=None, using=None):
+    """
+    Обновляет поисковый индекс для указанных туров.
+    PostgreSQL → колонка search_vector, SQLite → FTS5-таблица.
+    """
+    if tour_model is None:
+        from .models import Tour
+        tour_model = Tour
+
+    tour_ids = list(tour_ids)
+    if not tour_ids:
+        return
+
+    conn = _get_connection(using)
+    tours = tour_model.objects.using(conn.alias).filter(pk__in=tour_ids)
+
+    if conn.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchVector
+
+        for tour_id, document in build_documents(tours):
+            vector = (
+                SearchVector(Value(document['title']), weight='A', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['destination']), weight='A', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['category']), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['schedule']), weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Value(document['description']), weight='C', config=SEARCH_CONFIG)
+            )
+            tour_model.objects.using(conn.alias).filter(pk=tour_id).update(search_vector=vector)
+
+    elif conn.vendor == 'sqlite':
+        documents = list(build_documents(tours))
+        with conn.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(tour_id,) for tour_id in tour_ids]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, title, description, destination, category, schedule) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                [
+                    (tour_id, doc['title'], doc['description'], doc['destination'],
+                     doc['category'], doc['schedule'])
+                    for tour_id, doc in documents
+                ]
+            )
+
+
+def remove_from_search_index(tour_ids, using=None):
+    """Удаляет туры из FTS5-таблицы (в PostgreSQL вектор удаляется вместе со строкой)"""
+    conn = _get_connection(using)
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(tour_id,) for tour_id in tour_ids]
+            )
+
+
+def _get_connection(using):
+    if using is None:
+        return connection
+    from django.db import connections
+    return connections[using]
+
+
+########################################
+# Поиск
+########################################
+def search_tours(queryset, text):
+    """
+    Полнотекстовый поиск с ранжированием.
+    Добавляет к queryset аннотации search_rank и search_headline
+    (фрагмент описания с границами совпадений MARK_START/MARK_STOP;
+    в HTML его превращает render_headline).
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return _search_postgres(queryset, text)
+    if vendor == 'sqlite':
+        return _search_sqlite(queryset, text)
+
+    # Прочие СУБД: простой поиск без ранжирования
+    return _without_rank(queryset.filter(
+        Q(title__icontains=text) | Q(description__icontains=text)
+    ))
+
+
+def _without_rank(queryset):
+    return queryset.annotate(
+        search_rank=Value(0.0, output_field=FloatField()),
+        search_headline=Value(None, output_field=CharField()),
+    )
+
+
+def _search_postgres(queryset, text):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
+
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+        search_headline=SearchHeadline(
+            'description',
+            query,
+            config=SEARCH_CONFIG,
+            start_sel=MARK_START,
+            stop_sel=MARK_STOP,
+            max_words=30,
+            min_words=10,
+        ),
+    )
+
+
+def _fts5_query(text):
+    """Превращает пользовательский ввод в безопасный FTS5-запрос с префиксным поиском"""
+    words = re.findall(r'\w+', text, flags=re.UNICODE)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _search_sqlite(queryset, text):
+    match = _fts5_query(text)
+    if not match:
+        return _without_rank(queryset.none())
+
+    # Фильтры каталога — в том же запросе, до ранжирования и лимита:
+    # SEARCH_MAX_RESULTS отсекает только наименее релевантные из подходящих
+    scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        # bm25: чем меньше, тем релевантнее; веса — по колонкам FTS-таблицы
+        cursor.execute(
+            f'SELECT rowid, -bm25({FTS_TABLE}, 10.0, 2.0, 8.0, 5.0, 4.0), '
+            f"snippet({FTS_TABLE}, 1, %s, %s, '…', 24) "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql}) '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 2.0, 8.0, 5.0, 4.0) LIMIT %s',
+            [MARK_START, MARK_STOP, match, *scope_params, SEARCH_MAX_RESULTS]
+        )
+        rows = cursor.fetchall()
+
+    if not rows:
+        return _without_rank(queryset.none())
+
+    return queryset.filter(pk__in=[row[0] for row in rows]).annotate(
+        search_rank=Case(
+            *[When(pk=tour_id, then=Value(rank)) for tour_id, rank, _ in rows],
+            output_field=FloatField(),
+        ),
+        search_headline=Case(
+            *[When(pk=tour_id, then=Value(snippet)) for tour_id, _, snippet in rows],
+            output_field=CharField(),
+        ),
+    )
+
+
+def render_headline(headline):
+    """Фрагмент с подсветкой как безопасный HTML: текст экранирован, разметка — только <b>"""
+    if not headline:
+        return headline
+    return escape(headline).replace(MARK_START, HIGHLIGHT_START).replace(MARK_STOP, HIGHLIGHT_STOP)
+
+
+########################################
+# DRF backends
+########################################
+class TourSearchFilter(filters.SearchFilter):
+    """?search= → полнотекстовый поиск по индексу туров"""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        return search_tours(queryset, text)
+
+
+class TourOrderingFilter(filters.OrderingFilter):
+    """При поиске без явной сортировки туры упорядочены по релевантности"""
+
+    def get_default_ordering(self, view):
+        request = getattr(view, 'request', None)
+        if request is not None and request.query_params.get(TourSearchFilter.search_param, '').strip():
+            return ['-search_rank', '-created_at']
+        return super().get_default_ordering(view)
@@ -1,7 +1,9 @@
 from rest_framework import serializers
-from .models import Promotion, PromoCode
+from .models import Promotion, PromoCode, PromoCodeBatch
+from .promo_batches import validate_batch_params
 from .models import (
     TourCategory,
+    Destination,
     Tour,
     TourSchedule,
     TourSession,
@@ -11,6 +13,21 @@ from .models import (
 from apps.media.models import Media
 from apps.media.serializers import MediaSerializer
 from apps.users.models import User
+from apps.core.fieldsets import SparseFieldsetMixin
+from .loaders import load_participants
+from .search import render_headline
+
+
+def get_wishlisted_ids(context):
+    """
+    Набор id туров из wishlist текущего пользователя.
+    Загружается один раз на запрос и хранится в контексте сериализатора.
+    """
+    if 'wishlisted_ids' not in context:
+        request = context.get('request')
+        user = getattr(request, 'user', None)
+        context['wishlisted_ids'] = TourWishlist.get_wishlisted_tour_ids(user)
+    return context['wishlisted_ids']
 
 
 ########################################
@@ -37,19 +54,25 @@ TourParticipantSerializer = TourParticipantNewSerializer
 ########################################
 # Категории туров
 ########################################
-class TourCategorySerializer(serializers.ModelSerializer):
+class TourCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = TourCategory
         fields = ['id', 'name', 'description']
 
 
-
+########################################
+# Направления
+########################################
+class DestinationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Destination
+        fields = ['id', 'name', 'description', 'region', 'image']
 
 
 ########################################
 # Акции и промокоды
 ########################################
-class PromotionSerializer(serializers.ModelSerializer):
+class PromotionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Promotion
         fields = [
@@ -67,7 +90,7 @@ class PromotionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class PromoCodeSerializer(serializers.ModelSerializer):
+class PromoCodeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = PromoCode
         fields = [
@@ -87,11 +110,58 @@ class PromoCodeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'used_count', 'created_at']
 
 
+class PromoCodeBatchSerializer(serializers.ModelSerializer):
+    codes_per_second = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = PromoCodeBatch
+        fields = [
+            'id',
+            'name',
+            'session',
+            'prefix',
+            'code_length',
+            'requested_count',
+            'created_count',
+            'discount_percent',
+            'discount_amount',
+            'usage_limit',
+            'min_purchase_amount',
+            'valid_from',
+            'valid_until',
+            'status',
+            'error',
+            'codes_per_second',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'created_count', 'status', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+
+    def validate(self, data):
+        try:
+            validate_batch_params(
+                data['requested_count'],
+                data.get('prefix', ''),
+                data.get('code_length', PromoCodeBatch._meta.get_field('code_length').default),
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        if not data.get('discount_percent') and not data.get('discount_amount'):
+            raise serializers.ValidationError("Укажите процент или сумму скидки.")
+        if data['valid_until'] <= data['valid_from']:
+            raise serializers.ValidationError("Окончание действия должно быть позже начала.")
+        return data
+
+
 ########################################
 # Расписание по дням
 ########################################
-class TourScheduleSerializer(serializers.ModelSerializer):
-    image = MediaSerializer(read_only=True)
+class TourScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # image — обычный ImageField, а не ссылка на Media
+    image = serializers.ImageField(read_only=True)
 
     class Meta:
         model = TourSchedule
@@ -104,7 +174,7 @@ class TourScheduleSerializer(serializers.ModelSerializer):
 ########################################
 # Сессии (конкретные даты выездов)
 ########################################
-class TourSessionSerializer(serializers.ModelSerializer):
+class TourSessionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     available_seats = serializers.IntegerField(read_only=True)
     max_participants = serializers.IntegerField(source='capacity', read_only=True)
     current_participants = serializers.SerializerMethodField()
@@ -135,7 +205,7 @@ class TourSessionSerializer(serializers.ModelSerializer):
 ########################################
 # Параметры тура (расстояние, сложность)
 ########################################
-class TourParameterValueSerializer(serializers.ModelSerializer):
+class TourParameterValueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     name = serializers.CharField(source='parameter_definition.name', read_only=True)
     unit = serializers.CharField(source='parameter_definition.unit', read_only=True)
     data_type = serializers.CharField(source='parameter_definition.data_type', read_only=True)
@@ -159,50 +229,77 @@ class TourParticipantSerializer(serializers.ModelSerializer):
 ########################################
 # Список туров (для витрины)
 ########################################
-class TourListSerializer(serializers.ModelSerializer):
+class TourPageListSerializer(serializers.ListSerializer):
+    """
+    Сериализует страницу туров, заранее загружая данные
+    для всей страницы (участники) одним запросом.
+    """
+
+    def to_representation(self, data):
+        tours = list(data.all() if hasattr(data, 'all') else data)
+        if 'participants' in self.child.fields:
+            self.context['participants_map'] = load_participants(tours)
+        return super().to_representation(tours)
+
+
+class TourListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = TourCategorySerializer(source='type', read_only=True)
     main_image = MediaSerializer(read_only=True)
     participants = serializers.SerializerMethodField()
     is_wishlisted = serializers.SerializerMethodField()
+    search_highlight = serializers.SerializerMethodField()
     
     class Meta:
         model = Tour
+        list_serializer_class = TourPageListSerializer
         fields = [
             'id',
             'title',
             'slug',
             'category',
             'price_from',
+            'min_price',
+            'next_departure',
+            'seats_left',
             'duration_days',
             'main_image',
             'participants',
+            'participants_count',
             'is_wishlisted',
+            'search_highlight',
             'is_active'
         ]
+        # ?expand=sessions — ближайшие даты прямо в карточке
+        expandable_fields = {
+            'sessions': (TourSessionSerializer, {'many': True, 'read_only': True}),
+        }
+
+    def _get_participants_entry(self, obj):
+        # Карта участников заполняется TourPageListSerializer;
+        # при сериализации одного тура загружаем только его
+        participants_map = self.context.setdefault('participants_map', {})
+        if obj.pk not in participants_map:
+            participants_map.update(load_participants([obj]))
+        return participants_map[obj.pk]
     
     def get_participants(self, obj):
-        # Получаем подтвержденные бронирования для тура
-        from apps.bookings.models import Booking
-        bookings = Booking.objects.filter(
-            tour=obj, 
-            status='paid'
-        ).select_related('user', 'user__sphere', 'user__specialization')
-        
-        users = [booking.user for booking in bookings]
+        # Превью: первые N участников для аватарок на карточке
+        users = self._get_participants_entry(obj)['preview']
         return TourParticipantNewSerializer(users, many=True, context=self.context).data
     
     def get_is_wishlisted(self, obj):
         """Проверяет находится ли тур в wishlist текущего пользователя"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return TourWishlist.is_in_wishlist(request.user, obj)
+        return obj.pk in get_wishlisted_ids(self.context)
+
+    def get_search_highlight(self, obj):
+        """Фрагмент описания с подсветкой совпадений (только при ?search=)"""
+        return render_headline(getattr(obj, 'search_headline', None))
 
 
 ########################################
 # Детальная страница тура
 ########################################
-class TourDetailSerializer(serializers.ModelSerializer):
+class TourDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = TourCategorySerializer(source='type', read_only=True)
     main_image = MediaSerializer(read_only=True)
     gallery = MediaSerializer(many=True, read_only=True)
@@ -210,6 +307,7 @@ class TourDetailSerializer(serializers.ModelSerializer):
     sessions = TourSessionSerializer(many=True, read_only=True)
     parameter_values = TourParameterValueSerializer(many=True, read_only=True)
     participants = serializers.SerializerMethodField()
+    participants_count = serializers.SerializerMethodField()
     is_wishlisted = serializers.SerializerMethodField()
 
     class Meta:
@@ -232,25 +330,58 @@ class TourDetailSerializer(serializers.ModelSerializer):
             'sessions',
             'parameter_values',
             'participants',
+            'participants_count',
             'is_wishlisted',
             'is_active'
         ]
+
+    def _get_participants_entry(self, obj):
+        # На детальной странице показываем всех участников
+        cache = self.context.setdefault('participants_full_map', {})
+        if obj.pk not in cache:
+            cache.update(load_participants([obj], limit=None))
+        return cache[obj.pk]
     
     def get_participants(self, obj):
-        # Получаем подтвержденные бронирования для тура
-        from apps.bookings.models import Booking
-        bookings = Booking.objects.filter(
-            tour=obj, 
-            status='paid'
-        ).select_related('user', 'user__sphere', 'user__specialization')
-        
-        users = [booking.user for booking in bookings]
+        users = self._get_participants_entry(obj)['preview']
         return TourParticipantNewSerializer(users, many=True, context=self.context).data
+
+    def get_participants_count(self, obj):
+        return self._get_participants_entry(obj)['count']
     
     def get_is_wishlisted(self, obj):
         """Проверяет находится ли тур в wishlist текущего пользователя"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return TourWishlist.is_in_wishlist(request.user, obj)
+        return obj.pk in get_wishlisted_ids(self.context)
+
+
+
+########################################
+# Booking Quote Serializers
+########################################
+MAX_QUOTE_ITEMS = 100
+
+
+class BookingQuoteItemSerializer(serializers.Serializer):
+    session = serializers.IntegerField()
+    seats = serializers.IntegerField(min_value=1, default=1)
+    promo_code = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    bonus = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, default=0)
+
+
+class BookingQuoteRequestSerializer(serializers.Serializer):
+    items = BookingQuoteItemSerializer(many=True, allow_empty=False, max_length=MAX_QUOTE_ITEMS)
+
 
+class BookingQuoteSerializer(serializers.Serializer):
+    """Разбивка цены позиции; при ошибке суммы пустые, заполнен error"""
+    session = serializers.IntegerField()
+    seats = serializers.IntegerField()
+    unit_price = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    base_price = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    promotions_discount = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    promo_code = serializers.CharField(allow_null=True)
+    promo_code_discount = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    bonus_used_amount = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    final_price = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    error = serializers.CharField(allow_null=True)
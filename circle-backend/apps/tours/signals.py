@@ -0,0 +1,257 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from apps.core.versioning import bump_version
+
+from apps.bookings.models import Booking
+from apps.media.models import Media
+from .activation import invalidate_active_set
+from .agency_scope import session_agency_id, sync_tour_agency
+from .aggregates import schedule_aggregates_refresh
+from .cache import invalidate_catalog_cache
+from .documents import schedule_document_rebuild
+from .search import update_search_index, remove_from_search_index
+from .models import (
+    Tour,
+    TourCategory,
+    Destination,
+    TourSession,
+    TourSchedule,
+    TourParameterValue,
+    Promotion,
+    PromoCode,
+)
+
+
+########################################
+# Сброс кеша витрины при изменении данных тура
+########################################
+CATALOG_MODELS = (
+    Tour,
+    TourSession,
+    TourSchedule,
+    TourParameterValue,
+    Promotion,
+    PromoCode,
+    Booking,
+    Media,
+)
+
+
+def _invalidate_catalog(sender, **kwargs):
+    invalidate_catalog_cache()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(
+        _invalidate_catalog, sender=model,
+        dispatch_uid=f'tours_catalog_cache_save_{model.__name__}'
+    )
+    post_delete.connect(
+        _invalidate_catalog, sender=model,
+        dispatch_uid=f'tours_catalog_cache_delete_{model.__name__}'
+    )
+
+
+@receiver(m2m_changed, sender=Tour.gallery.through, dispatch_uid='tours_catalog_cache_gallery')
+def invalidate_on_gallery_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_catalog_cache()
+
+
+########################################
+# Инкрементальное обновление поискового индекса
+########################################
+@receiver(post_save, sender=Tour, dispatch_uid='tours_search_tour_saved')
+def index_tour(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Tour, dispatch_uid='tours_search_tour_deleted')
+def unindex_tour(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=TourSchedule, dispatch_uid='tours_search_schedule_saved')
+@receiver(post_delete, sender=TourSchedule, dispatch_uid='tours_search_schedule_deleted')
+def index_schedule_tour(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_index([instance.tour_id])
+
+
+@receiver(post_save, sender=TourCategory, dispatch_uid='tours_search_category_saved')
+def index_category_tours(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_index(instance.tours.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Destination, dispatch_uid='tours_search_destination_saved')
+def index_destination_tours(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_index(instance.tours.values_list('pk', flat=True))
+
+
+########################################
+# Пересборка документов детальной страницы
+########################################
+def _session_tour_ids(instance):
+    return TourSession.objects.filter(pk=instance.session_id).values_list('tour_id', flat=True)
+
+
+def _media_tour_ids(instance):
+    return (
+        Tour.objects.filter(Q(main_image=instance) | Q(gallery=instance))
+        .values_list('pk', flat=True)
+        .distinct()
+    )
+
+
+DOCUMENT_SOURCES = {
+    Tour: lambda instance: [instance.pk],
+    TourSession: lambda instance: [instance.tour_id],
+    TourSchedule: lambda instance: [instance.tour_id],
+    TourParameterValue: lambda instance: [instance.tour_id],
+    Booking: lambda instance: [instance.tour_id],
+    Promotion: _session_tour_ids,
+    PromoCode: _session_tour_ids,
+}
+
+
+def _rebuild_documents(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_document_rebuild(DOCUMENT_SOURCES[sender](instance))
+
+
+for model in DOCUMENT_SOURCES:
+    post_save.connect(
+        _rebuild_documents, sender=model,
+        dispatch_uid=f'tours_document_save_{model.__name__}'
+    )
+    post_delete.connect(
+        _rebuild_documents, sender=model,
+        dispatch_uid=f'tours_document_delete_{model.__name__}'
+    )
+
+
+@receiver(post_save, sender=Media, dispatch_uid='tours_document_media_saved')
+@receiver(pre_delete, sender=Media, dispatch_uid='tours_document_media_deleted')
+def rebuild_media_documents(sender, instance, raw=False, **kwargs):
+    # При удалении связи ещё на месте — собираем туры до удаления
+    if not raw:
+        schedule_document_rebuild(list(_media_tour_ids(instance)))
+
+
+@receiver(post_save, sender=TourCategory, dispatch_uid='tours_document_category_saved')
+def rebuild_category_documents(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_document_rebuild(list(instance.tours.values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=Tour.gallery.through, dispatch_uid='tours_document_gallery')
+def rebuild_gallery_documents(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        schedule_document_rebuild([instance.pk])
+    elif action == 'pre_clear':
+        schedule_document_rebuild(list(instance.tours.values_list('pk', flat=True)))
+    else:
+        schedule_document_rebuild(pk_set or ())
+
+
+########################################
+# Набор действующих акций и промокодов
+########################################
+def _invalidate_active_set(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_active_set()
+    # Набор, пересчитанный другим процессом до коммита, видел старые данные
+    transaction.on_commit(invalidate_active_set)
+
+
+for model in (Promotion, PromoCode):
+    post_save.connect(
+        _invalidate_active_set, sender=model,
+        dispatch_uid=f'tours_activation_save_{model.__name__}'
+    )
+    post_delete.connect(
+        _invalidate_active_set, sender=model,
+        dispatch_uid=f'tours_activation_delete_{model.__name__}'
+    )
+
+
+########################################
+# Агрегаты тура (ближайший выезд, цена, места, участники)
+########################################
+AGGREGATE_SOURCES = {
+    model: DOCUMENT_SOURCES[model]
+    for model in (Tour, TourSession, Promotion, Booking)
+}
+
+
+def _refresh_aggregates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_aggregates_refresh(AGGREGATE_SOURCES[sender](instance))
+
+
+for model in AGGREGATE_SOURCES:
+    post_save.connect(
+        _refresh_aggregates, sender=model,
+        dispatch_uid=f'tours_aggregates_save_{model.__name__}'
+    )
+    post_delete.connect(
+        _refresh_aggregates, sender=model,
+        dispatch_uid=f'tours_aggregates_delete_{model.__name__}'
+    )
+
+
+########################################
+# Версии справочников (ETag)
+########################################
+@receiver(post_save, sender=TourCategory, dispatch_uid='tours_version_category_saved')
+@receiver(post_delete, sender=TourCategory, dispatch_uid='tours_version_category_deleted')
+def bump_categories_version(sender, **kwargs):
+    # Категория выводится и на карточках туров
+    bump_version('categories', 'tours')
+
+
+@receiver(post_save, sender=Destination, dispatch_uid='tours_version_destination_saved')
+@receiver(post_delete, sender=Destination, dispatch_uid='tours_version_destination_deleted')
+def bump_destinations_version(sender, **kwargs):
+    bump_version('destinations', 'tours')
+
+
+########################################
+# Агентство в бронях, акциях и промокодах (фильтры менеджеров без JOIN)
+########################################
+def _fill_agency(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.agency_id = session_agency_id(instance)
+
+
+for model in (Booking, Promotion, PromoCode):
+    pre_save.connect(
+        _fill_agency, sender=model,
+        dispatch_uid=f'tours_agency_scope_{model.__name__}'
+    )
+
+
+@receiver(pre_save, sender=Tour, dispatch_uid='tours_agency_scope_tour_saving')
+def detect_agency_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Перенос записей нужен только при смене агентства — остальные сохранения тура его не трогают"""
+    instance._agency_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'agency', 'agency_id'} & set(update_fields):
+        return
+    instance._agency_changed = not Tour.objects.filter(pk=instance.pk, agency_id=instance.agency_id).exists()
+
+
+@receiver(post_save, sender=Tour, dispatch_uid='tours_agency_scope_tour_saved')
+def sync_agency_scope(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created and getattr(instance, '_agency_changed', False):
+        sync_tour_agency(instance)
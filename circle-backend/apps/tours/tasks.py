@@ -0,0 +1,51 @@
+from celery import shared_task
+
+from .activation import refresh_active_promotions
+from .aggregates import reconcile_tour_aggregates as reconcile_aggregates
+from .documents import build_tour_documents, rebuild_all_documents
+from .flash_sale import reconcile_flash_sales as reconcile_flash
+from .promo_batches import generate_batch
+
+
+@shared_task(ignore_result=True)
+def rebuild_tour_documents(tour_ids):
+    """Пересборка документов детальной страницы для изменённых туров"""
+    return build_tour_documents(tour_ids)
+
+
+@shared_task(ignore_result=True)
+def rebuild_all_tour_documents():
+    """
+    Полная пересборка документов (по расписанию).
+    Подхватывает изменения, которые не отправляют сигналов
+    (update() в коде, правки профилей участников).
+    """
+    return rebuild_all_documents()
+
+
+@shared_task(ignore_result=True)
+def reconcile_tour_aggregates():
+    """Сверка денормализованных агрегатов туров с сессиями, акциями и бронями"""
+    return reconcile_aggregates()
+
+
+@shared_task(ignore_result=True)
+def refresh_promotion_activation():
+    """Переключение набора действующих акций и промокодов на границах окон"""
+    return refresh_active_promotions()
+
+
+@shared_task(ignore_result=True)
+def generate_promo_code_batch(batch_id):
+    """Генерация пачки промокодов кампании (POST /api/tours/promo-batches/)"""
+    from .models import PromoCodeBatch
+
+    batch = PromoCodeBatch.objects.filter(pk=batch_id).first()
+    if batch is not None and batch.status != 'ready':
+        return generate_batch(batch)
+
+
+@shared_task(ignore_result=True)
+def reconcile_flash_sales():
+    """Запись остатков flash sale из Redis в available_seats, открытие и закрытие окон"""
+    return reconcile_flash()
@@ -1,14 +1,20 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .api import TourViewSet, TourCategoryViewSet, TourWishlistViewSet
-from .api import PromotionViewSet, PromoCodeViewSet
+from .api import TourViewSet, TourCategoryViewSet, DestinationViewSet, TourWishlistViewSet
+from .api import BookingQuoteView
+from .api import PromotionViewSet, PromoCodeViewSet, PromoCodeBatchViewSet
 
 router = DefaultRouter()
 router.register(r'tours', TourViewSet, basename='tour')
 router.register(r'categories', TourCategoryViewSet, basename='tour-category')
+router.register(r'destinations', DestinationViewSet, basename='destination')
 router.register(r'wishlist', TourWishlistViewSet, basename='tour-wishlist')
 
 router.register(r'promotions', PromotionViewSet, basename='promotion')
 router.register(r'promocodes', PromoCodeViewSet, basename='promocode')
+router.register(r'promo-batches', PromoCodeBatchViewSet, basename='promo-batch')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('quote/', BookingQuoteView.as_view(), name='booking-quote'),
+] + router.urls
 
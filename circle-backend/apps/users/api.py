@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.core.fieldsets import SparseFieldsetViewMixin
+from apps.core.versioning import VersionedResourceMixin
 from .models import (
     User, Sphere, Specialization,
     TravelStyle, TravelLocation, TripDuration
@@ -13,10 +15,23 @@ from .serializers import (
 )
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    """API для работы с пользователями"""
+class UserViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    """
+    API для работы с пользователями
+    - ?fields=id,username,sphere.name - только нужные поля
+    """
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+
+    sparse_relations = {
+        'full_name': {'only': ['first_name', 'last_name', 'username']},
+        'sphere': {'select': ['sphere']},
+        'specialization': {'select': ['specialization__sphere']},
+        'preferred_travel_styles': {'prefetch': ['preferred_travel_styles']},
+        'preferred_travel_locations': {'prefetch': ['preferred_travel_locations']},
+        'preferred_trip_durations': {'prefetch': ['preferred_trip_durations']},
+    }
+    sparse_always_only = ('pk', 'is_active')
     
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
@@ -28,14 +43,14 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if self.action == 'list':
             # Для списка показываем только активных пользователей
-            return User.objects.filter(is_active=True)
-        return super().get_queryset()
+            return self.apply_sparse_fieldset(User.objects.filter(is_active=True))
+        return self.apply_sparse_fieldset(super().get_queryset())
 
     @action(detail=False, methods=['get', 'patch'])
     def me(self, request):
         """Получить или обновить свой профиль"""
         if request.method == 'GET':
-            serializer = UserDetailSerializer(request.user)
+            serializer = UserDetailSerializer(request.user, context=self.get_serializer_context())
             return Response(serializer.data)
         
         elif request.method == 'PATCH':
@@ -83,11 +98,12 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SphereViewSet(viewsets.ReadOnlyModelViewSet):
+class SphereViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """API для сфер деятельности"""
     queryset = Sphere.objects.filter(is_active=True)
     serializer_class = SphereSerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('spheres',)
 
     @action(detail=True, methods=['get'])
     def specializations(self, request, pk=None):
@@ -98,29 +114,33 @@ class SphereViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class SpecializationViewSet(viewsets.ReadOnlyModelViewSet):
+class SpecializationViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """API для специализаций"""
     queryset = Specialization.objects.filter(is_active=True)
     serializer_class = SpecializationSerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('specializations',)
 
 
-class TravelStyleViewSet(viewsets.ReadOnlyModelViewSet):
+class TravelStyleViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """API для стилей отдыха"""
     queryset = TravelStyle.objects.filter(is_active=True)
     serializer_class = TravelStyleSerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('travel_styles',)
 
 
-class TravelLocationViewSet(viewsets.ReadOnlyModelViewSet):
+class TravelLocationViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """API для локаций"""
     queryset = TravelLocation.objects.filter(is_active=True)
     serializer_class = TravelLocationSerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('travel_locations',)
 
 
-class TripDurationViewSet(viewsets.ReadOnlyModelViewSet):
+class TripDurationViewSet(VersionedResourceMixin, viewsets.ReadOnlyModelViewSet):
     """API для форматов поездок"""
     queryset = TripDuration.objects.filter(is_active=True)
     serializer_class = TripDurationSerializer
     permission_classes = [permissions.AllowAny]
+    version_families = ('trip_durations',)
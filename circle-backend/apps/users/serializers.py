@@ -5,15 +5,16 @@ from .models import (
     User, Sphere, Specialization, 
     TravelStyle, TravelLocation, TripDuration
 )
+from apps.core.fieldsets import SparseFieldsetMixin
 
 
-class SphereSerializer(serializers.ModelSerializer):
+class SphereSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Sphere
         fields = ['id', 'name', 'description']
 
 
-class SpecializationSerializer(serializers.ModelSerializer):
+class SpecializationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sphere = SphereSerializer(read_only=True)
 
     class Meta:
@@ -40,7 +41,7 @@ class TripDurationSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'icon']
 
 
-class UserShortSerializer(serializers.ModelSerializer):
+class UserShortSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Краткий сериализатор пользователя для списков и связей"""
     full_name = serializers.ReadOnlyField()
     
@@ -49,7 +50,7 @@ class UserShortSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'full_name', 'avatar']
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sphere = SphereSerializer(read_only=True)
     specialization = SpecializationSerializer(read_only=True)
     preferred_travel_styles = TravelStyleSerializer(many=True, read_only=True)
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+
+from apps.core.versioning import bump_version
+from .models import Sphere, Specialization, TravelStyle, TravelLocation, TripDuration
+
+
+########################################
+# Версии справочников (ETag)
+########################################
+REFERENCE_FAMILIES = {
+    # Специализации отдаются вместе со сферой
+    Sphere: ('spheres', 'specializations'),
+    Specialization: ('specializations',),
+    TravelStyle: ('travel_styles',),
+    TravelLocation: ('travel_locations',),
+    TripDuration: ('trip_durations',),
+}
+
+
+def _bump_reference_version(sender, **kwargs):
+    bump_version(*REFERENCE_FAMILIES[sender])
+
+
+for model in REFERENCE_FAMILIES:
+    post_save.connect(
+        _bump_reference_version, sender=model,
+        dispatch_uid=f'users_version_save_{model.__name__}'
+    )
+    post_delete.connect(
+        _bump_reference_version, sender=model,
+        dispatch_uid=f'users_version_delete_{model.__name__}'
+    )
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from celery.schedules import crontab
+
+
+########################################
+# Периодические задачи (celery beat)
+########################################
+CELERY_BEAT_SCHEDULE = {
+    'rebuild-all-tour-documents': {
+        'task': 'apps.tours.tasks.rebuild_all_tour_documents',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    # Смена дня и окна акций меняют агрегаты без сигналов
+    'reconcile-tour-aggregates': {
+        'task': 'apps.tours.tasks.reconcile_tour_aggregates',
+        'schedule': crontab(minute='*/15'),
+    },
+    # Начало и конец акций: публикует новый набор и версию каталога.
+    # Читатели между запусками сами пересчитывают набор после границы
+    'refresh-promotion-activation': {
+        'task': 'apps.tours.tasks.refresh_promotion_activation',
+        'schedule': crontab(minute='*'),
+    },
+    # Flash sale: остатки со счётчиков Redis в БД, открытие и закрытие окон
+    'reconcile-flash-sales': {
+        'task': 'apps.tours.tasks.reconcile_flash_sales',
+        'schedule': timedelta(seconds=15),
+    },
+    # Заявки без ответа и неоплаченные подтверждения: expired, места и промокоды возвращаются
+    'expire-overdue-bookings': {
+        'task': 'apps.bookings.tasks.expire_overdue_bookings',
+        'schedule': crontab(minute='*'),
+    },
+    # Лист ожидания: непринятые предложения мест — следующим в очереди
+    'refresh-waitlists': {
+        'task': 'apps.bookings.tasks.refresh_waitlists',
+        'schedule': crontab(minute='*'),
+    },
+    # Outbox: доставка событий потребителям (at-least-once)
+    'relay-outbox': {
+        'task': 'apps.core.tasks.relay_outbox',
+        'schedule': timedelta(seconds=5),
+    },
+    # Idempotency-Key: истёкшие ответы
+    'purge-idempotency-keys': {
+        'task': 'apps.core.tasks.purge_idempotency_keys',
+        'schedule': crontab(minute=15),
+    },
+}
@@ -0,0 +1,13 @@
+import os
+
+from celery import Celery
+
+from celery_worker.schedules import CELERY_BEAT_SCHEDULE
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'circle.settings')
+
+app = Celery('circle')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.conf.beat_schedule = CELERY_BEAT_SCHEDULE
+app.autodiscover_tasks()
@@ -203,6 +203,58 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Локально без воркера: задачи выполняются синхронно
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+
+# Общий кеш web-воркеров и celery: версии ресурсов (ETag, поколение каталога),
+# снимок активных туров, wishlist, метрики фоновых задач. Без CACHE_URL и REDIS_URL
+# (локальная разработка) — кеш в памяти процесса: годится только для одного
+# процесса без celery, в docker-compose и на сервере кеш — Redis из REDIS_URL
+CACHE_URL = os.getenv('CACHE_URL') or os.getenv('REDIS_URL') or 'locmem://'
+if CACHE_URL.startswith('locmem://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'circle',
+        }
+    }
+
+# Flash sale: счётчики мест в Redis; fakeredis:// — локальная замена (fakeredis[lua])
+FLASH_SALE_REDIS_URL = os.getenv('FLASH_SALE_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+
+# Transactional outbox: события пишутся в транзакции смены состояния,
+# relay (celery beat) доставляет их потребителям со своими курсорами
+OUTBOX_CONSUMERS = {
+    'audit-log': {
+        'handler': 'apps.core.outbox.audit_log_consumer',
+        'topics': ['booking.', 'waitlist.'],
+    },
+}
+# Секунд ожидания пропуска в id с момента, когда relay его увидел: событие
+# транзакции, которая закоммитится позже, потребители уже не получат
+OUTBOX_GAP_TIMEOUT = 60
+OUTBOX_RETENTION_DAYS = 7
+
+# Idempotency-Key для POST броней, заявок на вывод и wishlist (apps.core.idempotency)
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_LOCK_SECONDS = 30
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# Сколько заявка в статусе requested держит места, ожидая менеджера
+BOOKING_REQUEST_TTL_HOURS = int(os.getenv('BOOKING_REQUEST_TTL_HOURS', 48))
+
+# Выгрузка броней: больше строк — фоновая задача с файлом вместо потока в ответе
+BOOKING_EXPORT_SYNC_LIMIT = int(os.getenv('BOOKING_EXPORT_SYNC_LIMIT', 50000))
+
+# Лист ожидания: сколько минут предложенные места держатся за пользователем
+WAITLIST_CLAIM_MINUTES = 30
 
 # Debug Toolbar
 INTERNAL_IPS = [
@@ -251,3 +303,10 @@ TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')
 # Payme Settings (для будущего)
 PAYME_MERCHANT_ID = os.getenv('PAYME_MERCHANT_ID', '')
 PAYME_SECRET_KEY = os.getenv('PAYME_SECRET_KEY', '')
+
+# Tours catalog
+TOUR_PARTICIPANTS_PREVIEW_LIMIT = int(os.getenv('TOUR_PARTICIPANTS_PREVIEW_LIMIT', '5'))
+TOUR_WISHLIST_CACHE_TIMEOUT = 300
+TOUR_CATALOG_CACHE_TIMEOUT = 300
+TOUR_SEARCH_CONFIG = 'russian'
+TOUR_SEARCH_MAX_RESULTS = 500  # только SQLite: самых релевантных после фильтров каталога
@@ -461,7 +461,7 @@ export default function HomePage() {
                     </div>
                     <div className="flex items-center text-xs text-gray-600 font-helvetica">
                       <UsersIcon className="w-3 h-3 mr-1 text-orange-500" />
-                      {tour.participants?.length || 0} участн.
+                      {tour.participants_count ?? tour.participants?.length ?? 0} участн.
                     </div>
                   </div>
 
@@ -478,7 +478,7 @@ export default function HomePage() {
                             location: tour.category?.name || 'Тур',
                             price: Number(tour.price_from),
                             duration: `${tour.duration_days} дн.`,
-                                                         participants: tour.participants?.length || 0,
+                                                         participants: tour.participants_count ?? tour.participants?.length ?? 0,
                              maxParticipants: 15,
                              joinedUsers: convertToModalParticipants(tour.participants || [])
                           };
@@ -497,9 +497,9 @@ export default function HomePage() {
                         ))}
                         
                         {/* Показываем "+X" если участников больше 3 */}
-                        {tour.participants.length > 3 && (
+                        {(tour.participants_count ?? tour.participants.length) > 3 && (
                           <div className="w-6 h-6 bg-gray-300 rounded-full flex items-center justify-center text-gray-600 text-xs font-medium border border-white group-hover:scale-110 transition-transform" style={{ marginLeft: '-4px' }}>
-                            +{tour.participants.length - 3}
+                            +{(tour.participants_count ?? tour.participants.length) - 3}
                           </div>
                         )}
                       </div>
@@ -60,7 +60,7 @@ const TourCard = ({ tour }: TourCardProps) => {
             </div>
             <div className="flex items-center text-sm text-gray-600 font-helvetica">
               <UsersIcon className="w-4 h-4 mr-2 text-orange-500" />
-              {tour.participants?.length || 0} участн.
+              {tour.participants_count ?? tour.participants?.length ?? 0} участн.
             </div>
           </div>
 
@@ -89,9 +89,9 @@ const TourCard = ({ tour }: TourCardProps) => {
                 ))}
                 
                 {/* Показываем "+X" если участников больше 4 */}
-                {tour.participants.length > 4 && (
+                {(tour.participants_count ?? tour.participants.length) > 4 && (
                   <div className="w-8 h-8 bg-gray-300 rounded-full flex items-center justify-center text-gray-600 text-xs font-medium border-2 border-white group-hover:scale-110 group-hover/participants:scale-125 transition-transform" style={{ marginLeft: '-8px' }}>
-                    +{tour.participants.length - 4}
+                    +{(tour.participants_count ?? tour.participants.length) - 4}
                   </div>
                 )}
               </div>
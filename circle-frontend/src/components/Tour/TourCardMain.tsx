@@ -28,6 +28,7 @@ interface TourCardProps {
       url: string;
     };
     participants?: TourParticipant[];
+    participants_count?: number;
   };
   showButton?: boolean;
   onParticipantsClick?: (participants: TourParticipant[]) => void;
@@ -91,7 +92,7 @@ export default function TourCardMain({ tour, showButton = true, onParticipantsCl
           </div>
           <div className="flex items-center text-xs text-gray-600 font-helvetica">
             <UsersIcon className="w-3 h-3 mr-1 text-orange-500" />
-            {tour.participants?.length || 0} участн.
+            {tour.participants_count ?? tour.participants?.length ?? 0} участн.
           </div>
         </div>
 
@@ -115,9 +116,9 @@ export default function TourCardMain({ tour, showButton = true, onParticipantsCl
               ))}
               
               {/* Показываем "+X" если участников больше 3 */}
-              {tour.participants.length > 3 && (
+              {(tour.participants_count ?? tour.participants.length) > 3 && (
                 <div className="w-6 h-6 bg-gray-300 rounded-full flex items-center justify-center text-gray-600 text-xs font-medium border border-white group-hover:scale-110 transition-transform" style={{ marginLeft: '-4px' }}>
-                  +{tour.participants.length - 3}
+                  +{(tour.participants_count ?? tour.participants.length) - 3}
                 </div>
               )}
             </div>
@@ -367,6 +367,9 @@ export interface Tour {
   description?: string;
   category?: TourCategory;
   price_from: number;
+  min_price?: number | null;
+  next_departure?: string | null;
+  seats_left?: number;
   base_price?: number;
   duration_days: number;
   duration_nights?: number;
@@ -407,6 +410,7 @@ export interface Tour {
     specialization_name?: string;
     avatar?: string;
   }>;
+  participants_count?: number;
   is_active: boolean;
 }
 
@@ -418,6 +422,27 @@ export interface TourFilters {
   ordering?: string;
 }
 
+export interface BookingQuoteItem {
+  session: number;
+  seats?: number;
+  promo_code?: string | null;
+  bonus?: string;
+}
+
+export interface BookingQuote {
+  session: number;
+  seats: number;
+  unit_price: string | null;
+  base_price: string | null;
+  promotions_discount: string | null;
+  promo_code: string | null;
+  promo_code_discount: string | null;
+  discount_amount: string | null;
+  bonus_used_amount: string | null;
+  final_price: string | null;
+  error: string | null;
+}
+
 export interface PaginatedResponse<T> {
   count: number;
   next: string | null;
@@ -462,6 +487,11 @@ export const toursApi = {
       throw new ApiError('Tour not found', 404);
     }
     return tour;
+  },
+
+  // Разбивка цены для нескольких вариантов брони за один запрос
+  async quote(items: BookingQuoteItem[]): Promise<{ results: BookingQuote[] }> {
+    return httpClient.post('/tours/quote/', { items });
   }
 };
 